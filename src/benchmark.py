@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from gerar_dados import TAMANHOS, gerar_massa
+from rastreio import PASTA_RASTREIOS, SEPARADOR, achatar
+from utils import log, preparar_pasta
+
+# Subpasta de data com as massas, os resultados e a linha de base
+PASTA_BENCHMARK = "benchmark"
+NOME_LINHA_BASE = "linha_base.json"
+
+# Tolerância padrão: uma etapa regrediu se ficou mais de 20% mais lenta (ou
+# com RSS 20% maior) que a linha de base
+TOLERANCIA = 0.20
+
+# Etapas mais curtas que isto na linha de base não são comparadas (ruído)
+DURACAO_MINIMA = 0.25
+
+# Etapa raiz das execuções medidas
+ETAPA_BENCHMARK = "[BENCHMARK] Relatórios"
+
+
+def executar_relatorios():
+    """
+    Gera os dois relatórios a partir da massa em PASTA_DADOS (processo
+    filho do benchmark; o rastreio da execução é gravado em
+    PASTA_DADOS/rastreios).
+    """
+    import relatorio_garantias
+    import relatorio_project_room
+    from utils import log_tempo
+
+    with log_tempo(ETAPA_BENCHMARK):
+        relatorio_garantias.main(converter=False)
+        relatorio_project_room.main(converter=False)
+
+
+def medir(pasta: Path) -> dict:
+    """
+    Roda os relatórios sobre a massa em pasta, em um processo novo (RSS e
+    caches sem influência das outras execuções), e devolve o rastreio.
+    """
+    rastreios = pasta / PASTA_RASTREIOS
+    anteriores = set(rastreios.glob("*.json")) if rastreios.exists() else set()
+
+    processo = subprocess.run(
+        [sys.executable, Path(__file__).name, "--executar"],
+        cwd=Path(__file__).resolve().parent,
+        env=dict(os.environ, PASTA_DADOS=str(pasta)),
+        capture_output=True,
+        text=True,
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(
+            f"Execução sobre {pasta} falhou:\n{processo.stdout}{processo.stderr}"
+        )
+
+    novos = sorted(set(rastreios.glob("*.json")) - anteriores)
+    if not novos:
+        raise RuntimeError("Rastreio não gravado (RASTREIO desligado em config.py?)")
+    with open(novos[-1], encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def resumir(rastreios: list[dict]) -> dict:
+    """
+    Junta as repetições de um tamanho: por etapa (caminho), a mediana da
+    duração, as linhas, linhas/s e o maior pico de RSS.
+    """
+    execucoes = [achatar(rastreio["etapas"]) for rastreio in rastreios]
+    etapas = {}
+    for caminho in execucoes[0]:
+        medidas = [e[caminho] for e in execucoes if caminho in e]
+        duracao = statistics.median(m["duracao"] for m in medidas)
+        linhas = medidas[-1]["linhas"]
+        rss = [m["rss_pico_mb"] for m in medidas if m.get("rss_pico_mb") is not None]
+        etapas[caminho] = {
+            "duracao": round(duracao, 4),
+            "linhas": linhas,
+            "linhas_por_segundo": (
+                round(linhas / duracao, 1) if linhas and duracao else None
+            ),
+            "rss_pico_mb": max(rss) if rss else None,
+        }
+    return etapas
+
+
+def regressoes(atual: dict, base: dict, tolerancia: float) -> list[str]:
+    """Etapas mais lentas (ou com mais RSS) que a linha de base além da tolerância."""
+    encontradas = []
+    for tamanho, etapas_base in base.items():
+        etapas = atual.get(tamanho)
+        if etapas is None:
+            continue
+        for caminho, referencia in etapas_base.items():
+            medida = etapas.get(caminho)
+            if medida is None:
+                continue
+            nome = f"{tamanho} linhas: {caminho}"
+            if referencia["duracao"] >= DURACAO_MINIMA and medida[
+                "duracao"
+            ] > referencia["duracao"] * (1 + tolerancia):
+                encontradas.append(
+                    f"{nome}: {referencia['duracao']:.2f}s -> {medida['duracao']:.2f}s"
+                )
+            # RSS só na etapa raiz (o pico do processo inteiro)
+            if (
+                SEPARADOR not in caminho
+                and referencia.get("rss_pico_mb")
+                and medida.get("rss_pico_mb")
+                and medida["rss_pico_mb"] > referencia["rss_pico_mb"] * (1 + tolerancia)
+            ):
+                encontradas.append(
+                    f"{nome}: RSS {referencia['rss_pico_mb']:.0f} MB -> "
+                    f"{medida['rss_pico_mb']:.0f} MB"
+                )
+    return encontradas
+
+
+def _formatar(valor, formato: str) -> str:
+    return "-" if valor is None else format(valor, formato)
+
+
+def imprimir(tamanho: int, etapas: dict, base: dict):
+    print(f"\n== {tamanho} linhas ==")
+    print(
+        f"{'Etapa':<55} {'Tempo (s)':>10} {'Linhas':>9} {'Linhas/s':>11} "
+        f"{'RSS (MB)':>9} {'Base (s)':>9} {'Var. %':>7}"
+    )
+    for caminho, medida in etapas.items():
+        nivel = caminho.count(SEPARADOR)
+        nome = "  " * nivel + caminho.rsplit(SEPARADOR, 1)[-1]
+        referencia = base.get(caminho, {}).get("duracao")
+        variacao = None
+        if referencia:
+            variacao = (medida["duracao"] - referencia) / referencia * 100
+        print(
+            f"{nome[:55]:<55} {medida['duracao']:>10.2f} {medida['linhas'] or '':>9} "
+            f"{_formatar(medida['linhas_por_segundo'], ',.0f'):>11} "
+            f"{_formatar(medida['rss_pico_mb'], '.0f'):>9} "
+            f"{_formatar(referencia, '.2f'):>9} {_formatar(variacao, '+.1f'):>7}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mede os relatórios sobre massas sintéticas e compara com a linha de base."
+    )
+    parser.add_argument(
+        "--linhas",
+        type=int,
+        nargs="+",
+        default=list(TAMANHOS[:2]),
+        help=f"tamanhos das massas (padrão: {TAMANHOS[0]} {TAMANHOS[1]}; "
+        f"maiores: {' '.join(map(str, TAMANHOS[2:]))})",
+    )
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument(
+        "--pasta",
+        type=Path,
+        help="pasta das massas e resultados (padrão: data/benchmark)",
+    )
+    parser.add_argument("--linha-base", type=Path, help="arquivo da linha de base")
+    parser.add_argument(
+        "--gravar-linha-base",
+        action="store_true",
+        help="grava o resultado como nova linha de base (em vez de comparar)",
+    )
+    parser.add_argument("--executar", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.executar:
+        executar_relatorios()
+        return 0
+
+    pasta = (args.pasta or preparar_pasta(PASTA_BENCHMARK)).resolve()
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho_base = args.linha_base or pasta / NOME_LINHA_BASE
+    try:
+        with open(caminho_base, encoding="utf-8") as arquivo:
+            linha_base = json.load(arquivo)["tamanhos"]
+    except FileNotFoundError:
+        linha_base = {}
+
+    resultado = {}
+    for linhas in args.linhas:
+        massa = pasta / "massas" / str(linhas)
+        inicio = time.perf_counter()
+        gerar_massa(massa, linhas, args.semente)
+        log(
+            f"[BENCHMARK] Massa de {linhas} linhas pronta ({time.perf_counter() - inicio:.1f}s)"
+        )
+
+        rastreios = []
+        for repeticao in range(1, args.repeticoes + 1):
+            if repeticao > 1:
+                # O relatório é salvo sobre o modelo: cada repetição parte dele
+                gerar_massa(massa, linhas, args.semente)
+            rastreios.append(medir(massa))
+            log(
+                f"[BENCHMARK] {linhas} linhas, execução {repeticao}/{args.repeticoes}: "
+                f"{rastreios[-1]['etapas']['duracao']:.2f}s"
+            )
+        resultado[str(linhas)] = resumir(rastreios)
+        imprimir(linhas, resultado[str(linhas)], linha_base.get(str(linhas), {}))
+
+    dados = {
+        "versao": 1,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "repeticoes": args.repeticoes,
+        "tamanhos": resultado,
+    }
+    caminho_resultado = pasta / f"resultado_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(caminho_resultado, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+    log(f"[BENCHMARK] Resultado gravado em {caminho_resultado}")
+
+    if args.gravar_linha_base:
+        # Tamanhos não medidos agora continuam com a linha de base anterior
+        dados["tamanhos"] = {**linha_base, **resultado}
+        with open(caminho_base, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+        log(f"[BENCHMARK] Linha de base gravada em {caminho_base}")
+        return 0
+
+    if not linha_base:
+        log("[BENCHMARK] Sem linha de base para comparar (use --gravar-linha-base).")
+        return 0
+
+    encontradas = regressoes(resultado, linha_base, args.tolerancia)
+    for regressao in encontradas:
+        log(f"[BENCHMARK] Regressão: {regressao}")
+    if encontradas:
+        return 1
+    log(f"[BENCHMARK] Nenhuma etapa acima de {args.tolerancia:.0%} da linha de base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import glob
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from config import CACHE_TABELAS, LEITURA_STREAMING
+from leitor_xlsx import ler_tabela_xlsx
+from manifesto import hash_arquivo
+from tabela import Tabela, normalizar_cabecalho
+from utils import log, preparar_pasta
+
+# Subpasta de data com as tabelas já lidas das extrações
+PASTA_CACHE_TABELAS = Path(".cache") / "tabelas"
+
+# Muda quando o formato do arquivo muda (invalida o cache)
+VERSAO_CACHE = 1
+
+
+def _chave_colunas(hash_origem: str, colunas) -> str:
+    """Chave da tabela: o hash da extração e, se projetada, as colunas lidas."""
+    if colunas is None:
+        return hash_origem
+    nomes = sorted({normalizar_cabecalho(nome) for nome in colunas})
+    return hashlib.sha256("\0".join([hash_origem, *nomes]).encode()).hexdigest()
+
+
+def _projecao(colunas) -> str:
+    """Identifica no nome do arquivo as colunas lidas ("todas" sem projeção)."""
+    if colunas is None:
+        return "todas"
+    nomes = sorted({normalizar_cabecalho(nome) for nome in colunas})
+    return hashlib.sha256("\0".join(nomes).encode()).hexdigest()[:12]
+
+
+def _caminho_cache(pasta: Path, origem: Path, projecao: str, chave: str) -> Path:
+    return pasta / f"{origem.stem}.{projecao}.{chave[:32]}.tabela"
+
+
+def gravar_tabela(caminho: Path, tabela: Tabela, hash_origem: str):
+    """
+    Grava a tabela (cabeçalho e colunas, com os tipos dos valores) em
+    pickle protocolo 5, em arquivo temporário + troca: processos lendo a
+    mesma extração ao mesmo tempo não veem um arquivo pela metade.
+    """
+    dados = (
+        VERSAO_CACHE,
+        hash_origem,
+        tabela.titulo,
+        tabela.cabecalho,
+        [list(coluna) for coluna in tabela.colunas],
+    )
+    temporario = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+    with open(temporario, "wb") as arquivo:
+        pickle.dump(dados, arquivo, protocol=5)
+    os.replace(temporario, caminho)
+
+
+def carregar_tabela(caminho: Path, hash_origem: str) -> Tabela | None:
+    """
+    Lê a tabela gravada por gravar_tabela (um pickle só: as colunas voltam
+    como listas de objetos, com os tipos gravados). Devolve None se não
+    existe, é de outra versão ou outra origem.
+    """
+    try:
+        with open(caminho, "rb") as arquivo:
+            versao, hash_gravado, titulo, cabecalho, colunas = pickle.load(arquivo)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+        log(f"[CACHE] Tabela inválida, ignorada: {caminho.name} ({e})")
+        return None
+    if versao != VERSAO_CACHE or hash_gravado != hash_origem:
+        return None
+    return Tabela(cabecalho, colunas, titulo)
+
+
+def _remover_antigas(pasta: Path, origem: Path, projecao: str, atual: Path):
+    """
+    Remove as tabelas de versões anteriores da mesma extração com as mesmas
+    colunas: as de outras colunas (outro relatório) continuam valendo.
+    """
+    for antiga in pasta.glob(f"{glob.escape(origem.stem)}.{projecao}.*.tabela"):
+        if antiga != atual:
+            antiga.unlink(missing_ok=True)
+
+
+def ler_tabela(
+    origem: Path,
+    somente_leitura: bool = LEITURA_STREAMING,
+    usar_cache: bool = CACHE_TABELAS,
+    colunas=None,
+) -> Tabela:
+    """
+    Lê a aba ativa da extração como Tabela (ver Tabela.de_aba). Com
+    usar_cache, a tabela fica gravada em data/.cache/tabelas pelo hash do
+    conteúdo do .xlsx: enquanto a extração não muda, as execuções seguintes
+    leem o arquivo binário em vez de interpretar o XML.
+
+    colunas: se informadas, só essas colunas são lidas (ver
+    leitor_xlsx.ler_tabela_xlsx), e elas entram na chave do cache.
+    """
+    if usar_cache:
+        pasta = preparar_pasta(str(PASTA_CACHE_TABELAS))
+        chave = _chave_colunas(hash_arquivo(origem), colunas)
+        projecao = _projecao(colunas)
+        caminho = _caminho_cache(pasta, origem, projecao, chave)
+        tabela = carregar_tabela(caminho, chave)
+        if tabela is not None:
+            log(f"[CACHE] {origem.name}: tabela reaproveitada ({len(tabela)} linhas)")
+            return tabela
+
+    if colunas is not None:
+        tabela = ler_tabela_xlsx(origem, colunas)
+    else:
+        wb_origem = load_workbook(origem, read_only=somente_leitura)
+        try:
+            tabela = Tabela.de_aba(wb_origem.active)
+        finally:
+            wb_origem.close()
+
+    if usar_cache:
+        try:
+            gravar_tabela(caminho, tabela, chave)
+            _remover_antigas(pasta, origem, projecao, caminho)
+        except OSError as e:
+            log(f"[CACHE] Não foi possível gravar a tabela de {origem.name}: {e}")
+    return tabela
@@ -1,8 +1,9 @@
 # config.py
+import os
+
 MAPEAMENTO_COLUNAS = {
     "#": "Chave",
     "SUMÁRIO": "Resumo",
-    "SUMARIO": "Resumo",
     "DESCRIÇÃO": "Descrição",
     "STATUS": "Situação",
     "TIPO CHAMADO": "Tipo de Item",
@@ -93,3 +94,95 @@ COLUNAS_RELATORIO = [
     "BE",
     "BF",
 ]
+
+# Pasta base dos dados (uploads, modelos e relatórios gerados). None usa
+# src/data; o benchmark.py aponta para as massas sintéticas (gerar_dados.py).
+PASTA_DADOS = os.environ.get("PASTA_DADOS") or None
+
+# Backend de conversão dos .xls: "excel" (COM, somente Windows), "python"
+# (sem Excel, funciona no Linux) ou None para escolher automaticamente.
+BACKEND_CONVERSAO = None
+
+# Converte as exportações em paralelo, uma por processo (somente no backend
+# "python"). PROCESSOS_CONVERSAO limita o pool; None usa todos os núcleos.
+CONVERSAO_PARALELA = True
+PROCESSOS_CONVERSAO = None
+
+# Reutiliza o .xlsx de uploads quando o .xls não mudou desde a última
+# conversão (manifesto data/conversoes.json)
+CACHE_CONVERSAO = True
+
+# Guarda as extrações já lidas (cabeçalho e colunas, com os tipos) em
+# data/.cache/tabelas, pelo hash do conteúdo do .xlsx: enquanto a extração
+# não muda, os relatórios leem esse arquivo em vez de abrir o .xlsx.
+# Desligado por padrão.
+CACHE_TABELAS = False
+
+# Abre as extrações do Jira em modo read_only (streaming): cada linha é lida
+# uma única vez e a memória não cresce com o tamanho da exportação.
+LEITURA_STREAMING = False
+
+# Lê das extrações do Jira só as colunas que os planos de cópia usam (mais
+# "Chave" e "Situação"): as demais células, e os textos que só elas usam,
+# não são convertidos (ver leitor_xlsx.py). Desligado por padrão.
+LEITURA_PROJETADA = False
+
+# Atualiza as abas do relatório pela "Chave" (só linhas novas, alteradas ou
+# removidas) em vez de recriá-las a cada execução. A ordem das linhas deixa
+# de seguir a da extração.
+ATUALIZACAO_INCREMENTAL = False
+
+# Salva o relatório regravando só as abas alteradas; as demais partes do
+# modelo são copiadas sem descompactar. Se não for possível, salva completo.
+# Desligado por padrão (wb.save()).
+GRAVACAO_PARCIAL = False
+
+# Grava as linhas copiadas para as abas do relatório direto em XML (arquivo
+# temporário), sem criar uma célula do openpyxl por valor. As linhas entram
+# no .xlsx na gravação parcial, por isso só vale com GRAVACAO_PARCIAL (e
+# segue o valor dela).
+ESCRITA_STREAMING = GRAVACAO_PARCIAL
+
+# Com mais de um relatório no dia (segundas-feiras), main.py gera cada um
+# em um processo, ao mesmo tempo (ver orquestrador.py); a falha de um não
+# interrompe o outro. Desligado por padrão.
+RELATORIOS_PARALELOS = False
+
+# Processa as abas do relatório de Garantias (Projetos, RI e
+# Resolvidos-Fechados) ao mesmo tempo, uma por processo: cada processo abre
+# só a sua aba do modelo e a sua extração e grava o XML pronto da aba, que é
+# montado no .xlsx na ordem das abas. Só vale com GRAVACAO_PARCIAL.
+# PROCESSOS_RENDERIZACAO limita o pool; None usa todos os núcleos (com um
+# núcleo só, as abas são processadas em série).
+RENDERIZACAO_PARALELA = False
+PROCESSOS_RENDERIZACAO = None
+
+# Gera o relatório de Garantias como um grafo de estágios (conversão ->
+# leitura -> partição -> abas -> gravação): estágios independentes rodam ao
+# mesmo tempo e a saída de cada um fica em data/.cache. Se a execução falhar
+# (ex.: o relatório aberto na rede na hora de salvar), a próxima retoma do
+# primeiro estágio cujas entradas mudaram. Só vale com GRAVACAO_PARCIAL.
+# PROCESSOS_ESTAGIOS limita o pool; None usa todos os núcleos.
+EXECUCAO_POR_ESTAGIOS = False
+PROCESSOS_ESTAGIOS = None
+
+# Grava, a cada execução, o rastreio das etapas (blocos de log_tempo) em
+# data/rastreios: tempos de relógio e CPU e linhas por etapa. Compare dois
+# rastreios com: python rastreio.py antes.json depois.json
+RASTREIO = True
+
+# Quantidade de rastreios mantidos em data/rastreios: a cada gravação, os
+# mais antigos são removidos. None mantém todos.
+RASTREIOS_MANTIDOS = 30
+
+# Mede também o pico de memória de cada etapa (tracemalloc; deixa a
+# execução mais lenta)
+RASTREIO_MEMORIA = False
+
+# Perfilamento sob demanda das etapas (blocos de log_tempo) cujo nome casa
+# com a expressão (ex.: "Copia para"); grava .pstats e pilhas colapsadas em
+# data/profiles. Desligado por padrão. Também: python main.py --perfil ...
+PERFIL_ETAPAS = os.environ.get("PERFIL_ETAPAS") or None
+
+# "cprofile" (exato, mais lento) ou "amostragem" (lê a pilha a cada 5 ms)
+PERFIL_MODO = os.environ.get("PERFIL_MODO", "cprofile")
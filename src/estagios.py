@@ -0,0 +1,249 @@
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from utils import log
+
+# Muda quando o formato dos checkpoints muda (invalida todos)
+VERSAO_CHECKPOINT = 1
+
+
+class Estagio:
+    """
+    Um estágio do grafo: a função, os estágios de entrada (as saídas deles
+    são passadas à função, na ordem) e os arquivos externos que ela lê.
+
+    A chave do estágio combina nome, versão, as chaves das entradas e
+    tamanho/data dos arquivos: se a chave é a do checkpoint (e valido(saída),
+    se informado, confirma que o que a saída aponta ainda existe), a saída
+    gravada é reaproveitada sem rodar a função. Com cache=False, o estágio
+    sempre roda e a sua chave passa a ser a da saída.
+
+    A função e as saídas precisam ser serializáveis (pickle): o estágio pode
+    rodar em outro processo. Com local=True, roda sempre no processo
+    principal (ex.: estágios que mexem em estado do processo, como os
+    modelos residentes).
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        funcao,
+        entradas=(),
+        arquivos=(),
+        cache: bool = True,
+        valido=None,
+        versao: int = 1,
+        local: bool = False,
+    ):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = tuple(entradas)
+        self.arquivos = tuple(Path(arquivo) for arquivo in arquivos)
+        self.cache = cache
+        self.valido = valido
+        self.versao = versao
+        self.local = local
+
+
+def assinatura_arquivo(caminho: Path):
+    """(caminho, tamanho, mtime) do arquivo, ou só o caminho se ele não existe."""
+    try:
+        estado = caminho.stat()
+    except OSError:
+        return (str(caminho),)
+    return str(caminho), estado.st_size, estado.st_mtime_ns
+
+
+def _hash(*partes) -> str:
+    return hashlib.sha256(pickle.dumps(partes, protocol=4)).hexdigest()
+
+
+def _cronometrar(funcao, *argumentos):
+    """Roda a função do estágio (em um processo do pool); devolve saída e segundos."""
+    inicio = time.perf_counter()
+    saida = funcao(*argumentos)
+    return saida, time.perf_counter() - inicio
+
+
+class _ExecutorLocal:
+    """Roda os estágios no próprio processo, com a interface do pool."""
+
+    def submit(self, funcao, *argumentos) -> Future:
+        futuro = Future()
+        try:
+            futuro.set_result(funcao(*argumentos))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+class Checkpoints:
+    """
+    Saídas dos estágios em uma pasta: <estágio>.pkl (a saída) e
+    <estágio>.chave (a chave com que foi produzida). A chave é gravada por
+    último: sem ela, o checkpoint não vale.
+    """
+
+    def __init__(self, pasta: Path):
+        self.pasta = pasta
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+    def _caminhos(self, nome: str) -> tuple[Path, Path]:
+        return self.pasta / f"{nome}.pkl", self.pasta / f"{nome}.chave"
+
+    def chave(self, nome: str) -> str | None:
+        try:
+            return self._caminhos(nome)[1].read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def carregar(self, nome: str):
+        with open(self._caminhos(nome)[0], "rb") as arquivo:
+            return pickle.load(arquivo)
+
+    def gravar(self, nome: str, chave: str, saida):
+        caminho_saida, caminho_chave = self._caminhos(nome)
+        caminho_chave.unlink(missing_ok=True)
+        for caminho, conteudo in (
+            (caminho_saida, pickle.dumps(saida, protocol=pickle.HIGHEST_PROTOCOL)),
+            (caminho_chave, chave.encode("utf-8")),
+        ):
+            temporario = caminho.with_suffix(caminho.suffix + ".tmp")
+            temporario.write_bytes(conteudo)
+            os.replace(temporario, caminho)
+
+
+def _ordenar(estagios: list[Estagio]) -> dict:
+    """Confere nomes e dependências (sem ciclos); devolve {nome: estágio}."""
+    por_nome = {}
+    for estagio in estagios:
+        if estagio.nome in por_nome:
+            raise ValueError(f"Estágio repetido: {estagio.nome}")
+        por_nome[estagio.nome] = estagio
+
+    visitados, caminho = set(), []
+
+    def visitar(nome):
+        if nome in caminho:
+            raise ValueError(f"Estágios em ciclo: {' -> '.join(caminho + [nome])}")
+        if nome in visitados:
+            return
+        if nome not in por_nome:
+            raise ValueError(f"Estágio desconhecido: {nome} (entrada de {caminho[-1]})")
+        caminho.append(nome)
+        for entrada in por_nome[nome].entradas:
+            visitar(entrada)
+        caminho.pop()
+        visitados.add(nome)
+
+    for nome in por_nome:
+        visitar(nome)
+    return por_nome
+
+
+def executar_estagios(estagios: list[Estagio], pasta: Path, processos: int = 1) -> dict:
+    """
+    Executa o grafo de estágios, com checkpoints em pasta. Cada estágio
+    roda quando as suas entradas estão prontas, e estágios independentes
+    rodam ao mesmo tempo (com processos > 1, em um pool de processos). Um
+    estágio cuja chave não mudou é pulado e a saída dele só é lida do
+    checkpoint se um estágio seguinte precisar rodar.
+
+    Se um estágio falha, os que já estavam rodando terminam (e gravam os
+    seus checkpoints) antes de o erro ser levantado: a próxima execução
+    retoma do estágio que falhou.
+
+    Returns: dict: {nome: saída} dos estágios finais (sem dependentes).
+    """
+    por_nome = _ordenar(estagios)
+    checkpoints = Checkpoints(pasta)
+    pendentes = dict(por_nome)
+    chaves, saidas = {}, {}
+    rodando = {}
+    erro = None
+
+    def saida(nome):
+        if nome not in saidas:
+            saidas[nome] = checkpoints.carregar(nome)
+        return saidas[nome]
+
+    def reaproveitar(estagio: Estagio, chave: str) -> bool:
+        if not estagio.cache or checkpoints.chave(estagio.nome) != chave:
+            return False
+        if estagio.valido is None:
+            return True
+        try:
+            return bool(estagio.valido(saida(estagio.nome)))
+        except (OSError, pickle.UnpicklingError, EOFError):
+            saidas.pop(estagio.nome, None)
+            return False
+
+    local = _ExecutorLocal()
+    executor = ProcessPoolExecutor(processos) if processos > 1 else local
+    with executor:
+        while pendentes or rodando:
+            # Inicia tudo o que já tem as entradas prontas
+            liberou = erro is None
+            while liberou:
+                liberou = False
+                for nome, estagio in list(pendentes.items()):
+                    if any(entrada not in chaves for entrada in estagio.entradas):
+                        continue
+                    del pendentes[nome]
+                    chave = _hash(
+                        VERSAO_CHECKPOINT,
+                        nome,
+                        estagio.versao,
+                        [chaves[entrada] for entrada in estagio.entradas],
+                        [assinatura_arquivo(arquivo) for arquivo in estagio.arquivos],
+                    )
+                    if reaproveitar(estagio, chave):
+                        log(
+                            f"[ESTÁGIOS] {nome}: sem alterações, checkpoint reaproveitado"
+                        )
+                        chaves[nome] = chave
+                        liberou = True
+                        continue
+                    log(f"[ESTÁGIOS] {nome} iniciado...")
+                    argumentos = [saida(entrada) for entrada in estagio.entradas]
+                    futuro = (local if estagio.local else executor).submit(
+                        _cronometrar, estagio.funcao, *argumentos
+                    )
+                    rodando[futuro] = (estagio, chave)
+
+            if not rodando:
+                break
+
+            prontos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                estagio, chave = rodando.pop(futuro)
+                try:
+                    resultado, segundos = futuro.result()
+                except Exception as e:
+                    log(f"[ESTÁGIOS] {estagio.nome} falhou: {e}")
+                    erro = erro or e
+                    continue
+
+                if estagio.cache:
+                    checkpoints.gravar(estagio.nome, chave, resultado)
+                else:
+                    chave = _hash(chave, resultado)
+                chaves[estagio.nome] = chave
+                saidas[estagio.nome] = resultado
+                log(f"[ESTÁGIOS] {estagio.nome} em {segundos:.2f} segundos.")
+
+    if erro is not None:
+        raise erro
+
+    usados = {entrada for estagio in estagios for entrada in estagio.entradas}
+    return {nome: saida(nome) for nome in por_nome if nome not in usados}
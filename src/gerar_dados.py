@@ -0,0 +1,439 @@
+import argparse
+import json
+import random
+import string
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from openpyxl import Workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.datavalidation import DataValidation
+
+import relatorio_garantias
+import relatorio_project_room
+from config import MAPEAMENTO_COLUNAS
+
+# Tamanhos padrão das massas (linhas da extração de incidentes)
+TAMANHOS = (1_000, 10_000, 100_000, 500_000)
+
+# Versão do formato da massa: uma massa gerada com outra versão é refeita
+VERSAO = 1
+
+# Registro da massa gerada (linhas, semente e versão), na pasta da massa
+NOME_REGISTRO = "massa.json"
+
+# Situações do Jira e seus pesos: a maior parte da extração já está
+# resolvida ou finalizada, como nas exportações reais
+SITUACOES = {
+    "Finalizado": 45,
+    "Resolvido": 22,
+    "Em andamento": 10,
+    "Aguardando cliente": 8,
+    "Aberto": 6,
+    "Cancelado": 5,
+    "Em homologação": 3,
+    "Reaberto": 1,
+}
+RESOLVIDAS = {"Finalizado", "Resolvido"}
+
+PRIORIDADES = {"Highest": 3, "High": 12, "Medium": 55, "Low": 25, "Lowest": 5}
+
+# Colunas da extração do Jira: as do MAPEAMENTO_COLUNAS e algumas que o
+# relatório não usa
+CABECALHO_JIRA = list(dict.fromkeys(MAPEAMENTO_COLUNAS.values())) + [
+    "Rótulos",
+    "Sprint",
+    "Atualizado(a)",
+]
+
+CABECALHO_PROJETOS_JIRA = [
+    "Chave",
+    "Resumo",
+    "Situação",
+    "Responsável",
+    "Criado",
+    "Data limite",
+    "Atualizado(a)",
+]
+
+# Cabeçalho das abas do relatório: uma coluna por campo do Jira (o
+# primeiro nome do MAPEAMENTO_COLUNAS de cada campo), seguida das colunas
+# calculadas até BF
+CABECALHO_RELATORIO = list(
+    {
+        origem: destino for destino, origem in reversed(MAPEAMENTO_COLUNAS.items())
+    }.values()
+)
+CABECALHO_RELATORIO.sort(key=list(MAPEAMENTO_COLUNAS).index)
+ULTIMA_COLUNA = 58  # BF
+
+COLUNAS_DATA = {
+    "CRIADO",
+    "DATA RESOLUÇÃO",
+    "DATA FECHAMENTO",
+    "DATA PREV. TER. ANÁLISE",
+    "DATA PREV. INI. HOMOLOGAÇAÕ",
+    "DATA PREV. TER. DESENVOLVIMENTO",
+    "DATA PREV. INI. PRODUÇÃO",
+}
+
+# Fórmulas das colunas calculadas ({r}: linha; {NOME}: letra da coluna),
+# repetidas até completar o bloco até BF
+FORMULAS = [
+    ("ANO ABERTURA", '=IF({CRIADO}{r}="","",YEAR({CRIADO}{r}))'),
+    ("MÊS ABERTURA", '=IF({CRIADO}{r}="","",TEXT({CRIADO}{r},"mm/aaaa"))'),
+    (
+        "DIAS EM ABERTO",
+        '=IF({CRIADO}{r}="","",IF({RESOLVIDO}{r}="",TODAY(),{RESOLVIDO}{r})-{CRIADO}{r})',
+    ),
+    (
+        "RESOLVIDO?",
+        '=IF(OR({STATUS}{r}="Resolvido",{STATUS}{r}="Finalizado"),"Sim","Não")',
+    ),
+    ("SLA", '=IF({DIAS}{r}="","",IF({DIAS}{r}>5,"Fora","Dentro"))'),
+    (
+        "FAIXA AGING",
+        '=IF({DIAS}{r}="","",IF({DIAS}{r}<=2,"0-2",IF({DIAS}{r}<=7,"3-7",">7")))',
+    ),
+    (
+        "PESO PRIORIDADE",
+        '=IFERROR(MATCH({PRIORIDADE}{r},{{"Highest","High","Medium","Low","Lowest"}},0),0)',
+    ),
+    ("OCORRÊNCIA DA CHAVE", "=COUNTIF($A$2:A{r},A{r})"),
+    ("TAMANHO DESCRIÇÃO", "=LEN({DESCRICAO}{r})"),
+    ("SEMANA", '=IF({CRIADO}{r}="","",WEEKNUM({CRIADO}{r}))'),
+    ("CHAVE + STATUS", '=A{r}&" - "&{STATUS}{r}'),
+]
+
+PALAVRAS = (
+    "erro sistema usuário acesso relatório integração falha tela cadastro "
+    "processamento lentidão pedido cliente faturamento nota fiscal boleto "
+    "pagamento contrato ambiente produção homologação servidor banco dados "
+    "consulta timeout permissão perfil senha login exportação planilha campo "
+    "obrigatório validação regra negócio ajuste correção evidência anexo "
+    "log mensagem retorno serviço api fila job agendamento rotina noturna"
+).split()
+
+# Quantidade de descrições distintas: as extrações reais repetem muito os
+# textos de modelo, e a tabela de strings compartilhadas fica realista
+DESCRICOES_DISTINTAS = 2_000
+
+BORDA = Border(*(Side(style="thin"),) * 4)
+PREENCHIMENTO_CALCULO = PatternFill("solid", fgColor="FFF2CC")
+PREENCHIMENTO_CABECALHO = PatternFill("solid", fgColor="1F4E78")
+
+
+def _descricoes(aleatorio: random.Random) -> list[str]:
+    """Descrições com tamanho assimétrico: a maioria curta, algumas enormes."""
+    textos = []
+    for _ in range(DESCRICOES_DISTINTAS):
+        tamanho = min(int(aleatorio.lognormvariate(5.7, 1.0)), 30_000)
+        palavras = []
+        total = 0
+        while total < tamanho:
+            palavra = aleatorio.choice(PALAVRAS)
+            palavras.append(palavra)
+            total += len(palavra) + 1
+        texto = " ".join(palavras).capitalize()
+        # Quebras de linha como nas descrições coladas do Jira
+        textos.append(texto.replace(" log ", "\nlog ", 3))
+    return textos
+
+
+def _duracao(aleatorio: random.Random) -> str:
+    horas = int(aleatorio.expovariate(1 / 30))
+    return f"{horas // 24}d {horas % 24}h {aleatorio.randrange(60)}m"
+
+
+def gerar_incidentes(
+    caminho: Path, linhas: int, semente: int, prefixo: str = "INC"
+) -> Path:
+    """
+    Grava uma extração de incidentes do Jira com linhas linhas (modo
+    write_only do openpyxl, memória constante).
+    """
+    aleatorio = random.Random(semente)
+    descricoes = _descricoes(aleatorio)
+    situacoes, pesos_situacao = zip(*SITUACOES.items())
+    prioridades, pesos_prioridade = zip(*PRIORIDADES.items())
+    grupos = [f"N{n} - {g}" for n in (1, 2, 3) for g in ("Sistemas", "Infra", "ERP")]
+    pessoas = [
+        "".join(aleatorio.choices(string.ascii_lowercase, k=6)).title()
+        + " "
+        + "".join(aleatorio.choices(string.ascii_lowercase, k=8)).title()
+        for _ in range(200)
+    ]
+    projetos = [f"PRJ-{n}" for n in range(1, 301)]
+    inicio = datetime(2023, 1, 2, 8)
+    indices = {nome: i for i, nome in enumerate(CABECALHO_JIRA)}
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Jira")
+    ws.append(CABECALHO_JIRA)
+
+    for n in range(linhas):
+        situacao = aleatorio.choices(situacoes, weights=pesos_situacao)[0]
+        criado = inicio + timedelta(minutes=n * 7 + aleatorio.randrange(60))
+        resolvido = None
+        if situacao in RESOLVIDAS:
+            resolvido = criado + timedelta(hours=aleatorio.expovariate(1 / 40))
+
+        linha = [None] * len(CABECALHO_JIRA)
+        linha[indices["Chave"]] = f"{prefixo}-{n + 1}"
+        linha[indices["Resumo"]] = f"{aleatorio.choice(PALAVRAS).title()} " + " ".join(
+            aleatorio.choices(PALAVRAS, k=aleatorio.randint(3, 9))
+        )
+        linha[indices["Descrição"]] = aleatorio.choice(descricoes)
+        linha[indices["Situação"]] = situacao
+        linha[indices["Tipo de Item"]] = aleatorio.choice(
+            ("Incidente", "Incidente", "Problema", "Requisição")
+        )
+        linha[indices["Prioridade"]] = aleatorio.choices(
+            prioridades, weights=pesos_prioridade
+        )[0]
+        linha[indices["Reaberto"]] = "Sim" if aleatorio.random() < 0.04 else "Não"
+        linha[indices["Criado"]] = criado
+        linha[indices["Usuário afetado"]] = aleatorio.choice(pessoas)
+        linha[indices["Resolvido"]] = resolvido
+        if situacao == "Finalizado":
+            linha[indices["Data do Fechamento"]] = resolvido + timedelta(days=2)
+            linha[indices["Tipo de fechamento"]] = aleatorio.choice(
+                ("Solucionado", "Contorno", "Sem retorno")
+            )
+        linha[indices["Solicitante"]] = aleatorio.choice(pessoas)
+        linha[indices["Grupo solucionador"]] = aleatorio.choice(grupos)
+        linha[indices["Responsável"]] = aleatorio.choice(pessoas)
+        linha[indices["Categoria"]] = aleatorio.choice(
+            ("Sistema", "Acesso", "Dúvida", "Dados")
+        )
+        if resolvido is not None:
+            linha[indices["Tempo de Solução"]] = _duracao(aleatorio)
+        linha[indices["Canal de Acionamento"]] = aleatorio.choice(
+            ("Portal", "E-mail", "Telefone")
+        )
+        linha[indices["Tempo até a primeira resposta"]] = _duracao(aleatorio)
+        if aleatorio.random() < 0.6:
+            linha[indices["Projeto relacionado"]] = aleatorio.choice(projetos)
+        linha[indices["IC - 1"]] = f"SIS-{aleatorio.randrange(80):03d}"
+        if aleatorio.random() < 0.3:
+            for campo, dias in (
+                ("Analise", 5),
+                ("Desenvolvimento", 15),
+                ("Homologação", 20),
+                ("Produção", 30),
+            ):
+                linha[indices[campo]] = criado + timedelta(days=dias)
+        linha[indices["Rótulos"]] = aleatorio.choice((None, "garantia", "urgente"))
+        linha[indices["Sprint"]] = f"Sprint {aleatorio.randint(1, 60)}"
+        linha[indices["Atualizado(a)"]] = (resolvido or criado) + timedelta(hours=1)
+        ws.append(linha)
+
+    wb.save(caminho)
+    return caminho
+
+
+def gerar_projetos(caminho: Path, linhas: int, semente: int) -> Path:
+    """Grava a extração de projetos do Jira (aba Projetos do relatório)."""
+    aleatorio = random.Random(semente)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Jira")
+    ws.append(CABECALHO_PROJETOS_JIRA)
+    inicio = datetime(2022, 6, 1)
+    for n in range(linhas):
+        criado = inicio + timedelta(days=n // 3)
+        ws.append(
+            [
+                f"PRJ-{n + 1}",
+                "Projeto " + " ".join(aleatorio.choices(PALAVRAS, k=3)),
+                aleatorio.choice(("Em andamento", "Garantia", "Encerrado")),
+                f"Gerente {aleatorio.randrange(30)}",
+                criado,
+                criado + timedelta(days=aleatorio.randint(30, 365)),
+                criado + timedelta(days=aleatorio.randint(0, 30)),
+            ]
+        )
+    wb.save(caminho)
+    return caminho
+
+
+def _letras() -> dict:
+    """Letra da coluna de cada campo usado nas fórmulas calculadas."""
+    letra = {
+        nome: get_column_letter(i) for i, nome in enumerate(CABECALHO_RELATORIO, 1)
+    }
+    letras = {
+        "CRIADO": letra["CRIADO"],
+        "RESOLVIDO": letra["DATA RESOLUÇÃO"],
+        "STATUS": letra["STATUS"],
+        "PRIORIDADE": letra["PRIORIDADE"],
+        "DESCRICAO": letra["DESCRIÇÃO"],
+    }
+    coluna_dias = (
+        len(CABECALHO_RELATORIO) + 1 + [n for n, _ in FORMULAS].index("DIAS EM ABERTO")
+    )
+    letras["DIAS"] = get_column_letter(coluna_dias)
+    return letras
+
+
+def _aba_relatorio(ws, linha_modelo: int, aleatorio: random.Random):
+    """
+    Monta uma aba do relatório: cabeçalho, linhas antigas acima da linha
+    modelo, a linha modelo (estilos e o bloco de fórmulas até BF), restos de
+    uma execução anterior abaixo dela, formatação condicional e validação.
+    """
+    letras = _letras()
+    calculadas = [
+        FORMULAS[i % len(FORMULAS)]
+        for i in range(ULTIMA_COLUNA - len(CABECALHO_RELATORIO))
+    ]
+    cabecalho = CABECALHO_RELATORIO + [
+        nome if i < len(FORMULAS) else f"{nome} ({i // len(FORMULAS) + 1})"
+        for i, (nome, _) in enumerate(calculadas)
+    ]
+
+    for coluna, nome in enumerate(cabecalho, 1):
+        cel = ws.cell(row=1, column=coluna, value=nome)
+        cel.font = Font(bold=True, color="FFFFFF")
+        cel.fill = PREENCHIMENTO_CABECALHO
+        cel.alignment = Alignment(horizontal="center", wrap_text=True)
+
+    # Histórico mantido acima da linha modelo
+    for linha in range(2, linha_modelo):
+        ws.cell(row=linha, column=1, value=f"HIST-{linha}")
+        ws.cell(row=linha, column=4, value=aleatorio.choice(list(SITUACOES)))
+        ws.cell(row=linha, column=8, value=datetime(2022, 1, 1) + timedelta(days=linha))
+
+    for coluna, nome in enumerate(cabecalho, 1):
+        cel = ws.cell(row=linha_modelo, column=coluna)
+        cel.border = BORDA
+        cel.alignment = Alignment(vertical="top")
+        if nome in COLUNAS_DATA:
+            cel.number_format = "dd/mm/yyyy hh:mm"
+        if coluna > len(CABECALHO_RELATORIO):
+            cel.fill = PREENCHIMENTO_CALCULO
+            _, formula = calculadas[coluna - len(CABECALHO_RELATORIO) - 1]
+            cel.value = formula.format(r=linha_modelo, **letras)
+
+    # Restos da execução anterior, removidos por preparar_destino
+    for linha in range(linha_modelo + 1, linha_modelo + 200):
+        for coluna in range(1, len(CABECALHO_RELATORIO) + 1):
+            ws.cell(row=linha, column=coluna, value=f"ant-{linha}")
+
+    status = letras["STATUS"]
+    ws.conditional_formatting.add(
+        f"{status}2:{status}1048576",
+        CellIsRule(
+            operator="equal",
+            formula=['"Aberto"'],
+            fill=PatternFill("solid", fgColor="F8CBAD"),
+        ),
+    )
+    validacao = DataValidation(type="list", formula1='"Sim,Não"', allow_blank=True)
+    ws.add_data_validation(validacao)
+    validacao.add(f"G2:G{linha_modelo + 5_000}")
+    ws.freeze_panes = "A2"
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(cabecalho))}1"
+
+
+def gerar_modelos(pasta: Path, semente: int = 42):
+    """
+    Grava os modelos dos relatórios de Garantias e de Project Room em pasta,
+    com as mesmas abas e linhas modelo usadas por relatorio_garantias e
+    relatorio_project_room.
+    """
+    aleatorio = random.Random(semente)
+    modelos = {
+        relatorio_garantias.NOME_RELATORIO: (
+            ("RI", 2),
+            ("Resolvidos-Fechados", 145),
+            ("Projetos", 2),
+        ),
+        relatorio_project_room.NOME_RELATORIO: (
+            ("Relatório de Incidentes", 2),
+            ("Resolvidos-Fechados", 347),
+        ),
+    }
+    for nome_arquivo, abas in modelos.items():
+        wb = Workbook()
+        capa = wb.active
+        capa.title = "Capa"
+        capa["A1"] = "Relatório de Incidentes"
+        capa["A2"] = "Gerado em"
+        capa["B2"] = "=TODAY()"
+        for linha, (nome, linha_modelo) in enumerate(abas, 3):
+            if nome == "Projetos":
+                ws = wb.create_sheet(nome)
+                for coluna, campo in enumerate(CABECALHO_PROJETOS_JIRA[:6], 1):
+                    ws.cell(row=1, column=coluna, value=campo).font = Font(bold=True)
+                    ws.cell(row=2, column=coluna).border = BORDA
+                ws["E2"].number_format = ws["F2"].number_format = "dd/mm/yyyy"
+            else:
+                _aba_relatorio(wb.create_sheet(nome), linha_modelo, aleatorio)
+            capa.cell(row=linha, column=1, value=nome)
+            capa.cell(row=linha, column=2, value=f"=COUNTA('{nome}'!A:A)-1")
+        wb.save(pasta / nome_arquivo)
+
+
+def gerar_massa(pasta: Path, linhas: int, semente: int = 42) -> Path:
+    """
+    Gera em pasta uma massa completa no formato da pasta data: extrações do
+    Jira em uploads e os modelos dos relatórios. Se a pasta já tiver a
+    massa com as mesmas linhas e semente, as extrações são mantidas e só os
+    modelos são regravados (o relatório é salvo sobre o modelo).
+    """
+    pasta.mkdir(parents=True, exist_ok=True)
+    uploads = pasta / "uploads"
+    uploads.mkdir(exist_ok=True)
+
+    registro = {"versao": VERSAO, "linhas": linhas, "semente": semente}
+    caminho_registro = pasta / NOME_REGISTRO
+    try:
+        with open(caminho_registro, encoding="utf-8") as arquivo:
+            atual = json.load(arquivo) == registro
+    except (OSError, ValueError):
+        atual = False
+
+    if not atual:
+        caminho_registro.unlink(missing_ok=True)
+        gerar_incidentes(uploads / "Filtro Incidentes (Jira).xlsx", linhas, semente)
+        gerar_incidentes(
+            uploads / "Project Room (Jira).xlsx", linhas, semente + 1, prefixo="PR"
+        )
+        gerar_projetos(
+            uploads / "Projetos (Jira).xlsx", max(linhas // 10, 50), semente + 2
+        )
+        with open(caminho_registro, "w", encoding="utf-8") as arquivo:
+            json.dump(registro, arquivo)
+
+    gerar_modelos(pasta, semente)
+    return pasta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera massas sintéticas (extrações do Jira e modelos dos relatórios)."
+    )
+    parser.add_argument("pasta", type=Path, help="pasta de destino")
+    parser.add_argument(
+        "--linhas",
+        type=int,
+        nargs="+",
+        default=[TAMANHOS[0]],
+        help=f"linhas da extração de incidentes (ex.: {' '.join(map(str, TAMANHOS))})",
+    )
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    for linhas in args.linhas:
+        # Com vários tamanhos, uma subpasta por tamanho
+        pasta = args.pasta / str(linhas) if len(args.linhas) > 1 else args.pasta
+        gerar_massa(pasta, linhas, args.semente)
+        print(f"Massa de {linhas} linhas em {pasta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1172 @@
+import os
+import re
+import shutil
+import struct
+import tempfile
+import warnings
+import zipfile
+import zlib
+from collections import defaultdict
+from copy import copy
+from functools import partial
+from datetime import datetime
+from math import isfinite
+from pathlib import Path
+from posixpath import dirname, join, normpath
+from weakref import WeakKeyDictionary
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl import load_workbook
+from openpyxl.cell._writer import etree_write_cell
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE, TIME_FORMATS, Cell
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.cell_style import CellStyle
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.worksheet._reader import ROW_TAG, WorkSheetParser
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from openpyxl.xml.functions import tostring
+
+from config import GRAVACAO_PARCIAL
+from utils import log
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PACOTE = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+TIPO_DOCUMENTO = "/officeDocument"
+TIPO_CALC_CHAIN = "/calcChain"
+
+# Tamanho do bloco copiado entre os zips
+TAMANHO_BLOCO_COPIA = 1024 * 1024
+
+# Cabeçalho local de um membro do zip (assinatura + 26 bytes fixos)
+TAMANHO_CABECALHO_LOCAL = 30
+
+# Tamanho máximo de texto em uma célula do Excel
+LIMITE_TEXTO = 32767
+
+REGEX_SHEET_DATA = re.compile(rb"<sheetData\b[^>]*?(?:/>|>.*?</sheetData>)", re.S)
+REGEX_DIMENSAO = re.compile(rb"<dimension\b[^>]*?/>")
+REGEX_MESCLAGENS = re.compile(rb"<mergeCells\b[^>]*?(?:/>|>.*?</mergeCells>)", re.S)
+REGEX_FORMATACAO = re.compile(
+    rb"<conditionalFormatting\b[^>]*?(?:/>|>.*?</conditionalFormatting>)", re.S
+)
+REGEX_VALIDACOES = re.compile(
+    rb"<dataValidations\b[^>]*?(?:/>|>.*?</dataValidations>)", re.S
+)
+REGEX_VALIDACAO = re.compile(
+    rb"<dataValidation\b[^>]*?(?:/>|>.*?</dataValidation>)", re.S
+)
+REGEX_SQREF = re.compile(rb'\bsqref="([^"]*)"')
+REGEX_CONTAGEM = re.compile(rb'\bcount="\d+"')
+REGEX_CELL_XFS = re.compile(rb"<cellXfs\b[^>]*?(?:/>|>.*?</cellXfs>)", re.S)
+REGEX_NUM_FMTS = re.compile(rb"<numFmts\b[^>]*?(?:/>|>.*?</numFmts>)", re.S)
+REGEX_INICIO_ESTILOS = re.compile(rb"<styleSheet\b[^>]*>")
+# Atributo de estilo (s="...") de <c> e <row>, para renumerar estilos
+REGEX_ESTILO_CELULA = re.compile(rb'(<(?:c|row)\b[^>]*?\ss=")(\d+)')
+REGEX_CALC_PR = re.compile(rb"<calcPr\b[^>]*?/>")
+REGEX_FULL_CALC = re.compile(rb'\sfullCalcOnLoad="[^"]*"')
+
+# Elementos que vêm depois de <calcPr> em workbook.xml
+REGEX_APOS_CALC_PR = re.compile(
+    rb"<(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|"
+    rb"webPublishing|fileRecoveryPr|webPublishObjects|extLst)\b|</workbook>"
+)
+
+
+def _caminho_parte(origem: str, alvo: str) -> str:
+    """Resolve o Target de um relacionamento a partir da parte de origem."""
+    if alvo.startswith("/"):
+        return alvo[1:]
+    return normpath(join(dirname(origem), alvo))
+
+
+def _arquivo_rels(parte: str) -> str:
+    return join(dirname(parte), "_rels", parte.rsplit("/", 1)[-1] + ".rels")
+
+
+class _Pacote:
+    """
+    Estrutura do .xlsx modelo: parte do workbook, partes de cada aba (na
+    ordem do workbook), estilos e calcChain.
+    """
+
+    def __init__(self, zin: zipfile.ZipFile):
+        raiz = ElementTree.fromstring(zin.read("_rels/.rels"))
+        self.workbook = next(
+            _caminho_parte("", rel.get("Target"))
+            for rel in raiz.iter(f"{NS_PACOTE}Relationship")
+            if rel.get("Type", "").endswith(TIPO_DOCUMENTO)
+        )
+        self.rels = _arquivo_rels(self.workbook)
+
+        alvos = {}
+        self.estilos = self.calc_chain = None
+        for rel in ElementTree.fromstring(zin.read(self.rels)):
+            parte = _caminho_parte(self.workbook, rel.get("Target"))
+            alvos[rel.get("Id")] = parte
+            tipo = rel.get("Type", "")
+            if tipo.endswith("/styles"):
+                self.estilos = parte
+            elif tipo.endswith(TIPO_CALC_CHAIN):
+                self.calc_chain = parte
+
+        raiz = ElementTree.fromstring(zin.read(self.workbook))
+        self.abas = {
+            aba.get("name"): alvos[aba.get(f"{NS_REL}id")]
+            for aba in raiz.iter(f"{NS_MAIN}sheet")
+        }
+
+
+class _EstilosModelo:
+    """Contagens e formatos numéricos do styles.xml do modelo."""
+
+    def __init__(self, xml: bytes):
+        raiz = ElementTree.fromstring(xml)
+
+        def contar(tag):
+            elemento = raiz.find(f"{NS_MAIN}{tag}")
+            return 0 if elemento is None else len(elemento)
+
+        self.fontes = contar("fonts")
+        self.preenchimentos = contar("fills")
+        self.bordas = contar("borders")
+        self.estilos_nomeados = contar("cellStyleXfs")
+        self.xfs = contar("cellXfs")
+        self.formatos = {
+            fmt.get("formatCode"): int(fmt.get("numFmtId"))
+            for fmt in raiz.iter(f"{NS_MAIN}numFmt")
+        }
+        self.novos_formatos = {}
+
+
+def _descrever_estilo(wb, estilo) -> tuple:
+    """
+    Descrição de um estilo do wb que não depende dos índices internos do
+    openpyxl (formato numérico personalizado pelo código, alinhamento e
+    proteção pelos objetos): comparável e serializável entre processos.
+    """
+    numero, codigo = estilo.numFmtId, None
+    if numero >= BUILTIN_FORMATS_MAX_SIZE:
+        numero, codigo = None, wb._number_formats[numero - BUILTIN_FORMATS_MAX_SIZE]
+    return (
+        estilo.fontId,
+        estilo.fillId,
+        estilo.borderId,
+        estilo.xfId,
+        estilo.quotePrefix,
+        estilo.pivotButton,
+        numero,
+        codigo,
+        wb._alignments[estilo.alignmentId] if estilo.alignmentId else None,
+        wb._protections[estilo.protectionId] if estilo.protectionId else None,
+    )
+
+
+def _xf_novo(descricao: tuple, modelo: _EstilosModelo) -> bytes:
+    """
+    Serializa um estilo criado durante o processamento (ver
+    _descrever_estilo) como <xf>, apontando para fontes, preenchimentos e
+    bordas que já existem no modelo. Formatos numéricos novos ficam em
+    modelo.novos_formatos.
+    """
+    (
+        fonte,
+        preenchimento,
+        borda,
+        nomeado,
+        prefixo,
+        botao,
+        numero,
+        codigo,
+        alinhamento,
+        protecao,
+    ) = descricao
+    if (
+        fonte >= modelo.fontes
+        or preenchimento >= modelo.preenchimentos
+        or borda >= modelo.bordas
+        or nomeado >= max(modelo.estilos_nomeados, 1)
+    ):
+        raise ValueError("estilo com fonte, preenchimento ou borda nova")
+
+    if codigo is not None:
+        if codigo not in modelo.formatos:
+            proximo = max(
+                modelo.formatos.values(), default=BUILTIN_FORMATS_MAX_SIZE - 1
+            )
+            modelo.formatos[codigo] = modelo.novos_formatos[codigo] = proximo + 1
+        numero = modelo.formatos[codigo]
+    xf = CellStyle(
+        numFmtId=numero,
+        fontId=fonte,
+        fillId=preenchimento,
+        borderId=borda,
+        xfId=nomeado,
+        quotePrefix=prefixo,
+        pivotButton=botao,
+    )
+    if alinhamento is not None:
+        xf.alignment = alinhamento
+    if protecao is not None:
+        xf.protection = protecao
+    return tostring(xf.to_tree())
+
+
+def _acrescentar_estilos(xml: bytes, modelo: _EstilosModelo, estilos: list) -> bytes:
+    """
+    Acrescenta ao <cellXfs> do modelo os estilos criados no processamento
+    (descrições, ver _descrever_estilo), na ordem dos índices.
+    """
+    novos = [_xf_novo(descricao, modelo) for descricao in estilos]
+    trecho = REGEX_CELL_XFS.search(xml)
+    if trecho is None or trecho.group().endswith(b"/>"):
+        raise ValueError("styles.xml sem <cellXfs>")
+
+    bloco = trecho.group()
+    fim = bloco.rindex(b"</cellXfs>")
+    bloco = bloco[:fim] + b"".join(novos) + bloco[fim:]
+    bloco = REGEX_CONTAGEM.sub(
+        f'count="{modelo.xfs + len(novos)}"'.encode(), bloco, count=1
+    )
+    xml = xml[: trecho.start()] + bloco + xml[trecho.end() :]
+
+    if modelo.novos_formatos:
+        xml = _acrescentar_formatos(xml, modelo)
+    return xml
+
+
+def _acrescentar_formatos(xml: bytes, modelo: _EstilosModelo) -> bytes:
+    """Acrescenta ao <numFmts> do modelo (ou cria) os formatos numéricos novos."""
+    novos = b"".join(
+        f"<numFmt numFmtId={quoteattr(str(num))} formatCode={quoteattr(codigo)}/>".encode()
+        for codigo, num in modelo.novos_formatos.items()
+    )
+    total = f'count="{len(modelo.formatos)}"'.encode()
+
+    trecho = REGEX_NUM_FMTS.search(xml)
+    if trecho is None or trecho.group().endswith(b"/>"):
+        # Sem <numFmts>: cria o elemento, que é o primeiro do styleSheet
+        if trecho is None:
+            trecho = REGEX_INICIO_ESTILOS.search(xml)
+            if trecho is None:
+                raise ValueError("styles.xml sem <styleSheet>")
+            ini = fim = trecho.end()
+        else:
+            ini, fim = trecho.span()
+        bloco = b"<numFmts " + total + b">" + novos + b"</numFmts>"
+        return xml[:ini] + bloco + xml[fim:]
+
+    bloco = trecho.group()
+    fim = bloco.rindex(b"</numFmts>")
+    bloco = REGEX_CONTAGEM.sub(total, bloco[:fim] + novos + bloco[fim:], count=1)
+    return xml[: trecho.start()] + bloco + xml[trecho.end() :]
+
+
+class _ColetorXml:
+    """Recebe os elementos gerados por etree_write_cell como texto XML."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, elemento):
+        self.partes.append(tostring(elemento, encoding="unicode"))
+
+
+def _atributos_linha(ws, linha: int) -> str:
+    """Atributos do <row> (altura, oculta etc.) vindos de ws.row_dimensions."""
+    dimensao = ws.row_dimensions.get(linha)
+    if dimensao is None:
+        return ""
+    return "".join(f' {chave}="{valor}"' for chave, valor in dimensao)
+
+
+def _resolver_estilos(ws):
+    """
+    Registra em wb._cell_styles os estilos usados pela aba antes da gravação,
+    para que o styles.xml possa ser montado antes das abas.
+    """
+    for celula in ws._cells.values():
+        if celula.has_style:
+            celula.style_id
+    for dimensao in ws.row_dimensions.values():
+        dict(dimensao)
+
+
+def _escrever_linhas(ws, destino, escritor=None):
+    """
+    Grava o <sheetData> da aba em destino (strings inline, como o openpyxl).
+    Com um EscritorAba, as linhas dele entram no lugar das linhas do ws
+    entre escritor.inicio e escritor.ultima.
+    """
+    linhas = defaultdict(list)
+    for (linha, _), celula in sorted(ws._cells.items()):
+        linhas[linha].append(celula)
+    for linha in ws.row_dimensions.keys() - linhas.keys():
+        linhas[linha] = []
+    linhas = sorted(linhas.items())
+
+    coletor = _ColetorXml()
+
+    def gravar(selecionadas):
+        for linha, celulas in selecionadas:
+            coletor.partes.append(f'<row r="{linha}"{_atributos_linha(ws, linha)}>')
+            for celula in celulas:
+                if celula._value is None and not celula.has_style:
+                    continue
+                etree_write_cell(coletor, ws, celula, celula.has_style)
+            coletor.partes.append("</row>")
+            destino.write("".join(coletor.partes).encode())
+            coletor.partes.clear()
+
+    destino.write(b"<sheetData>")
+    if escritor is None or not len(escritor):
+        gravar(linhas)
+    else:
+        gravar(item for item in linhas if item[0] < escritor.inicio)
+        escritor.copiar_para(destino)
+        gravar(item for item in linhas if item[0] > escritor.ultima)
+    destino.write(b"</sheetData>")
+
+    # Links já estão no XML do modelo (ver _montar_aba)
+    ws._hyperlinks = []
+
+
+def _dimensao(ws, escritor=None) -> str:
+    """Intervalo ocupado pela aba (ref de <dimension>), contando o escritor."""
+    if escritor is None or not len(escritor):
+        return ws.calculate_dimension()
+
+    chaves = [
+        chave
+        for chave in ws._cells
+        if not escritor.inicio <= chave[0] <= escritor.ultima
+    ]
+    linhas = [linha for linha, _ in chaves] + [escritor.inicio, escritor.ultima]
+    colunas = [coluna for _, coluna in chaves]
+    if escritor.min_coluna is not None:
+        colunas += [escritor.min_coluna, escritor.max_coluna]
+    if not colunas:
+        colunas = [1]
+    return (
+        f"{get_column_letter(min(colunas))}{min(linhas)}:"
+        f"{get_column_letter(max(colunas))}{max(linhas)}"
+    )
+
+
+def _intervalos(sqref: bytes) -> list[str]:
+    return [CellRange(parte).coord for parte in sqref.decode().split()]
+
+
+def _filtrar_intervalos(xml: bytes, regex, atuais: set[str]) -> tuple[bytes, int]:
+    """
+    Mantém nos elementos (formatação condicional ou validação) só os
+    intervalos que continuam na aba; elementos sem intervalo são removidos.
+    """
+    partes, inicio, mantidos, originais = [], 0, 0, set()
+    for trecho in regex.finditer(xml):
+        elemento = trecho.group()
+        sqref = REGEX_SQREF.search(elemento)
+        intervalos = _intervalos(sqref.group(1)) if sqref else []
+        originais.update(intervalos)
+        restantes = [i for i in intervalos if i in atuais]
+
+        partes.append(xml[inicio : trecho.start()])
+        if restantes:
+            novo = " ".join(restantes).encode()
+            partes.append(elemento[: sqref.start(1)] + novo + elemento[sqref.end(1) :])
+            mantidos += 1
+        inicio = trecho.end()
+    partes.append(xml[inicio:])
+
+    if not atuais <= originais:
+        raise ValueError("intervalos novos de formatação ou validação")
+    return b"".join(partes), mantidos
+
+
+def _montar_aba(ws, xml: bytes, escritor=None) -> tuple[bytes, bytes]:
+    """
+    Monta o XML da aba a partir do XML do modelo, trocando só o que o
+    processamento altera: dimensão, mesclagens, formatações condicionais e
+    validações. Devolve o XML antes e depois do <sheetData>, que é gravado
+    à parte (ver _escrever_linhas). O resto (layout, impressão, desenhos,
+    relacionamentos) segue como está no modelo.
+    """
+    trecho = REGEX_SHEET_DATA.search(xml)
+    if trecho is None:
+        raise ValueError(f"aba {ws.title} sem <sheetData>")
+    antes, xml = xml[: trecho.start()], xml[trecho.end() :]
+
+    antes = REGEX_DIMENSAO.sub(
+        f'<dimension ref="{_dimensao(ws, escritor)}"/>'.encode(), antes, count=1
+    )
+
+    mesclagens = sorted(r.coord for r in ws.merged_cells.ranges)
+    trecho = REGEX_MESCLAGENS.search(xml)
+    if trecho is None:
+        if mesclagens:
+            raise ValueError(f"aba {ws.title} com mesclagens novas")
+    else:
+        novo = b""
+        if mesclagens:
+            novo = f'<mergeCells count="{len(mesclagens)}">'.encode()
+            novo += b"".join(f'<mergeCell ref="{r}"/>'.encode() for r in mesclagens)
+            novo += b"</mergeCells>"
+        xml = xml[: trecho.start()] + novo + xml[trecho.end() :]
+
+    formatacoes = {
+        intervalo.coord
+        for cf in ws.conditional_formatting
+        for intervalo in cf.sqref.ranges
+    }
+    xml, _ = _filtrar_intervalos(xml, REGEX_FORMATACAO, formatacoes)
+
+    validacoes = {
+        intervalo.coord
+        for dv in ws.data_validations.dataValidation
+        for intervalo in dv.sqref.ranges
+    }
+    trecho = REGEX_VALIDACOES.search(xml)
+    if trecho is None:
+        if validacoes:
+            raise ValueError(f"aba {ws.title} com validações novas")
+    else:
+        bloco, mantidas = _filtrar_intervalos(
+            trecho.group(), REGEX_VALIDACAO, validacoes
+        )
+        bloco = (
+            REGEX_CONTAGEM.sub(f'count="{mantidas}"'.encode(), bloco, count=1)
+            if mantidas
+            else b""
+        )
+        xml = xml[: trecho.start()] + bloco + xml[trecho.end() :]
+
+    return antes, xml
+
+
+def _recalcular_ao_abrir(xml: bytes) -> bytes:
+    """Liga fullCalcOnLoad no workbook.xml (fórmulas gravadas sem valor)."""
+    trecho = REGEX_CALC_PR.search(xml)
+    if trecho is not None:
+        calc_pr = REGEX_FULL_CALC.sub(b"", trecho.group())
+        calc_pr = calc_pr[:-2].rstrip() + b' fullCalcOnLoad="1"/>'
+        return xml[: trecho.start()] + calc_pr + xml[trecho.end() :]
+
+    trecho = REGEX_APOS_CALC_PR.search(xml)
+    if trecho is None:
+        raise ValueError("workbook.xml sem </workbook>")
+    return (
+        xml[: trecho.start()] + b'<calcPr fullCalcOnLoad="1"/>' + xml[trecho.start() :]
+    )
+
+
+def _sem_calc_chain(xml: bytes, parte: str, regex_elemento: bytes) -> bytes:
+    """Remove de um XML de relacionamentos/tipos o elemento que cita parte."""
+    nome = re.escape(parte.rsplit("/", 1)[-1].encode())
+    return re.sub(
+        rb"<" + regex_elemento + rb"\b[^>]*?" + nome + rb'"[^>]*?/>', b"", xml
+    )
+
+
+def _acrescentar_membro(
+    zout: zipfile.ZipFile, info: zipfile.ZipInfo, origem, tamanho: int
+):
+    """
+    Grava no zip um membro já comprimido: o cabeçalho local de info (com
+    CRC e tamanhos preenchidos) e tamanho bytes lidos de origem.
+    """
+    # Tamanhos e CRC vão no cabeçalho local, sem data descriptor
+    info.flag_bits &= ~0x08
+    info.header_offset = zout.fp.tell()
+    zout.fp.write(info.FileHeader())
+
+    restante = tamanho
+    while restante:
+        bloco = origem.read(min(restante, TAMANHO_BLOCO_COPIA))
+        if not bloco:
+            raise ValueError(f"membro truncado: {info.filename}")
+        zout.fp.write(bloco)
+        restante -= len(bloco)
+
+    zout.filelist.append(info)
+    zout.NameToInfo[info.filename] = info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def _copiar_membro(origem, zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Copia um membro do zip modelo byte a byte (já comprimido), sem
+    descompactar: só o cabeçalho local é reescrito.
+    """
+    if info.flag_bits & 0x1:
+        raise ValueError(f"membro criptografado: {info.filename}")
+
+    origem.seek(info.header_offset)
+    cabecalho = origem.read(TAMANHO_CABECALHO_LOCAL)
+    if cabecalho[:4] != zipfile.stringFileHeader:
+        raise ValueError(f"cabeçalho inválido: {info.filename}")
+    tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho[26:30])
+    origem.seek(tamanho_nome + tamanho_extra, os.SEEK_CUR)
+
+    _acrescentar_membro(zout, copy(info), origem, info.compress_size)
+
+
+class EscritorAba:
+    """
+    Grava as linhas geradas a partir de uma ModeloLinha direto como XML
+    (<row>) em um arquivo temporário, sem criar células no openpyxl: a
+    memória não cresce com a quantidade de linhas. Índices de estilo e
+    fórmulas da linha modelo são resolvidos uma única vez.
+
+    Na gravação (gravar_abas_alteradas), o arquivo entra no <sheetData> da
+    aba no lugar das linhas a partir de linha_inicial. Valores que não são
+    texto, número ou data passam por uma célula temporária do openpyxl, com
+    o mesmo resultado de aplicar().
+    """
+
+    def __init__(self, modelo, linha_inicial: int):
+        self.modelo = modelo
+        self.ws = modelo.ws
+        self.inicio = self.proxima = linha_inicial
+        self.min_coluna = self.max_coluna = None
+
+        wb = self.ws.parent
+        self._estilos = wb._cell_styles
+        self._epoch = wb.epoch
+        self._ids_data = set()
+        self._estilos_data = {}
+        self._coletor = _ColetorXml()
+        self._arquivo = tempfile.TemporaryFile()
+
+        # (índice na origem ou None, coluna, letra, valor do modelo, é
+        # fórmula, StyleArray, atributo s="...", formato é data)
+        self._plano = tuple(
+            (
+                src,
+                col,
+                get_column_letter(col),
+                valor,
+                formula,
+                estilo,
+                self._atributo_estilo(estilo, eh_data),
+                eh_data,
+            )
+            for src, col, valor, formula, estilo, eh_data in modelo._plano
+        )
+
+        # Células que já estão nas linhas a sobrescrever (ex.: a linha
+        # modelo) em colunas fora do plano continuam, como em aplicar()
+        colunas = {item[1] for item in self._plano}
+        self._restantes = defaultdict(list)
+        for (linha, col), celula in sorted(self.ws._cells.items()):
+            if linha >= linha_inicial and col not in colunas:
+                self._restantes[linha].append(celula)
+
+        anterior = _ESCRITORES.get(self.ws)
+        if anterior is not None:
+            anterior.fechar()
+        _ESCRITORES[self.ws] = self
+
+    def __len__(self):
+        return self.proxima - self.inicio
+
+    @property
+    def ultima(self) -> int:
+        return self.proxima - 1
+
+    def _atributo_estilo(self, estilo, eh_data: bool) -> str:
+        if estilo is None:
+            return ""
+        idx = self._estilos.add(estilo)
+        if eh_data:
+            self._ids_data.add(idx)
+        return f' s="{idx}"'
+
+    def _estilo_data(self, col: int, estilo, tipo) -> str:
+        chave = (col, tipo)
+        if chave not in self._estilos_data:
+            self._estilos_data[chave] = self._atributo_estilo(
+                self.modelo._estilo_data(col, estilo, tipo), True
+            )
+        return self._estilos_data[chave]
+
+    def _celula(self, linha: int, col: int, valor, estilo, eh_data: bool) -> str:
+        """Serializa o valor por uma célula do openpyxl (tipos menos comuns)."""
+        tipo = type(valor)
+        if tipo in TIME_FORMATS and not eh_data:
+            estilo = self.modelo._estilo_data(col, estilo, tipo)
+
+        celula = Cell(self.ws, row=linha, column=col)
+        if estilo is not None:
+            celula._style = estilo
+        celula.value = valor
+        if celula.data_type == "d":
+            self._ids_data.add(celula.style_id)
+
+        etree_write_cell(self._coletor, self.ws, celula, celula.has_style)
+        xml = "".join(self._coletor.partes)
+        self._coletor.partes.clear()
+        return xml
+
+    def escrever(self, linha_origem: tuple = ()):
+        """
+        Grava a próxima linha: a linha modelo com os valores de linha_origem
+        nas colunas do plano (como ModeloLinha.aplicar).
+        """
+        linha = self.proxima
+        self.proxima += 1
+        tamanho = len(linha_origem)
+
+        partes, colunas = [], []
+        for src, col, letra, valor, formula, estilo, s, eh_data in self._plano:
+            if src is not None and src < tamanho:
+                valor = linha_origem[src]
+            elif formula:
+                valor = valor.para_linha(linha)
+
+            tipo = type(valor)
+            if valor is None:
+                if not s:
+                    continue
+                xml = f'<c r="{letra}{linha}"{s} t="n"/>'
+            elif tipo is str and len(valor) <= LIMITE_TEXTO:
+                if len(valor) > 1 and valor[0] == "=":
+                    xml = f'<c r="{letra}{linha}"{s}><f>{escape(valor[1:])}</f><v/></c>'
+                elif valor in ERROR_CODES or ILLEGAL_CHARACTERS_RE.search(valor):
+                    xml = self._celula(linha, col, valor, estilo, eh_data)
+                elif not valor:
+                    xml = f'<c r="{letra}{linha}"{s} t="inlineStr"/>'
+                else:
+                    limpo = valor.strip()
+                    espaco = ' xml:space="preserve"' if limpo and limpo != valor else ""
+                    xml = (
+                        f'<c r="{letra}{linha}"{s} t="inlineStr"><is>'
+                        f"<t{espaco}>{escape(valor)}</t></is></c>"
+                    )
+            elif (tipo is int or tipo is float) and isfinite(valor):
+                xml = f'<c r="{letra}{linha}"{s} t="n"><v>{valor:.16g}</v></c>'
+            elif tipo is datetime and valor.tzinfo is None:
+                if not eh_data:
+                    s = self._estilo_data(col, estilo, tipo)
+                serial = to_excel(valor, self._epoch)
+                xml = f'<c r="{letra}{linha}"{s} t="n"><v>{serial:.16g}</v></c>'
+            else:
+                xml = self._celula(linha, col, valor, estilo, eh_data)
+
+            partes.append(xml)
+            colunas.append(col)
+
+        restantes = self._restantes.pop(linha, None)
+        if restantes:
+            for celula in restantes:
+                if celula._value is None and not celula.has_style:
+                    continue
+                etree_write_cell(self._coletor, self.ws, celula, celula.has_style)
+                partes.append("".join(self._coletor.partes))
+                self._coletor.partes.clear()
+                colunas.append(celula.column)
+            if colunas:
+                colunas, partes = zip(*sorted(zip(colunas, partes)))
+
+        self._arquivo.write(
+            f'<row r="{linha}"{_atributos_linha(self.ws, linha)}>'.encode()
+            + "".join(partes).encode()
+            + b"</row>"
+        )
+
+        if colunas:
+            if self.min_coluna is None or colunas[0] < self.min_coluna:
+                self.min_coluna = colunas[0]
+            if self.max_coluna is None or colunas[-1] > self.max_coluna:
+                self.max_coluna = colunas[-1]
+
+    def copiar_para(self, destino):
+        """Copia as linhas gravadas (XML) para destino."""
+        self._arquivo.flush()
+        self._arquivo.seek(0)
+        shutil.copyfileobj(self._arquivo, destino, TAMANHO_BLOCO_COPIA)
+        self._arquivo.seek(0, os.SEEK_END)
+
+    def materializar(self):
+        """
+        Lê de volta as linhas gravadas como células do ws, para salvar com
+        wb.save() quando a gravação parcial não é possível.
+        """
+        ws, wb = self.ws, self.ws.parent
+        for chave in [c for c in ws._cells if self.inicio <= c[0] <= self.ultima]:
+            del ws._cells[chave]
+
+        leitor = WorkSheetParser(
+            None,
+            [],
+            epoch=wb.epoch,
+            date_formats=wb._date_formats | self._ids_data,
+            timedelta_formats=wb._timedelta_formats,
+        )
+
+        def vincular(eventos):
+            for _, elemento in eventos:
+                if elemento.tag != ROW_TAG:
+                    continue
+                _, celulas = leitor.parse_row(elemento)
+                for dados in celulas:
+                    celula = Cell(
+                        ws,
+                        row=dados["row"],
+                        column=dados["column"],
+                        style_array=self._estilos[dados["style_id"]],
+                    )
+                    celula._value = dados["value"]
+                    celula.data_type = dados["data_type"]
+                    ws._cells[(dados["row"], dados["column"])] = celula
+                elemento.clear()
+
+        parser = ElementTree.XMLPullParser(("end",))
+        parser.feed(f'<sheetData xmlns="{SHEET_MAIN_NS}">')
+        self._arquivo.flush()
+        self._arquivo.seek(0)
+        for bloco in iter(lambda: self._arquivo.read(TAMANHO_BLOCO_COPIA), b""):
+            parser.feed(bloco)
+            vincular(parser.read_events())
+        parser.feed("</sheetData>")
+        vincular(parser.read_events())
+        parser.close()
+
+        ws._current_row = ws.max_row if ws._cells else 0
+        self.fechar()
+
+    def fechar(self):
+        self._arquivo.close()
+        if _ESCRITORES.get(self.ws) is self:
+            del _ESCRITORES[self.ws]
+
+
+# Escritores ativos, por aba
+_ESCRITORES = WeakKeyDictionary()
+
+
+def _estilos_modelo(zin: zipfile.ZipFile, pacote: _Pacote) -> _EstilosModelo | None:
+    if pacote.estilos is None:
+        return None
+    return _EstilosModelo(zin.read(pacote.estilos))
+
+
+def _gravar_pacote(
+    zin: zipfile.ZipFile,
+    pacote: _Pacote,
+    modelo: Path,
+    caminho: Path,
+    abas: dict,
+    estilos: list,
+) -> Path:
+    """
+    Grava ao lado de caminho (.tmp) o pacote do modelo com as abas
+    substituídas e devolve o arquivo gravado; a troca fica com
+    _trocar_arquivo, depois de fechado o modelo.
+
+    abas: {parte da aba: função(zout, ZipInfo) que grava a parte}.
+    estilos: descrições dos estilos novos (ver _descrever_estilo), que
+    entram no fim do <cellXfs> do modelo.
+    """
+    temporario = caminho.with_suffix(".tmp")
+
+    substituicoes = {}
+    if pacote.estilos is not None:
+        if estilos:
+            xml = zin.read(pacote.estilos)
+            substituicoes[pacote.estilos] = _acrescentar_estilos(
+                xml, _EstilosModelo(xml), estilos
+            )
+    elif estilos:
+        raise ValueError("modelo sem styles.xml")
+
+    # Sem calcChain e com recálculo ao abrir, como no wb.save()
+    substituicoes[pacote.workbook] = _recalcular_ao_abrir(zin.read(pacote.workbook))
+    if pacote.calc_chain is not None:
+        substituicoes[pacote.rels] = _sem_calc_chain(
+            zin.read(pacote.rels), pacote.calc_chain, rb"Relationship"
+        )
+        substituicoes["[Content_Types].xml"] = _sem_calc_chain(
+            zin.read("[Content_Types].xml"), pacote.calc_chain, rb"Override"
+        )
+
+    try:
+        with open(modelo, "rb") as origem, zipfile.ZipFile(
+            temporario, "w", zipfile.ZIP_DEFLATED
+        ) as zout:
+            for info in zin.infolist():
+                if info.filename == pacote.calc_chain:
+                    continue
+                novo = zipfile.ZipInfo(info.filename, info.date_time)
+                novo.compress_type = zipfile.ZIP_DEFLATED
+                if info.filename in abas:
+                    abas.pop(info.filename)(zout, novo)
+                elif info.filename in substituicoes:
+                    zout.writestr(novo, substituicoes.pop(info.filename))
+                else:
+                    _copiar_membro(origem, zout, info)
+    except BaseException:
+        temporario.unlink(missing_ok=True)
+        raise
+
+    return temporario
+
+
+def _trocar_arquivo(temporario: Path, caminho: Path):
+    """
+    Troca caminho pelo arquivo gravado. Chamada só com o modelo já fechado:
+    no Windows, um arquivo aberto não pode ser substituído.
+    """
+    try:
+        os.replace(temporario, caminho)
+    except OSError:
+        temporario.unlink(missing_ok=True)
+        raise
+
+
+def _gravar_montada(ws, escritor, antes: bytes, depois: bytes, zout, info):
+    """Grava no zip a aba montada a partir do modelo (ver _montar_aba)."""
+    with zout.open(info, "w") as destino:
+        destino.write(antes)
+        _escrever_linhas(ws, destino, escritor)
+        destino.write(depois)
+
+
+def gravar_abas_alteradas(wb, caminho: Path, abas, modelo: Path = None):
+    """
+    Salva o workbook regravando só as abas alteradas. O XML de cada aba é
+    montado a partir do XML do modelo (o .xlsx de onde wb foi aberto, por
+    padrão o próprio caminho), com as linhas do ws e as de um EscritorAba,
+    se houver; estilos criados no processamento entram no styles.xml do
+    modelo. Os demais membros do zip são copiados sem descompactar, então o
+    tempo depende das abas gravadas e não do tamanho do modelo.
+
+    Levanta ValueError quando o workbook tem algo que só o openpyxl sabe
+    gravar (abas novas ou renomeadas, fontes novas etc.).
+    """
+    modelo = modelo or caminho
+
+    with zipfile.ZipFile(modelo) as zin:
+        pacote = _Pacote(zin)
+        if list(pacote.abas) != wb.sheetnames:
+            raise ValueError("abas diferentes das do modelo")
+
+        montadas = {}
+        for ws in abas:
+            _resolver_estilos(ws)
+            escritor = _ESCRITORES.get(ws)
+            antes, depois = _montar_aba(ws, zin.read(pacote.abas[ws.title]), escritor)
+
+            montadas[pacote.abas[ws.title]] = partial(
+                _gravar_montada, ws, escritor, antes, depois
+            )
+
+        estilos = _estilos_modelo(zin, pacote)
+        if estilos is None:
+            if len(wb._cell_styles) > 1:
+                raise ValueError("modelo sem styles.xml")
+            novos = []
+        else:
+            novos = [
+                _descrever_estilo(wb, estilo)
+                for estilo in wb._cell_styles[estilos.xfs :]
+            ]
+
+        temporario = _gravar_pacote(zin, pacote, modelo, caminho, montadas, novos)
+
+    _trocar_arquivo(temporario, caminho)
+
+
+class _LeitorAba(ExcelReader):
+    """Leitor do openpyxl que carrega só uma aba (as demais não são lidas)."""
+
+    def __init__(self, caminho: Path, nome: str):
+        super().__init__(caminho)
+        self.nome = nome
+
+    def read_worksheets(self):
+        abas = self.parser.sheets
+        self.parser.sheets = [aba for aba in abas if aba.name == self.nome]
+        try:
+            super().read_worksheets()
+        finally:
+            self.parser.sheets = abas
+
+
+def abrir_aba(caminho: Path, nome: str):
+    """
+    Abre só a aba nome do relatório, com os estilos do workbook, para
+    processá-la sozinha e gravá-la com renderizar_aba. Levanta KeyError se
+    a aba não existe.
+    """
+    leitor = _LeitorAba(caminho, nome)
+    with warnings.catch_warnings():
+        # Nomes definidos das abas que não foram lidas (não são usados)
+        warnings.filterwarnings("ignore", "Defined names for sheet index")
+        leitor.read()
+    if nome not in leitor.wb.sheetnames:
+        raise KeyError(f"aba {nome} não encontrada em {Path(caminho).name}")
+    return leitor.wb[nome]
+
+
+class _ParteComprimida:
+    """
+    Arquivo que recebe o XML de uma aba e grava comprimido como no zip
+    (deflate sem cabeçalho), acumulando CRC e tamanho original.
+    """
+
+    def __init__(self, caminho: Path):
+        self._arquivo = open(caminho, "wb")
+        self._compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+        )
+        self.crc = 0
+        self.tamanho = 0
+
+    def write(self, dados: bytes):
+        self.crc = zlib.crc32(dados, self.crc)
+        self.tamanho += len(dados)
+        self._arquivo.write(self._compressor.compress(dados))
+
+    def fechar(self) -> int:
+        """Fecha o arquivo; devolve o tamanho comprimido."""
+        with self._arquivo:
+            self._arquivo.write(self._compressor.flush())
+            return self._arquivo.tell()
+
+
+class AbaRenderizada:
+    """
+    XML completo de uma aba, já comprimido como membro do zip, gravado por
+    renderizar_aba (em geral em outro processo) e montado no relatório por
+    gravar_abas_renderizadas.
+
+    estilos: descrições (ver _descrever_estilo) dos estilos criados no
+    processamento da aba, na ordem dos índices a partir do fim do <cellXfs>
+    do modelo.
+    """
+
+    def __init__(self, titulo, arquivo, crc, tamanho, comprimido, estilos):
+        self.titulo = titulo
+        self.arquivo = Path(arquivo)
+        self.crc = crc
+        self.tamanho = tamanho
+        self.comprimido = comprimido
+        self.estilos = estilos
+
+
+def renderizar_aba(ws, modelo: Path, arquivo: Path) -> AbaRenderizada:
+    """
+    Grava em arquivo a parte XML pronta da aba ws (aberta de modelo com
+    abrir_aba e já processada), montada como em gravar_abas_alteradas.
+    """
+    with zipfile.ZipFile(modelo) as zin:
+        pacote = _Pacote(zin)
+        xml = zin.read(pacote.abas[ws.title])
+        estilos = _estilos_modelo(zin, pacote)
+
+    _resolver_estilos(ws)
+    escritor = _ESCRITORES.get(ws)
+    try:
+        antes, depois = _montar_aba(ws, xml, escritor)
+        destino = _ParteComprimida(arquivo)
+        try:
+            destino.write(antes)
+            _escrever_linhas(ws, destino, escritor)
+            destino.write(depois)
+        finally:
+            comprimido = destino.fechar()
+    finally:
+        if escritor is not None:
+            escritor.fechar()
+
+    wb = ws.parent
+    xfs = 1 if estilos is None else estilos.xfs
+    return AbaRenderizada(
+        ws.title,
+        arquivo,
+        destino.crc,
+        destino.tamanho,
+        comprimido,
+        [_descrever_estilo(wb, estilo) for estilo in wb._cell_styles[xfs:]],
+    )
+
+
+def _unir_estilos(renderizadas: list, xfs: int) -> tuple[list, list]:
+    """
+    Junta os estilos novos das abas, na ordem das abas e sem repetir, e
+    devolve também, por aba, {índice local: índice no relatório} dos que
+    mudaram de índice.
+    """
+    novos, indices, mapas = [], {}, []
+    for aba in renderizadas:
+        mapa = {}
+        for local, descricao in enumerate(aba.estilos, xfs):
+            if descricao not in indices:
+                indices[descricao] = xfs + len(novos)
+                novos.append(descricao)
+            if indices[descricao] != local:
+                mapa[local] = indices[descricao]
+        mapas.append(mapa)
+    return novos, mapas
+
+
+def _gravar_renderizada(aba, mapa: dict, zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Grava a parte de uma AbaRenderizada no zip: copiada como está ou, se
+    algum estilo mudou de índice, descomprimida trocando os s="..." das
+    células e linhas.
+    """
+    with open(aba.arquivo, "rb") as origem:
+        if not mapa:
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.CRC = aba.crc
+            info.file_size = aba.tamanho
+            info.compress_size = aba.comprimido
+            _acrescentar_membro(zout, info, origem, aba.comprimido)
+            return
+
+        def trocar(trecho):
+            indice = int(trecho.group(2))
+            return trecho.group(1) + str(mapa.get(indice, indice)).encode()
+
+        descompressor = zlib.decompressobj(-15)
+        resto = b""
+        with zout.open(info, "w") as destino:
+            for bloco in iter(lambda: origem.read(TAMANHO_BLOCO_COPIA), b""):
+                dados = resto + descompressor.decompress(bloco)
+                # Só até o fim da última tag completa do bloco
+                corte = dados.rfind(b">") + 1
+                destino.write(REGEX_ESTILO_CELULA.sub(trocar, dados[:corte]))
+                resto = dados[corte:]
+            destino.write(
+                REGEX_ESTILO_CELULA.sub(trocar, resto + descompressor.flush())
+            )
+
+
+def gravar_abas_renderizadas(caminho: Path, renderizadas: list, modelo: Path = None):
+    """
+    Salva o relatório trocando as abas pelas partes prontas (AbaRenderizada)
+    e acrescentando os estilos novos de cada uma ao styles.xml. O resultado
+    não depende da ordem em que as partes ficaram prontas, só da ordem de
+    renderizadas.
+    """
+    modelo = modelo or caminho
+
+    with zipfile.ZipFile(modelo) as zin:
+        pacote = _Pacote(zin)
+        estilos = _estilos_modelo(zin, pacote)
+        novos, mapas = _unir_estilos(
+            renderizadas, 1 if estilos is None else estilos.xfs
+        )
+
+        partes = {}
+        for aba, mapa in zip(renderizadas, mapas):
+            parte = pacote.abas[aba.titulo]
+
+            partes[parte] = partial(_gravar_renderizada, aba, mapa)
+
+        temporario = _gravar_pacote(zin, pacote, modelo, caminho, partes, novos)
+
+    _trocar_arquivo(temporario, caminho)
+
+    # O relatório em memória do modo serviço deixou de valer
+    _RESIDENTES.pop(Path(caminho).resolve(), None)
+
+
+# Relatórios mantidos em memória entre execuções (modo serviço, ver
+# servico.py): caminho -> (assinatura do arquivo salvo, workbook)
+_RESIDENTES = {}
+_manter_residentes = False
+
+
+def manter_residentes(ativo: bool = True):
+    """
+    Liga (ou desliga) a reutilização dos relatórios em memória: o workbook
+    salvo por salvar_relatorio é devolvido por abrir_relatorio na execução
+    seguinte, sem novo load_workbook, enquanto o arquivo não mudar.
+    """
+    global _manter_residentes
+    _manter_residentes = ativo
+    if not ativo:
+        _RESIDENTES.clear()
+
+
+def _assinatura(caminho: Path) -> tuple:
+    estado = caminho.stat()
+    return estado.st_mtime_ns, estado.st_size
+
+
+def abrir_relatorio(caminho: Path):
+    """
+    Abre o relatório (modelo) com load_workbook ou, com manter_residentes,
+    reaproveita o workbook salvo na execução anterior se o arquivo continua
+    como foi gravado. O workbook sai do cache até ser salvo de novo: uma
+    execução que falha no meio não deixa um workbook pela metade para a
+    próxima.
+    """
+    caminho = Path(caminho).resolve()
+    residente = _RESIDENTES.pop(caminho, None)
+    if residente is not None:
+        assinatura, wb = residente
+        try:
+            if _assinatura(caminho) == assinatura:
+                log(f"[RELATÓRIO] Modelo em memória reaproveitado: {caminho.name}")
+                return wb
+        except OSError:
+            pass
+        log(f"[RELATÓRIO] {caminho.name} mudou desde a última gravação, recarregando.")
+    return load_workbook(caminho)
+
+
+def carregar_residente(caminho: Path):
+    """Abre o relatório e o deixa em memória (aquecimento do modo serviço)."""
+    caminho = Path(caminho).resolve()
+    wb = abrir_relatorio(caminho)
+    _RESIDENTES[caminho] = (_assinatura(caminho), wb)
+    return wb
+
+
+def relatorios_residentes() -> list[str]:
+    return [caminho.name for caminho in _RESIDENTES]
+
+
+def salvar_relatorio(wb, caminho: Path, abas, parcial: bool = GRAVACAO_PARCIAL):
+    """
+    Salva o relatório regravando só as abas informadas (ver
+    gravar_abas_alteradas). Se o workbook não puder ser gravado por partes,
+    as linhas dos EscritorAba voltam para o ws e o workbook inteiro é salvo
+    com wb.save(). Erros de arquivo (relatório aberto, disco cheio) sobem:
+    wb.save() no mesmo caminho falharia do mesmo jeito.
+    """
+    try:
+        salvo = False
+        if parcial:
+            try:
+                gravar_abas_alteradas(wb, caminho, abas)
+                salvo = True
+            except (ValueError, KeyError, zipfile.BadZipFile) as e:
+                log(
+                    f"[RELATÓRIO] Gravação parcial indisponível ({e}), salvando completo."
+                )
+
+        if not salvo:
+            for ws in abas:
+                escritor = _ESCRITORES.get(ws)
+                if escritor is not None:
+                    escritor.materializar()
+            wb.save(caminho)
+
+        if _manter_residentes:
+            caminho = Path(caminho).resolve()
+            _RESIDENTES[caminho] = (_assinatura(caminho), wb)
+    finally:
+        for ws in abas:
+            escritor = _ESCRITORES.get(ws)
+            if escritor is not None:
+                escritor.fechar()
@@ -0,0 +1,498 @@
+import mmap
+import struct
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from pathlib import Path
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+# Assinatura de um arquivo OLE2 (Compound File Binary)
+ASSINATURA_OLE2 = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+FIM_CADEIA = 0xFFFFFFFE
+
+# Registros BIFF8 usados na leitura
+BOF = 0x0809
+EOF = 0x000A
+FILEPASS = 0x002F
+DATEMODE = 0x0022
+BOUNDSHEET = 0x0085
+SST = 0x00FC
+CONTINUE = 0x003C
+FORMAT = 0x041E
+XF = 0x00E0
+LABELSST = 0x00FD
+LABEL = 0x0204
+NUMBER = 0x0203
+RK = 0x027E
+MULRK = 0x00BD
+FORMULA = 0x0006
+STRING = 0x0207
+BOOLERR = 0x0205
+
+ERROS_EXCEL = {
+    0x00: "#NULL!",
+    0x07: "#DIV/0!",
+    0x0F: "#VALUE!",
+    0x17: "#REF!",
+    0x1D: "#NAME?",
+    0x24: "#NUM!",
+    0x2A: "#N/A",
+}
+
+# Quantidade de strings do SST mantidas decodificadas em cache
+TAMANHO_CACHE_SST = 4096
+
+
+def eh_arquivo_ole2(caminho: Path) -> bool:
+    """Indica se o arquivo é um .xls binário (OLE2) e não uma exportação HTML."""
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read(8) == ASSINATURA_OLE2
+
+
+class _Fluxo:
+    """
+    Stream de um arquivo OLE2 lido diretamente do mmap. A cadeia de setores é
+    reduzida a faixas contíguas, então cada leitura é um fatiamento do mmap.
+    """
+
+    def __init__(self, dados, faixas: list[tuple[int, int, int]], tamanho: int):
+        self._dados = dados
+        self._inicios = [inicio for inicio, _, _ in faixas]
+        self._faixas = faixas
+        self.tamanho = tamanho
+
+    def ler(self, pos: int, n: int) -> bytes:
+        k = bisect_right(self._inicios, pos) - 1
+        inicio, offset, comprimento = self._faixas[k]
+        desloc = pos - inicio
+        if desloc + n <= comprimento:
+            return self._dados[offset + desloc : offset + desloc + n]
+
+        # Leitura atravessa faixas não contíguas
+        partes = []
+        while n > 0:
+            inicio, offset, comprimento = self._faixas[k]
+            desloc = pos - inicio
+            parte = self._dados[offset + desloc : offset + min(comprimento, desloc + n)]
+            partes.append(parte)
+            pos += len(parte)
+            n -= len(parte)
+            k += 1
+        return b"".join(partes)
+
+    def registros(self, pos: int = 0):
+        """Percorre os registros BIFF a partir da posição, sem ler o stream todo."""
+        while pos + 4 <= self.tamanho:
+            tipo, tamanho = struct.unpack("<HH", self.ler(pos, 4))
+            yield tipo, pos + 4, tamanho
+            pos += 4 + tamanho
+
+
+class ArquivoOle2:
+    """Leitura dos streams de um arquivo OLE2 mapeado em memória."""
+
+    def __init__(self, dados):
+        if dados[:8] != ASSINATURA_OLE2:
+            raise ValueError("Arquivo não é um documento OLE2")
+
+        self._dados = dados
+        (
+            shift_setor,
+            shift_mini,
+        ) = struct.unpack_from("<HH", dados, 0x1E)
+        self.tam_setor = 1 << shift_setor
+        self.tam_mini = 1 << shift_mini
+
+        (
+            self._num_setores_fat,
+            self._setor_diretorio,
+        ) = struct.unpack_from("<II", dados, 0x2C)
+        (
+            self._limite_mini,
+            self._setor_minifat,
+            self._num_setores_minifat,
+            self._setor_difat,
+            self._num_setores_difat,
+        ) = struct.unpack_from("<IIIII", dados, 0x38)
+
+        self._fat = self._ler_fat()
+        self._entradas = self._ler_diretorio()
+
+    def _offset(self, setor: int) -> int:
+        return (setor + 1) * self.tam_setor
+
+    def _ler_fat(self) -> list[int]:
+        setores_fat = [
+            s for s in struct.unpack_from("<109I", self._dados, 0x4C) if s < FIM_CADEIA
+        ]
+
+        # Entradas extras da DIFAT ficam em setores encadeados
+        setor = self._setor_difat
+        por_setor = self.tam_setor // 4
+        for _ in range(self._num_setores_difat):
+            if setor >= FIM_CADEIA:
+                break
+            valores = struct.unpack_from(
+                f"<{por_setor}I", self._dados, self._offset(setor)
+            )
+            setores_fat.extend(v for v in valores[:-1] if v < FIM_CADEIA)
+            setor = valores[-1]
+
+        fat = []
+        for setor in setores_fat[: self._num_setores_fat]:
+            fat.extend(
+                struct.unpack_from(f"<{por_setor}I", self._dados, self._offset(setor))
+            )
+        return fat
+
+    def _cadeia(self, inicio: int, fat: list[int]) -> list[int]:
+        setores = []
+        setor = inicio
+        while setor < FIM_CADEIA:
+            if setor >= len(fat) or len(setores) > len(fat):
+                raise ValueError("Cadeia de setores OLE2 inválida")
+            setores.append(setor)
+            setor = fat[setor]
+        return setores
+
+    def _faixas(self, setores: list[int], tamanho_setor: int, offset_de) -> list:
+        """Agrupa setores consecutivos em faixas (início lógico, offset, tamanho)."""
+        faixas = []
+        for i, setor in enumerate(setores):
+            offset = offset_de(setor)
+            if faixas and faixas[-1][1] + faixas[-1][2] == offset:
+                inicio, offset_faixa, comprimento = faixas[-1]
+                faixas[-1] = (inicio, offset_faixa, comprimento + tamanho_setor)
+            else:
+                faixas.append((i * tamanho_setor, offset, tamanho_setor))
+        return faixas
+
+    def _ler_diretorio(self) -> dict:
+        setores = self._cadeia(self._setor_diretorio, self._fat)
+        tamanho = len(setores) * self.tam_setor
+        fluxo = _Fluxo(
+            self._dados, self._faixas(setores, self.tam_setor, self._offset), tamanho
+        )
+
+        entradas = {}
+        for pos in range(0, tamanho, 128):
+            entrada = fluxo.ler(pos, 128)
+            tamanho_nome = struct.unpack_from("<H", entrada, 0x40)[0]
+            tipo = entrada[0x42]
+            if tipo == 0 or tamanho_nome < 2:
+                continue
+            nome = entrada[: tamanho_nome - 2].decode("utf-16-le")
+            inicio, tamanho_stream = struct.unpack_from("<II", entrada, 0x74)
+            entradas[nome] = (tipo, inicio, tamanho_stream)
+        return entradas
+
+    def abrir_stream(self, nome: str) -> _Fluxo:
+        """Abre um stream pelo nome, sem copiá-lo para a memória."""
+        if nome not in self._entradas:
+            raise KeyError(f"Stream '{nome}' não encontrado no arquivo OLE2")
+
+        _, inicio, tamanho = self._entradas[nome]
+        if tamanho >= self._limite_mini:
+            setores = self._cadeia(inicio, self._fat)
+            faixas = self._faixas(setores, self.tam_setor, self._offset)
+            return _Fluxo(self._dados, faixas, tamanho)
+
+        # Streams pequenos ficam no mini stream (armazenado no Root Entry)
+        _, inicio_raiz, tamanho_raiz = next(
+            e for e in self._entradas.values() if e[0] == 5
+        )
+        raiz = self._faixas(
+            self._cadeia(inicio_raiz, self._fat), self.tam_setor, self._offset
+        )
+        mini_stream = _Fluxo(self._dados, raiz, tamanho_raiz)
+
+        minifat = []
+        por_setor = self.tam_setor // 4
+        for setor in self._cadeia(self._setor_minifat, self._fat):
+            minifat.extend(
+                struct.unpack_from(f"<{por_setor}I", self._dados, self._offset(setor))
+            )
+
+        dados = b"".join(
+            mini_stream.ler(setor * self.tam_mini, self.tam_mini)
+            for setor in self._cadeia(inicio, minifat)
+        )[:tamanho]
+        return _Fluxo(dados, [(0, 0, len(dados))], tamanho)
+
+
+class _TabelaStrings:
+    """
+    Shared String Table (SST) do BIFF8. Na abertura só as posições das strings
+    são indexadas; o texto é decodificado sob demanda e mantido em um cache LRU.
+    """
+
+    def __init__(self, fluxo: _Fluxo, blocos: list[tuple[int, int]]):
+        # blocos: (posição no stream, tamanho) do SST e de cada CONTINUE
+        self._fluxo = fluxo
+        self._blocos = blocos
+        self._limites = []
+        total = 0
+        for _, tamanho in blocos:
+            self._limites.append(total)
+            total += tamanho
+        self._total = total
+
+        # Os 8 primeiros bytes do SST trazem as contagens de strings
+        self._posicoes = []
+        _, unicas = struct.unpack("<II", self._ler(0, 8))
+        pos = 8
+        for _ in range(unicas):
+            if pos >= total:
+                break
+            self._posicoes.append(pos)
+            pos, _ = self._percorrer(pos, decodificar=False)
+
+        self.obter = lru_cache(maxsize=TAMANHO_CACHE_SST)(self._decodificar)
+
+    def __len__(self):
+        return len(self._posicoes)
+
+    def _ler(self, pos: int, n: int) -> bytes:
+        k = bisect_right(self._limites, pos) - 1
+        posicao_stream, _ = self._blocos[k]
+        return self._fluxo.ler(posicao_stream + pos - self._limites[k], n)
+
+    def _percorrer(self, pos: int, decodificar: bool):
+        cch, flags = struct.unpack("<HB", self._ler(pos, 3))
+        pos += 3
+        runs = extra = 0
+        if flags & 0x08:
+            runs = struct.unpack("<H", self._ler(pos, 2))[0]
+            pos += 2
+        if flags & 0x04:
+            extra = struct.unpack("<I", self._ler(pos, 4))[0]
+            pos += 4
+
+        partes = []
+        largo = flags & 0x01
+        restante = cch
+        while restante:
+            # Ao atravessar um CONTINUE, os caracteres recomeçam com novas flags
+            k = bisect_left(self._limites, pos)
+            if k < len(self._limites) and self._limites[k] == pos:
+                largo = self._ler(pos, 1)[0] & 0x01
+                pos += 1
+                k += 1
+            fim = self._limites[k] if k < len(self._limites) else self._total
+
+            tam_char = 2 if largo else 1
+            n = min(restante, (fim - pos) // tam_char)
+            if n <= 0:
+                raise ValueError("SST corrompido")
+            if decodificar:
+                bruto = self._ler(pos, n * tam_char)
+                partes.append(bruto.decode("utf-16-le" if largo else "latin-1"))
+            pos += n * tam_char
+            restante -= n
+
+        return pos + runs * 4 + extra, "".join(partes)
+
+    def _decodificar(self, indice: int) -> str:
+        return self._percorrer(self._posicoes[indice], decodificar=True)[1]
+
+
+def _ler_string_unicode(dados: bytes, pos: int, tamanho_cch: int = 2):
+    """Lê uma XLUnicodeString (cch, flags, caracteres)."""
+    if tamanho_cch == 1:
+        cch = dados[pos]
+    else:
+        cch = struct.unpack_from("<H", dados, pos)[0]
+    flags = dados[pos + tamanho_cch]
+    pos += tamanho_cch + 1
+    if flags & 0x01:
+        return dados[pos : pos + cch * 2].decode("utf-16-le")
+    return dados[pos : pos + cch].decode("latin-1")
+
+
+def _decodificar_rk(rk: int) -> float:
+    if rk & 0x02:
+        valor = float(rk >> 2 if not rk & 0x80000000 else (rk >> 2) - (1 << 30))
+    else:
+        valor = struct.unpack("<d", struct.pack("<Q", (rk & 0xFFFFFFFC) << 32))[0]
+    if rk & 0x01:
+        valor /= 100
+    return valor
+
+
+class LeitorBiff:
+    """
+    Leitor de pastas de trabalho BIFF8 (.xls binário do Excel 97-2003).
+
+    O arquivo é mapeado em memória; os registros são lidos um a um e as
+    strings do SST só são decodificadas quando uma célula as referencia.
+    """
+
+    def __init__(self, dados):
+        self._ole = ArquivoOle2(dados)
+        try:
+            self._fluxo = self._ole.abrir_stream("Workbook")
+        except KeyError:
+            raise ValueError("Arquivo .xls sem stream 'Workbook' (BIFF5 ou anterior)")
+
+        self.abas = []
+        self.sst = None
+        self._epoch = CALENDAR_WINDOWS_1900
+        self._xf_eh_data = []
+        self._ler_globais()
+
+    def _ler_globais(self):
+        fluxo = self._fluxo
+        formatos = {}
+        formatos_xf = []
+        blocos_sst = None
+
+        for tipo, pos, tamanho in fluxo.registros(0):
+            if tipo == BOF:
+                versao = struct.unpack("<H", fluxo.ler(pos, 2))[0]
+                if versao != 0x0600:
+                    raise ValueError("Somente arquivos BIFF8 são suportados")
+            elif tipo == EOF:
+                break
+            elif tipo == FILEPASS:
+                raise ValueError("Arquivo .xls protegido por senha")
+            elif tipo == DATEMODE:
+                if struct.unpack("<H", fluxo.ler(pos, 2))[0]:
+                    self._epoch = CALENDAR_MAC_1904
+            elif tipo == BOUNDSHEET:
+                dados = fluxo.ler(pos, tamanho)
+                inicio = struct.unpack_from("<I", dados, 0)[0]
+                tipo_aba = dados[5]
+                self.abas.append((_ler_string_unicode(dados, 6, 1), inicio, tipo_aba))
+            elif tipo == FORMAT:
+                dados = fluxo.ler(pos, tamanho)
+                formatos[struct.unpack_from("<H", dados, 0)[0]] = _ler_string_unicode(
+                    dados, 2
+                )
+            elif tipo == XF:
+                formatos_xf.append(struct.unpack("<H", fluxo.ler(pos + 2, 2))[0])
+            elif tipo == SST:
+                blocos_sst = [(pos, tamanho)]
+            elif tipo == CONTINUE and blocos_sst is not None and self.sst is None:
+                blocos_sst.append((pos, tamanho))
+            elif blocos_sst is not None and self.sst is None:
+                self.sst = _TabelaStrings(fluxo, blocos_sst)
+
+        if blocos_sst is not None and self.sst is None:
+            self.sst = _TabelaStrings(fluxo, blocos_sst)
+
+        for ifmt in formatos_xf:
+            codigo = formatos.get(ifmt, BUILTIN_FORMATS.get(ifmt, "General"))
+            self._xf_eh_data.append(is_date_format(codigo))
+
+    def _valor_numerico(self, xf: int, valor: float):
+        if xf < len(self._xf_eh_data) and self._xf_eh_data[xf]:
+            return from_excel(valor, self._epoch)
+        if valor.is_integer():
+            return int(valor)
+        return valor
+
+    def _celulas(self, inicio: int):
+        """Gera (linha, coluna, valor) para cada célula com valor da aba."""
+        fluxo = self._fluxo
+        formula_pendente = None
+
+        for tipo, pos, tamanho in fluxo.registros(inicio):
+            if tipo == EOF:
+                break
+
+            if tipo == LABELSST:
+                linha, coluna, _, indice = struct.unpack("<HHHI", fluxo.ler(pos, 10))
+                yield linha, coluna, self.sst.obter(indice)
+            elif tipo == NUMBER:
+                linha, coluna, xf, valor = struct.unpack("<HHHd", fluxo.ler(pos, 14))
+                yield linha, coluna, self._valor_numerico(xf, valor)
+            elif tipo == RK:
+                linha, coluna, xf, rk = struct.unpack("<HHHI", fluxo.ler(pos, 10))
+                yield linha, coluna, self._valor_numerico(xf, _decodificar_rk(rk))
+            elif tipo == MULRK:
+                dados = fluxo.ler(pos, tamanho)
+                linha, coluna = struct.unpack_from("<HH", dados, 0)
+                for desloc in range(4, tamanho - 2, 6):
+                    xf, rk = struct.unpack_from("<HI", dados, desloc)
+                    yield linha, coluna, self._valor_numerico(xf, _decodificar_rk(rk))
+                    coluna += 1
+            elif tipo == LABEL:
+                dados = fluxo.ler(pos, tamanho)
+                linha, coluna = struct.unpack_from("<HH", dados, 0)
+                yield linha, coluna, _ler_string_unicode(dados, 6)
+            elif tipo == BOOLERR:
+                linha, coluna, _, valor, erro = struct.unpack(
+                    "<HHHBB", fluxo.ler(pos, 8)
+                )
+                yield linha, coluna, (
+                    ERROS_EXCEL.get(valor, "#N/A") if erro else bool(valor)
+                )
+            elif tipo == FORMULA:
+                dados = fluxo.ler(pos, 14)
+                linha, coluna, xf = struct.unpack_from("<HHH", dados, 0)
+                resultado = dados[6:14]
+                if resultado[6:8] != b"\xff\xff":
+                    valor = struct.unpack("<d", resultado)[0]
+                    yield linha, coluna, self._valor_numerico(xf, valor)
+                elif resultado[0] == 0:
+                    # Resultado texto vem no registro STRING seguinte
+                    formula_pendente = (linha, coluna)
+                elif resultado[0] == 1:
+                    yield linha, coluna, bool(resultado[2])
+                elif resultado[0] == 2:
+                    yield linha, coluna, ERROS_EXCEL.get(resultado[2], "#N/A")
+            elif tipo == STRING and formula_pendente:
+                linha, coluna = formula_pendente
+                formula_pendente = None
+                yield linha, coluna, _ler_string_unicode(fluxo.ler(pos, tamanho), 0)
+
+    def linhas(self, indice_aba: int = 0):
+        """
+        Gera as linhas da aba como tuplas, da primeira à última linha com dados.
+        Linhas sem células no meio da planilha são devolvidas como tuplas vazias.
+
+        O BIFF grava as células ordenadas por linha, então cada linha é
+        liberada assim que a seguinte começa.
+        """
+        planilhas = [aba for aba in self.abas if aba[2] == 0]
+        _, inicio, _ = planilhas[indice_aba]
+
+        linha_atual = None
+        valores = {}
+        for linha, coluna, valor in self._celulas(inicio):
+            if linha != linha_atual:
+                if linha_atual is not None:
+                    if linha < linha_atual:
+                        raise ValueError("Células fora de ordem no arquivo .xls")
+                    yield _montar_linha(valores)
+                    for _ in range(linha - linha_atual - 1):
+                        yield ()
+                linha_atual = linha
+                valores = {}
+            valores[coluna] = valor
+
+        if valores:
+            yield _montar_linha(valores)
+
+
+def _montar_linha(valores: dict) -> tuple:
+    linha = [None] * (max(valores) + 1)
+    for coluna, valor in valores.items():
+        linha[coluna] = valor
+    return tuple(linha)
+
+
+def ler_linhas_biff(caminho: Path, indice_aba: int = 0):
+    """
+    Lê um .xls binário (BIFF8) mapeado em memória, devolvendo as linhas da
+    primeira aba como tuplas à medida que são decodificadas.
+
+    :param caminho: caminho do arquivo .xls
+    :param indice_aba: índice da aba (somente planilhas, sem gráficos)
+    """
+    with open(caminho, "rb") as arquivo:
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+            leitor = LeitorBiff(dados)
+            yield from leitor.linhas(indice_aba)
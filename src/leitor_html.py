@@ -0,0 +1,154 @@
+import re
+from datetime import datetime
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Tamanho do bloco lido do disco a cada passo do parser
+TAMANHO_BLOCO = 1024 * 1024
+
+# Formatos de data usados pelo Jira nas exportações
+FORMATOS_DATA = (
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y",
+    "%d/%m/%y %H:%M",
+    "%d/%m/%y",
+)
+
+REGEX_INTEIRO = re.compile(r"-?(0|[1-9]\d*)")
+REGEX_DECIMAL = re.compile(r"-?\d+\.\d+")
+
+# Tags que o Excel trata como quebra de linha dentro da célula
+TAGS_QUEBRA = {"br", "p", "div", "li"}
+
+
+def converter_valor(texto: str):
+    """
+    Converte o texto de uma célula para o tipo que o Excel inferiria ao abrir
+    o .xls (número, data ou texto). Células vazias viram None.
+    """
+    if not texto:
+        return None
+
+    if REGEX_INTEIRO.fullmatch(texto):
+        return int(texto)
+    if REGEX_DECIMAL.fullmatch(texto):
+        return float(texto)
+
+    if texto[0].isdigit():
+        for formato in FORMATOS_DATA:
+            try:
+                return datetime.strptime(texto, formato)
+            except ValueError:
+                continue
+
+    return texto
+
+
+class _ParserTabelaHtml(HTMLParser):
+    """
+    Parser incremental das tabelas HTML exportadas pelo Jira. Cada <tr> vira
+    uma tupla de valores, na mesma ordem em que o Excel montaria as linhas.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.linhas = []
+        self._linha = None
+        self._celula = None
+        self._texto_puro = False
+        self._colspan = 1
+        self._tabelas_internas = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._celula is not None:
+            # Tabelas aninhadas dentro de uma célula entram como texto
+            if tag == "table":
+                self._tabelas_internas += 1
+                return
+            if self._tabelas_internas or tag not in ("td", "th", "tr"):
+                if tag in TAGS_QUEBRA or tag == "tr":
+                    self._celula.append("\n")
+                return
+
+            # <td>/<tr> sem a tag de fechamento da célula anterior
+            self._fechar_celula()
+
+        if tag == "tr":
+            self._fechar_linha()
+            self._linha = []
+        elif tag in ("td", "th") and self._linha is not None:
+            atributos = dict(attrs)
+            estilo = (atributos.get("style") or "").replace(" ", "")
+            self._texto_puro = 'mso-number-format:"\\@"' in estilo
+            try:
+                self._colspan = max(int(atributos.get("colspan") or 1), 1)
+            except ValueError:
+                self._colspan = 1
+            self._celula = []
+
+    def handle_startendtag(self, tag, attrs):
+        if self._celula is not None and tag in TAGS_QUEBRA:
+            self._celula.append("\n")
+
+    def handle_endtag(self, tag):
+        if self._celula is not None:
+            if tag == "table" and self._tabelas_internas:
+                self._tabelas_internas -= 1
+            elif tag in ("td", "th") and not self._tabelas_internas:
+                self._fechar_celula()
+            elif tag == "tr" and not self._tabelas_internas:
+                self._fechar_celula()
+                self._fechar_linha()
+            return
+
+        if tag == "tr":
+            self._fechar_linha()
+
+    def handle_data(self, data):
+        if self._celula is not None:
+            self._celula.append(data)
+
+    def _fechar_celula(self):
+        if self._celula is None or self._linha is None:
+            self._celula = None
+            return
+
+        # Espaços em branco são colapsados como no navegador/Excel
+        texto = "".join(self._celula)
+        partes = [" ".join(parte.split()) for parte in texto.split("\n")]
+        texto = "\n".join(partes).strip()
+
+        valor = texto or None
+        if valor is not None and not self._texto_puro:
+            valor = converter_valor(valor)
+
+        self._linha.append(valor)
+        self._linha.extend([None] * (self._colspan - 1))
+        self._celula = None
+
+    def _fechar_linha(self):
+        if self._linha is not None:
+            self.linhas.append(tuple(self._linha))
+        self._linha = None
+
+
+def ler_linhas_html(caminho: Path, encoding: str = "utf-8"):
+    """
+    Lê um .xls no formato HTML (exportação do Jira) em uma única passada,
+    devolvendo as linhas da planilha como tuplas à medida que são lidas.
+
+    :param caminho: caminho do arquivo .xls
+    :param encoding: codificação do arquivo
+    """
+    parser = _ParserTabelaHtml()
+    with open(caminho, encoding=encoding, errors="replace") as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), ""):
+            parser.feed(bloco)
+            yield from parser.linhas
+            parser.linhas.clear()
+
+    parser.close()
+    parser._fechar_celula()
+    parser._fechar_linha()
+    yield from parser.linhas
@@ -0,0 +1,341 @@
+import re
+from pathlib import Path
+
+from openpyxl.cell.text import Text
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.worksheet._reader import INLINE_STRING, VALUE_TAG, WorkSheetParser
+from openpyxl.xml.constants import SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import fromstring, iterparse
+
+from tabela import Tabela, normalizar_cabecalho, ultima_preenchida
+
+TAG_TEXTO = f"{{{SHEET_MAIN_NS}}}si"
+TAG_T = f"{{{SHEET_MAIN_NS}}}t"
+DIGITOS = "0123456789"
+
+# Tamanho do bloco lido da aba a cada passo (as linhas são montadas em blocos)
+TAMANHO_BLOCO = 1024 * 1024
+
+REGEX_RAIZ = re.compile(rb"<((?:[\w.-]+:)?)worksheet\b([^>]*)>")
+REGEX_DADOS = re.compile(rb"<((?:[\w.-]+:)?)sheetData\b[^>]*?(/?)>")
+
+
+class _Compartilhado:
+    """Texto compartilhado de uma célula, resolvido depois de lida a aba."""
+
+    __slots__ = ("indice",)
+
+    def __init__(self, indice: int):
+        self.indice = indice
+
+
+class _Referencias:
+    """
+    No lugar da lista de textos compartilhados do openpyxl: cada célula de
+    texto recebe uma referência, e os índices pedidos ficam registrados.
+    """
+
+    def __init__(self):
+        self.indices = set()
+
+    def __getitem__(self, indice: int) -> _Compartilhado:
+        self.indices.add(indice)
+        return _Compartilhado(indice)
+
+
+class _TextosCompartilhados:
+    """
+    sharedStrings.xml lido sob demanda, em ordem, uma única vez: só os
+    textos pedidos são decodificados (os demais são pulados).
+    """
+
+    def __init__(self, fonte):
+        self._nos = iterparse(fonte) if fonte is not None else iter(())
+        self._proximo = 0
+        self.textos = {}
+
+    def ler(self, indices: set, todos: bool = False):
+        """
+        Avança até o maior índice pedido, guardando os textos pedidos (ou,
+        com todos, todos os lidos: os já pulados não podem mais ser lidos).
+        """
+        alvo = max(indices, default=-1)
+        if self._proximo > alvo:
+            return
+        for _, no in self._nos:
+            if no.tag != TAG_TEXTO:
+                continue
+            if todos or self._proximo in indices:
+                # Mesma conversão de openpyxl.reader.strings.read_string_table
+                texto = Text.from_tree(no).content
+                self.textos[self._proximo] = texto.replace("x005F_", "")
+            no.clear()
+            self._proximo += 1
+            if self._proximo > alvo:
+                return
+
+    def resolver(self, valores: list) -> list:
+        return [
+            self.textos[valor.indice] if type(valor) is _Compartilhado else valor
+            for valor in valores
+        ]
+
+
+def _linhas_em_blocos(fonte):
+    """
+    Elementos <row> da aba, na ordem. O XML é lido em blocos de linhas
+    inteiras e cada bloco é montado de uma vez pelo parser (em C), sem o
+    evento por elemento do iterparse: o custo por célula pulada fica só em
+    consultar a coordenada.
+    """
+    buffer = b""
+    dados = None
+    while dados is None:
+        bloco = fonte.read(TAMANHO_BLOCO)
+        buffer += bloco
+        dados = REGEX_DADOS.search(buffer)
+        if not bloco:
+            break
+    if dados is None or dados.group(2):
+        return
+
+    # Os blocos vão dentro de um elemento com as declarações de namespace da raiz
+    raiz = REGEX_RAIZ.search(buffer, 0, dados.start())
+    if raiz is None:
+        raise ValueError("Raiz <worksheet> não encontrada na aba")
+    abertura = b"<" + raiz.group(1) + b"sheetData" + raiz.group(2) + b">"
+    fechamento = b"</" + raiz.group(1) + b"sheetData>"
+    fim_linha = b"</" + dados.group(1) + b"row>"
+    fim_dados = b"</" + dados.group(1) + b"sheetData>"
+
+    buffer = buffer[dados.end() :]
+    while True:
+        final = buffer.find(fim_dados)
+        if final >= 0:
+            corte = final
+        else:
+            corte = buffer.rfind(fim_linha)
+            corte = corte + len(fim_linha) if corte >= 0 else 0
+        if corte:
+            yield from fromstring(abertura + buffer[:corte] + fechamento)
+            buffer = buffer[corte:]
+        if final >= 0:
+            return
+        bloco = fonte.read(TAMANHO_BLOCO)
+        if not bloco:
+            raise ValueError("Aba incompleta: </sheetData> não encontrado")
+        buffer += bloco
+
+
+class _ParserProjecao(WorkSheetParser):
+    """
+    Parser de aba do openpyxl usado linha a linha (ver _linhas_em_blocos)
+    que só converte as células das colunas pedidas (colunas: números,
+    começando em 1; None para todas), com o parse_cell do openpyxl. Células
+    com fórmula são sempre lidas (fórmulas compartilhadas dependem da
+    primeira).
+    """
+
+    def __init__(self, textos, wb):
+        super().__init__(
+            None,
+            textos,
+            data_only=False,
+            epoch=wb.epoch,
+            date_formats=wb._date_formats,
+            timedelta_formats=wb._timedelta_formats,
+        )
+        self.colunas = None
+
+    def parse_row(self, row):
+        """(número da linha, [(coluna, valor)]) das células pedidas da linha."""
+        numero = row.get("r")
+        if numero is not None:
+            self.row_counter = int(numero) if numero.isdigit() else int(float(numero))
+        else:
+            self.row_counter += 1
+        self.col_counter = 0
+
+        celulas = []
+        for el in row:
+            coordenada = el.get("r")
+            if coordenada:
+                coluna = column_index_from_string(coordenada.rstrip(DIGITOS))
+            else:
+                coluna = self.col_counter + 1
+            if self.colunas is None or coluna in self.colunas:
+                celulas.append((coluna, self._valor(el)))
+            elif len(el) > 1:
+                self.parse_cell(el)
+            self.col_counter = coluna
+        return self.row_counter, celulas
+
+    def _valor(self, el):
+        """
+        Valor da célula. Textos sem formatação (compartilhados ou inline) são
+        lidos direto; os demais casos ficam com o parse_cell do openpyxl.
+        """
+        if len(el) == 1:
+            tipo = el.get("t")
+            filho = el[0]
+            if tipo == "s" and filho.tag == VALUE_TAG:
+                return self.shared_strings[int(filho.text)] if filho.text else None
+            if (
+                tipo == "inlineStr"
+                and filho.tag == INLINE_STRING
+                and len(filho) == 1
+                and filho[0].tag == TAG_T
+            ):
+                return filho[0].text or ""
+        return self.parse_cell(el)["value"]
+
+
+class _LeitorProjecao(ExcelReader):
+    """
+    Leitor do openpyxl que só lê o necessário para localizar a aba e
+    converter as células: não carrega os textos compartilhados nem cria as
+    abas (a ReadOnlyWorksheet percorre a aba inteira para medir as dimensões
+    quando o arquivo não as informa).
+    """
+
+    def __init__(self, caminho: Path):
+        super().__init__(caminho, read_only=True)
+        self.caminho_textos = None
+        self.abas = {}
+
+    def read_strings(self):
+        parte = self.package.find(SHARED_STRINGS)
+        if parte is not None:
+            self.caminho_textos = parte.PartName[1:]
+        self.shared_strings = []
+
+    def read(self):
+        self.read_manifest()
+        self.read_strings()
+        self.read_workbook()
+        apply_stylesheet(self.archive, self.wb)
+        self.abas = {
+            aba.name: relacao.target
+            for aba, relacao in self.parser.find_sheets()
+            if relacao.target in self.valid_files
+        }
+
+    def parte_aba(self, nome: str | None) -> tuple[str, str]:
+        """(título, parte no zip) da aba nome, ou da ativa."""
+        if nome is None:
+            try:
+                nome = list(self.abas)[self.wb._active_sheet_index]
+            except IndexError:
+                raise KeyError(f"aba ativa não encontrada em {self.archive.filename}")
+        return nome, self.abas[nome]
+
+
+def _ler(caminho: Path, aba: str | None, colunas, coluna_chave: str | None):
+    """
+    Lê o cabeçalho (linha 1) da aba e, se colunas não é None, as colunas
+    com esses cabeçalhos. Devolve (título, cabeçalho, Tabela ou None).
+    """
+    leitor = _LeitorProjecao(caminho)
+    fonte_textos = None
+    try:
+        leitor.read()
+        titulo, parte = leitor.parte_aba(aba)
+        if leitor.caminho_textos is not None:
+            fonte_textos = leitor.archive.open(leitor.caminho_textos)
+        with leitor.archive.open(parte) as fonte:
+            referencias = _Referencias()
+            textos = _TextosCompartilhados(fonte_textos)
+            parser = _ParserProjecao(referencias, leitor.wb)
+            linhas = map(parser.parse_row, _linhas_em_blocos(fonte))
+
+            # Cabeçalho: a linha 1 inteira, com os textos já resolvidos
+            cabecalho = ()
+            numero, celulas = next(linhas, (None, []))
+            if numero == 1:
+                valores = [None] * max((coluna for coluna, _ in celulas), default=0)
+                for coluna, valor in celulas:
+                    valores[coluna - 1] = valor
+                textos.ler(referencias.indices, todos=True)
+                cabecalho = tuple(textos.resolver(valores))
+            if colunas is None:
+                return titulo, cabecalho, None
+
+            pedidas = {normalizar_cabecalho(nome) for nome in colunas}
+            lidas = [
+                idx + 1
+                for idx, nome in enumerate(cabecalho)
+                if nome is not None and normalizar_cabecalho(nome) in pedidas
+            ]
+            posicoes = {coluna: idx for idx, coluna in enumerate(lidas)}
+            parser.colunas = set(lidas)
+            valores = [[] for _ in lidas]
+
+            # Linhas que faltam no arquivo entram vazias, como no openpyxl
+            proxima = 2
+            if numero is not None and numero != 1:
+                linhas = _encadear((numero, celulas), linhas)
+            for numero, celulas in linhas:
+                if numero < proxima:
+                    continue
+                for _ in range(proxima, numero):
+                    for coluna in valores:
+                        coluna.append(None)
+                linha = [None] * len(lidas)
+                for coluna, valor in celulas:
+                    linha[posicoes[coluna]] = valor
+                for coluna, valor in zip(valores, linha):
+                    coluna.append(valor)
+                proxima = numero + 1
+
+            nomes = [cabecalho[coluna - 1] for coluna in lidas]
+            if coluna_chave is not None:
+                # Até a última linha com a chave; as vazias do fim nem são resolvidas
+                fim = ultima_preenchida(valores[_posicao(nomes, coluna_chave, titulo)])
+                valores = [coluna[:fim] for coluna in valores]
+
+            textos.ler(referencias.indices)
+            tabela = Tabela(
+                nomes, [textos.resolver(coluna) for coluna in valores], titulo
+            )
+        return titulo, cabecalho, tabela
+    finally:
+        if fonte_textos is not None:
+            fonte_textos.close()
+        leitor.archive.close()
+
+
+def _posicao(nomes: list, nome: str, titulo: str) -> int:
+    """Posição da coluna nome entre as lidas (a última, como em Tabela.indice)."""
+    chave = normalizar_cabecalho(nome)
+    posicoes = [
+        idx for idx, lido in enumerate(nomes) if normalizar_cabecalho(lido) == chave
+    ]
+    if not posicoes:
+        raise ValueError(f"Coluna '{nome}' não encontrada no cabeçalho da aba {titulo}")
+    return posicoes[-1]
+
+
+def _encadear(primeira, demais):
+    yield primeira
+    yield from demais
+
+
+def ler_cabecalho(caminho: Path, aba: str | None = None) -> tuple:
+    """Cabeçalho (linha 1) da aba (padrão: a ativa), sem ler as demais linhas."""
+    return _ler(caminho, aba, None, None)[1]
+
+
+def ler_tabela_xlsx(caminho: Path, colunas, coluna_chave: str = "Chave") -> Tabela:
+    """
+    Lê a aba ativa do .xlsx como Tabela, como Tabela.de_aba(...).projetar(
+    colunas) faria sobre o load_workbook, mas sem converter as células das
+    outras colunas nem decodificar os textos compartilhados que só elas usam
+    (ex.: descrições longas fora do mapeamento). Os valores são convertidos
+    pelo próprio parser do openpyxl (mesmos tipos, datas e números).
+
+    colunas: cabeçalhos das colunas a ler (comparados por
+    normalizar_cabecalho); coluna_chave precisa estar entre elas.
+    """
+    return _ler(caminho, None, colunas, coluna_chave)[2]
@@ -1,8 +1,14 @@
+import argparse
 import datetime
+import os
 
 import relatorio_garantias
 import relatorio_project_room
-from utils import log_tempo
+import perfilador
+from config import PERFIL_ETAPAS, PERFIL_MODO, RELATORIOS_PARALELOS
+from orquestrador import executar_em_paralelo
+from processar_xls import processar_arquivos_xls
+from utils import log_tempo, preparar_pasta
 
 # Verifica se hoje é segunda-feira (0)
 hoje = datetime.datetime.today().weekday()
@@ -11,11 +17,54 @@ dias_da_semana = [0]  # 0 = segunda-feira
 
 def main():
     with log_tempo("[MASTER] Automação"):
-        relatorio_garantias.main()
+        gerar_project_room = hoje in dias_da_semana
 
-        if hoje in dias_da_semana:
-            relatorio_project_room.main()
+        # Todas as exportações do dia são convertidas de uma vez (em paralelo
+        # no backend python), em vez de uma conversão por relatório
+        arquivos = list(relatorio_garantias.ARQUIVOS_XLS)
+        if gerar_project_room:
+            arquivos += relatorio_project_room.ARQUIVOS_XLS
+
+        with log_tempo("[ARQUIVOS] Conversão e tratamento dos .xls"):
+            processar_arquivos_xls(preparar_pasta(), arquivos, True)
+
+        if gerar_project_room and RELATORIOS_PARALELOS:
+            # Um processo por relatório: o dia leva o tempo do mais lento
+            execucoes = executar_em_paralelo(["Garantias", "Project Room"])
+            falhas = [execucao.nome for execucao in execucoes if not execucao.ok]
+            if falhas:
+                raise RuntimeError(f"Relatórios com falha: {', '.join(falhas)}")
+            return
+
+        relatorio_garantias.main(converter=False)
+
+        if gerar_project_room:
+            relatorio_project_room.main(converter=False)
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os relatórios do dia.")
+    parser.add_argument(
+        "--perfil",
+        metavar="PADRAO",
+        default=PERFIL_ETAPAS,
+        help="perfila as etapas cujo nome casa com a expressão (ex.: 'Copia para')",
+    )
+    parser.add_argument(
+        "--perfil-modo",
+        choices=perfilador.MODOS,
+        default=PERFIL_MODO,
+        help="cprofile (padrão) ou amostragem",
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
+    args = ler_argumentos()
+    perfilador.configurar(args.perfil, args.perfil_modo)
+    # Os relatórios gerados em outros processos (orquestrador.py) leem o
+    # perfil do ambiente
+    if args.perfil:
+        os.environ["PERFIL_ETAPAS"] = args.perfil
+        os.environ["PERFIL_MODO"] = args.perfil_modo
     main()
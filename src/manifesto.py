@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from utils import log
+
+# Manifesto das conversões .xls -> .xlsx, gravado na pasta data
+NOME_MANIFESTO = "conversoes.json"
+
+# Tamanho do bloco lido ao calcular o hash do arquivo
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def hash_arquivo(caminho: Path) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+class ManifestoConversao:
+    """
+    Registro das conversões já feitas: para cada .xlsx de uploads, o .xls de
+    origem (hash, tamanho e mtime), as regras de limpeza aplicadas e o
+    arquivo gerado. Se nada mudou, a conversão pode ser pulada e o .xlsx
+    reutilizado.
+
+    O hash só é calculado quando tamanho ou mtime da origem mudaram (ex.: a
+    mesma exportação baixada de novo).
+    """
+
+    def __init__(self, pasta: Path):
+        self.pasta = pasta
+        self.caminho = pasta / NOME_MANIFESTO
+        self.entradas = self._carregar()
+        self.alterado = False
+        self._hashes = {}
+
+    def _carregar(self) -> dict:
+        try:
+            with open(self.caminho, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log(f"[CACHE] Manifesto inválido, ignorado: {e}")
+            return {}
+
+    def salvar(self):
+        """Grava o manifesto (arquivo temporário + troca, sem corromper)."""
+        temporario = self.caminho.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self.entradas, arquivo, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+        self.alterado = False
+
+    def _hash(self, arquivo: Path) -> str:
+        if arquivo not in self._hashes:
+            self._hashes[arquivo] = hash_arquivo(arquivo)
+        return self._hashes[arquivo]
+
+    def _relativo(self, caminho: Path) -> str:
+        try:
+            return caminho.relative_to(self.pasta).as_posix()
+        except ValueError:
+            return str(caminho)
+
+    def valido(self, arquivo: Path, destino: Path, regras: dict) -> bool:
+        """
+        Indica se destino é a conversão de arquivo com as regras informadas,
+        e se o .xlsx continua como foi gravado.
+        """
+        entrada = self.entradas.get(destino.name)
+        if not entrada or entrada.get("regras") != regras:
+            return False
+        if entrada.get("destino") != self._relativo(destino):
+            return False
+
+        try:
+            origem = arquivo.stat()
+            gerado = destino.stat()
+        except OSError:
+            return False
+
+        if (gerado.st_size, gerado.st_mtime) != (
+            entrada.get("destino_tamanho"),
+            entrada.get("destino_mtime"),
+        ):
+            return False
+
+        if origem.st_size != entrada.get("tamanho"):
+            return False
+        if origem.st_mtime == entrada.get("mtime"):
+            return True
+
+        # Mesmo tamanho e outra data: compara o conteúdo
+        if self._hash(arquivo) != entrada.get("hash"):
+            return False
+        entrada["origem"] = arquivo.name
+        entrada["mtime"] = origem.st_mtime
+        self.alterado = True
+        return True
+
+    def registrar(self, arquivo: Path, destino: Path, regras: dict):
+        """Registra a conversão de arquivo em destino com as regras aplicadas."""
+        origem = arquivo.stat()
+        gerado = destino.stat()
+        self.entradas[destino.name] = {
+            "origem": arquivo.name,
+            "hash": self._hash(arquivo),
+            "tamanho": origem.st_size,
+            "mtime": origem.st_mtime,
+            "regras": regras,
+            "destino": self._relativo(destino),
+            "destino_tamanho": gerado.st_size,
+            "destino_mtime": gerado.st_mtime,
+        }
+        self.alterado = True
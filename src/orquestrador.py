@@ -0,0 +1,148 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import relatorio_garantias
+import relatorio_project_room
+from utils import log, log_tempo
+
+# Relatórios que o orquestrador sabe executar (nome no log -> módulo)
+RELATORIOS = {
+    "Garantias": relatorio_garantias,
+    "Project Room": relatorio_project_room,
+}
+
+# Uma linha de saída dos processos por vez no log combinado
+_TRAVA_SAIDA = threading.Lock()
+
+
+class Execucao:
+    """Um relatório rodando em um processo filho."""
+
+    def __init__(self, nome: str, converter: bool = False):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.duracao = None
+        argumentos = [sys.executable, Path(__file__).name, "--executar", nome]
+        if converter:
+            argumentos.append("--converter")
+        self.processo = subprocess.Popen(
+            argumentos,
+            cwd=Path(__file__).resolve().parent,
+            env=dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding="utf-8",
+            errors="replace",
+        )
+        self._leitor = threading.Thread(target=self._repassar, daemon=True)
+        self._leitor.start()
+
+    def _repassar(self):
+        """
+        Repassa a saída do processo para o log, com o nome do relatório, e
+        registra a duração quando o processo termina.
+        """
+        for linha in self.processo.stdout:
+            with _TRAVA_SAIDA:
+                print(f"[{self.nome}] {linha}", end="", flush=True)
+        self.processo.wait()
+        self.duracao = time.perf_counter() - self.inicio
+
+    def esperar(self) -> int:
+        self._leitor.join()
+        self.processo.stdout.close()
+        return self.processo.returncode
+
+    @property
+    def codigo(self) -> int | None:
+        return self.processo.returncode
+
+    @property
+    def ok(self) -> bool:
+        return self.codigo == 0
+
+
+def executar_em_paralelo(nomes: list[str], converter: bool = False) -> list[Execucao]:
+    """
+    Roda os relatórios ao mesmo tempo, cada um em um processo, com a saída
+    de todos no mesmo log (cada linha com o nome do relatório). A falha de
+    um relatório não interrompe os outros; o resultado de cada um fica na
+    Execucao devolvida (na ordem de nomes).
+    """
+    desconhecidos = [nome for nome in nomes if nome not in RELATORIOS]
+    if desconhecidos:
+        raise ValueError(
+            f"Relatório desconhecido: {', '.join(desconhecidos)} "
+            f"(use {', '.join(RELATORIOS)})"
+        )
+
+    inicio = time.perf_counter()
+    with log_tempo("[ORQUESTRADOR] Relatórios em paralelo"):
+        log(f"[ORQUESTRADOR] Iniciando {', '.join(nomes)}")
+        execucoes = [Execucao(nome, converter) for nome in nomes]
+        for execucao in execucoes:
+            execucao.esperar()
+        resumir(execucoes, time.perf_counter() - inicio)
+    return execucoes
+
+
+def resumir(execucoes: list[Execucao], total: float):
+    """Registra no log a situação e o tempo de cada relatório e o total."""
+    log("[ORQUESTRADOR] Resumo:")
+    largura = max(len(execucao.nome) for execucao in execucoes)
+    for execucao in execucoes:
+        situacao = "ok" if execucao.ok else f"falhou (código {execucao.codigo})"
+        log(
+            f"[ORQUESTRADOR]   {execucao.nome:<{largura}}  "
+            f"{execucao.duracao:8.2f}s  {situacao}"
+        )
+    soma = sum(execucao.duracao for execucao in execucoes)
+    log(
+        f"[ORQUESTRADOR] Tempo total: {total:.2f}s "
+        f"(soma dos relatórios: {soma:.2f}s)"
+    )
+
+
+def executar_relatorio(nome: str, converter: bool = False):
+    """Gera um relatório no processo atual (processo filho do orquestrador)."""
+    RELATORIOS[nome].main(converter=converter)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera os relatórios ao mesmo tempo, um por processo."
+    )
+    parser.add_argument(
+        "relatorios",
+        nargs="*",
+        metavar="RELATORIO",
+        help=f"relatórios a gerar (padrão: todos; {', '.join(RELATORIOS)})",
+    )
+    parser.add_argument(
+        "--converter",
+        action="store_true",
+        help="cada relatório converte os seus .xls antes",
+    )
+    parser.add_argument("--executar", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.executar:
+        executar_relatorio(args.executar, args.converter)
+        return 0
+
+    try:
+        execucoes = executar_em_paralelo(
+            args.relatorios or list(RELATORIOS), args.converter
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    return 0 if all(execucao.ok for execucao in execucoes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import cProfile
+import marshal
+import pstats
+import re
+import sys
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from config import PERFIL_ETAPAS, PERFIL_MODO
+
+# Subpasta de data onde os perfis são gravados
+PASTA_PERFIS = "profiles"
+
+MODOS = ("cprofile", "amostragem")
+
+# Intervalo entre amostras do modo "amostragem", em segundos
+INTERVALO_AMOSTRAGEM = 0.005
+
+# Profundidade máxima das pilhas montadas a partir do cProfile
+PROFUNDIDADE_MAXIMA = 64
+
+_padrao = None
+_modo = "cprofile"
+
+# Threads com um perfil em andamento (um perfilador por thread)
+_ativos = set()
+
+
+def configurar(padrao: str | None = PERFIL_ETAPAS, modo: str = PERFIL_MODO):
+    """
+    Liga o perfilamento das etapas (blocos de log_tempo) cujo nome casa com
+    padrao (expressão regular, sem diferenciar maiúsculas; ex.: "Copia para").
+    Com padrao None, o perfilamento fica desligado.
+    """
+    global _padrao, _modo
+    if modo not in MODOS:
+        raise ValueError(f"Modo de perfil inválido '{modo}' (use {', '.join(MODOS)})")
+    _modo = modo
+    if not padrao:
+        _padrao = None
+        return
+    try:
+        _padrao = re.compile(padrao, re.IGNORECASE)
+    except re.error:
+        _padrao = re.compile(re.escape(padrao), re.IGNORECASE)
+
+
+def _nome_arquivo(nome: str) -> str:
+    texto = unicodedata.normalize("NFKD", nome)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^A-Za-z0-9]+", "_", texto).strip("_").lower() or "etapa"
+
+
+def _funcao(codigo) -> tuple:
+    """Chave de função no formato do pstats: (arquivo, linha, nome)."""
+    return (codigo.co_filename, codigo.co_firstlineno, codigo.co_name)
+
+
+def _rotulo(funcao: tuple) -> str:
+    arquivo, linha, nome = funcao
+    if arquivo == "~":
+        return nome
+    return f"{Path(arquivo).stem}:{nome}:{linha}"
+
+
+class _Amostrador(threading.Thread):
+    """Lê a pilha da thread perfilada a cada INTERVALO_AMOSTRAGEM."""
+
+    def __init__(self, alvo: int):
+        super().__init__(name="perfilador", daemon=True)
+        self.alvo = alvo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(INTERVALO_AMOSTRAGEM):
+            frame = sys._current_frames().get(self.alvo)
+            pilha = []
+            while frame is not None:
+                pilha.append(_funcao(frame.f_code))
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[tuple(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def _pstats_de_amostras(pilhas: Counter, intervalo: float) -> dict:
+    """
+    Monta um dicionário no formato do pstats a partir das amostras: tempos
+    estimados (amostras x intervalo) e contagens de chamadas = amostras.
+    """
+    proprio = Counter()
+    total = Counter()
+    chamadores = defaultdict(Counter)
+    for pilha, quantidade in pilhas.items():
+        proprio[pilha[-1]] += quantidade
+        for funcao in set(pilha):
+            total[funcao] += quantidade
+        for chamador, chamada in set(zip(pilha, pilha[1:])):
+            chamadores[chamada][chamador] += quantidade
+
+    estatisticas = {}
+    for funcao, quantidade in total.items():
+        origem = {
+            chamador: (n, n, 0.0, n * intervalo)
+            for chamador, n in chamadores[funcao].items()
+        }
+        estatisticas[funcao] = (
+            quantidade,
+            quantidade,
+            proprio[funcao] * intervalo,
+            quantidade * intervalo,
+            origem,
+        )
+    return estatisticas
+
+
+def _pilhas_de_pstats(estatisticas: dict) -> Counter:
+    """
+    Estima pilhas (em microssegundos de tempo próprio) a partir do grafo de
+    chamadas do cProfile: o tempo de cada função é dividido entre os
+    caminhos na proporção do tempo acumulado de cada chamador.
+    """
+    chamadas = defaultdict(list)
+    for funcao, (_, _, _, _, chamadores) in estatisticas.items():
+        for chamador, dados in chamadores.items():
+            acumulado = dados[3] if isinstance(dados, tuple) else 0.0
+            chamadas[chamador].append((funcao, acumulado))
+
+    pilhas = Counter()
+
+    def percorrer(funcao, caminho, fracao):
+        _, _, proprio, acumulado, _ = estatisticas[funcao]
+        caminho = caminho + (funcao,)
+        micros = int(proprio * fracao * 1_000_000)
+        if micros:
+            pilhas[caminho] += micros
+        if len(caminho) >= PROFUNDIDADE_MAXIMA or not acumulado:
+            return
+        for chamada, tempo in chamadas.get(funcao, ()):
+            total = estatisticas[chamada][3]
+            if chamada in caminho or not total:
+                continue
+            percorrer(chamada, caminho, tempo * fracao / total)
+
+    raizes = [f for f, dados in estatisticas.items() if not dados[4]]
+    for raiz in raizes:
+        percorrer(raiz, (), 1.0)
+    return pilhas
+
+
+def _gravar_pilhas(pilhas: Counter, caminho: Path):
+    """Grava as pilhas no formato "colapsado" (flamegraph.pl, speedscope)."""
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for pilha, valor in sorted(pilhas.items()):
+            arquivo.write(";".join(map(_rotulo, pilha)) + f" {valor}\n")
+
+
+class Perfil:
+    """Perfil de uma etapa em andamento (cProfile ou amostragem)."""
+
+    def __init__(self, nome: str, modo: str):
+        self.nome = nome
+        self.modo = modo
+        self.inicio = datetime.now()
+        self._thread = threading.get_ident()
+        _ativos.add(self._thread)
+        if modo == "cprofile":
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        else:
+            self._perfil = _Amostrador(self._thread)
+            self._perfil.start()
+
+    def encerrar(self, pasta: Path) -> tuple[Path, Path]:
+        """
+        Para o perfil e grava <etapa>_<data>.pstats e <etapa>_<data>.txt
+        (pilhas colapsadas) em pasta.
+        """
+        try:
+            if self.modo == "cprofile":
+                self._perfil.disable()
+                estatisticas = pstats.Stats(self._perfil).stats
+                pilhas = _pilhas_de_pstats(estatisticas)
+            else:
+                self._perfil.parar()
+                pilhas = self._perfil.pilhas
+                estatisticas = _pstats_de_amostras(pilhas, INTERVALO_AMOSTRAGEM)
+        finally:
+            _ativos.discard(self._thread)
+
+        base = (
+            f"{_nome_arquivo(self.nome)}_{self.inicio:%Y%m%d_%H%M%S}"
+            f"_{self.inicio.microsecond // 1000:03d}"
+        )
+        caminho_pstats = pasta / f"{base}.pstats"
+        caminho_pilhas = pasta / f"{base}.txt"
+        with open(caminho_pstats, "wb") as arquivo:
+            marshal.dump(estatisticas, arquivo)
+        _gravar_pilhas(pilhas, caminho_pilhas)
+        return caminho_pstats, caminho_pilhas
+
+
+def iniciar_perfil(nome: str) -> Perfil | None:
+    """
+    Começa o perfil da etapa se o nome casar com o padrão configurado e a
+    thread ainda não estiver sendo perfilada (etapas aninhadas entram no
+    perfil da etapa de fora). Desligado, custa uma comparação.
+    """
+    if _padrao is None or not _padrao.search(nome):
+        return None
+    if threading.get_ident() in _ativos:
+        return None
+    return Perfil(nome, _modo)
+
+
+configurar()
+
+
+if __name__ == "__main__":
+    # Resumo de um .pstats gravado: python perfilador.py arquivo.pstats [n]
+    estatisticas = pstats.Stats(sys.argv[1])
+    estatisticas.sort_stats("cumulative").print_stats(
+        int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    )
@@ -1,11 +1,42 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-import win32com.client as win32
-
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from config import (
+    BACKEND_CONVERSAO,
+    CACHE_CONVERSAO,
+    CONVERSAO_PARALELA,
+    PROCESSOS_CONVERSAO,
+)
+from leitor_biff import eh_arquivo_ole2, ler_linhas_biff
+from leitor_html import ler_linhas_html
+from manifesto import ManifestoConversao
 from utils import deletar_linhas, localizar_arquivo, log, log_tempo, salvar_excel
 
+try:
+    import win32com.client as win32
+except ImportError:  # Linux/macOS: sem Excel, apenas o backend python
+    win32 = None
+
 APAGAR_XLS = True
 
+# Linhas de cabeçalho da exportação do Jira (título, filtro e data)
+LINHAS_CABECALHO = {1, 2, 3}
+
+# Linhas com este valor são removidas da exportação
+VALOR_REMOVIDO = "SKYIT-182"
+
+# Texto do rodapé da exportação do Jira
+TEXTO_RODAPE = "Gerado em"
+
+# Versão da limpeza feita na conversão. Incremente ao mudar as regras (ex.:
+# limpar_linhas) para que as conversões em cache sejam refeitas.
+VERSAO_LIMPEZA = 1
+
 
 def limpar_uploads(pasta_base: Path) -> int:
     """Remove todos os arquivos .xlsx da pasta uploads.
@@ -53,7 +84,7 @@ def processar_arquivo_xlsx(caminho_origem: Path, caminho_destino: Path, excel):
             valores = sheet.UsedRange.Value
 
         # Determinar linhas para remover
-        linhas_para_remover = {1, 2, 3}
+        linhas_para_remover = set(LINHAS_CABECALHO)
 
         with log_tempo("[TRATAMENTO] Identificar última linha e SKYIT-182"):
             ultima_linha = len(valores)
@@ -61,7 +92,7 @@ def processar_arquivo_xlsx(caminho_origem: Path, caminho_destino: Path, excel):
 
             # Verificar última linha "Gerado em"
             if any(
-                valor and "Gerado em" in str(valor) for valor in ultima_linha_valores
+                valor and TEXTO_RODAPE in str(valor) for valor in ultima_linha_valores
             ):
                 linhas_para_remover.add(ultima_linha)
 
@@ -69,7 +100,7 @@ def processar_arquivo_xlsx(caminho_origem: Path, caminho_destino: Path, excel):
             linhas_skyit = [
                 idx
                 for idx, linha in enumerate(valores, start=1)
-                if "SKYIT-182" in linha
+                if VALOR_REMOVIDO in linha
             ]
             linhas_para_remover.update(linhas_skyit)
 
@@ -106,39 +137,298 @@ def processar_arquivo_xlsx(caminho_origem: Path, caminho_destino: Path, excel):
             workbook.Close(SaveChanges=False)
 
 
-def processar_arquivos_xls(folder_data: Path, arquivos_info: list[dict], del_xls: bool):
+def eh_rodape(linha) -> bool:
+    """Indica se a linha é o rodapé "Gerado em ..." da exportação do Jira."""
+    return any(valor and TEXTO_RODAPE in str(valor) for valor in linha[:5])
+
+
+def limpar_linhas(linhas):
     """
-    Processa arquivos .xls em uma pasta para .xlsx na pasta uploads.
+    Aplica, em uma única passada, a mesma limpeza feita via Excel: remove as
+    linhas de cabeçalho (1 a 3), as linhas "SKYIT-182" e o rodapé "Gerado em".
 
-    :param folder_data: pasta onde os arquivos estao
-    :param arquivos_info: lista de dicionarios com regex e novo_nome do arquivo
-    :param del_xls: se True, remove os arquivos .xls originais
+    Como o rodapé só é conhecido no fim do arquivo, a última linha com dados
+    (e as linhas vazias que a seguem) fica retida até a próxima linha chegar.
+
+    :param linhas: iterável de tuplas com os valores de cada linha
+    :return: gerador com as linhas que devem ir para o .xlsx
+    """
+    pendentes = []
+    for numero, linha in enumerate(linhas, start=1):
+        if any(valor is not None for valor in linha):
+            yield from pendentes
+            pendentes = []
+
+        if numero in LINHAS_CABECALHO or VALOR_REMOVIDO in linha:
+            continue
+        pendentes.append(linha)
+
+    # Linhas vazias no fim ficam fora do UsedRange e não são gravadas
+    if pendentes and any(valor is not None for valor in pendentes[0]):
+        if not eh_rodape(pendentes[0]):
+            yield pendentes[0]
+
+
+def salvar_linhas_xlsx(linhas, caminho_destino: Path, titulo: str = "Sheet1") -> int:
+    """
+    Grava as linhas em um .xlsx usando o modo write_only do openpyxl, sem
+    manter a planilha inteira em memória.
+
+    :param linhas: iterável de tuplas com os valores de cada linha
+    :param caminho_destino: caminho do arquivo .xlsx a ser salvo
+    :param titulo: nome da aba
+    :return: quantidade de linhas gravadas
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    total = 0
+    for linha in linhas:
+        ws.append(
+            [
+                (
+                    ILLEGAL_CHARACTERS_RE.sub("", valor)
+                    if isinstance(valor, str)
+                    else valor
+                )
+                for valor in linha
+            ]
+        )
+        total += 1
+
+    caminho_destino.parent.mkdir(parents=True, exist_ok=True)
+    with log_tempo("[ARQUIVO] Salvar arquivo"):
+        wb.save(caminho_destino)
+        log(f"[ARQUIVO] Arquivo salvo como: {caminho_destino.name}")
+
+    return total
+
+
+def ler_linhas_xls(caminho: Path):
     """
+    Lê as linhas de um .xls exportado pelo Jira, escolhendo o leitor pelo
+    conteúdo: BIFF8 (binário, OLE2) ou HTML.
+    """
+    if eh_arquivo_ole2(caminho):
+        log(f"[TRATAMENTO] {caminho.name}: formato binário (BIFF8)")
+        return ler_linhas_biff(caminho)
+
+    log(f"[TRATAMENTO] {caminho.name}: formato HTML")
+    return ler_linhas_html(caminho)
+
+
+def processar_arquivo_python(caminho_origem: Path, caminho_destino: Path):
+    """
+    Converte um .xls exportado pelo Jira (HTML ou BIFF8) para .xlsx sem usar o
+    Excel, aplicando a mesma limpeza de processar_arquivo_xlsx.
+
+    :param caminho_origem: caminho do arquivo .xls
+    :param caminho_destino: caminho do arquivo .xlsx a ser salvo
+    :return: o caminho do arquivo .xlsx salvo, ou None em caso de erro
+    """
+    try:
+        with log_tempo("[TRATAMENTO] Converter arquivo (.xls) sem Excel"):
+            linhas = limpar_linhas(ler_linhas_xls(caminho_origem))
+            # A imagem do topo não é lida, então não há o que remover
+            total = salvar_linhas_xlsx(linhas, caminho_destino)
+        log(f"[TRATAMENTO] Linhas gravadas: {total}")
+
+        return caminho_destino
+
+    except Exception as e:
+        log(f"[TRATAMENTO] Erro ao processar arquivo: {e}")
+        return None
+
+
+def abrir_excel():
+    """Abre uma instância oculta do Excel.Application para a conversão via COM."""
     excel = win32.gencache.EnsureDispatch("Excel.Application")
     excel.Visible = False
     excel.DisplayAlerts = False
     excel.ScreenUpdating = False
     excel.EnableEvents = False
+    return excel
 
-    try:
-        for regex, novo_nome in arquivos_info:
-            arquivo = localizar_arquivo(folder_data, regex)
-            if not arquivo:
-                log(f"[ARQUIVO] Nenhum arquivo encontrado para padrão: {regex}")
+
+def regras_limpeza(backend: str) -> dict:
+    """Regras aplicadas na conversão, registradas no manifesto de cache."""
+    return {
+        "versao": VERSAO_LIMPEZA,
+        "backend": backend,
+        "cabecalho": sorted(LINHAS_CABECALHO),
+        "removido": VALOR_REMOVIDO,
+        "rodape": TEXTO_RODAPE,
+    }
+
+
+def escolher_backend(backend: str | None = None) -> str:
+    """
+    Define o backend de conversão: "excel" (COM) ou "python".
+    Sem backend informado, usa o Excel apenas se o pywin32 estiver disponível.
+    """
+    backend = backend or BACKEND_CONVERSAO
+    if backend is None:
+        return "excel" if win32 is not None else "python"
+
+    if backend not in ("excel", "python"):
+        raise ValueError(f"Backend de conversão inválido: {backend}")
+    if backend == "excel" and win32 is None:
+        raise RuntimeError("Backend 'excel' exige o pywin32 e o Microsoft Excel")
+
+    return backend
+
+
+def _converter_em_processo(caminho_origem: Path, caminho_destino: Path):
+    """Converte um arquivo em um processo do pool, medindo o tempo gasto."""
+    inicio = time.perf_counter()
+    resultado = processar_arquivo_python(caminho_origem, caminho_destino)
+    return resultado, time.perf_counter() - inicio
+
+
+def processos_conversao(total_arquivos: int) -> int:
+    """Quantidade de processos do pool: um por arquivo, até o total de núcleos."""
+    limite = PROCESSOS_CONVERSAO or os.cpu_count() or 1
+    return max(1, min(total_arquivos, limite))
+
+
+def _converter_em_paralelo(tarefas: list[tuple[Path, Path]]) -> dict:
+    """
+    Converte os arquivos em um pool de processos (backend python).
+    Retorna {arquivo .xls: caminho do .xlsx ou None em caso de erro}.
+    """
+    resultados = {}
+    processos = processos_conversao(len(tarefas))
+    log(f"[ARQUIVO] Convertendo {len(tarefas)} arquivos em {processos} processos")
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = {
+            pool.submit(_converter_em_processo, arquivo, destino): arquivo
+            for arquivo, destino in tarefas
+        }
+        for futuro in as_completed(futuros):
+            arquivo = futuros[futuro]
+            try:
+                resultado, segundos = futuro.result()
+            except Exception as e:
+                log(f"[ARQUIVO] Erro ao processar {arquivo.name}: {e}")
+                resultados[arquivo] = None
                 continue
 
-            # Definir caminho de destino na pasta uploads
-            caminho_destino = folder_data / "uploads" / novo_nome
+            situacao = "convertido" if resultado else "com erro"
+            log(f"[ARQUIVO] {arquivo.name} {situacao} em {segundos:.2f} segundos.")
+            resultados[arquivo] = resultado
 
-            # Processar o arquivo
-            with log_tempo(f"[ARQUIVO] Processar {arquivo.name}"):
-                resultado = processar_arquivo_xlsx(arquivo, caminho_destino, excel)
+    return resultados
 
-                if resultado and del_xls and arquivo.suffix.lower() == ".xls":
-                    arquivo.unlink()
-                    log(f"[ARQUIVO] .xls original removido: {arquivo.name}")
-    finally:
-        excel.Quit()
+
+def processar_arquivos_xls(
+    folder_data: Path,
+    arquivos_info: list[dict],
+    del_xls: bool,
+    backend: str | None = None,
+    paralelo: bool = CONVERSAO_PARALELA,
+    usar_cache: bool = CACHE_CONVERSAO,
+) -> dict:
+    """
+    Processa arquivos .xls em uma pasta para .xlsx na pasta uploads.
+
+    :param folder_data: pasta onde os arquivos estao
+    :param arquivos_info: lista de dicionarios com regex e novo_nome do arquivo
+    :param del_xls: se True, remove os arquivos .xls originais
+    :param backend: "excel", "python" ou None (automático)
+    :param paralelo: com o backend python e mais de um arquivo (e núcleo),
+        converte em um pool de processos (o Excel via COM é sempre sequencial)
+    :param usar_cache: se True, pula a conversão de .xls que não mudaram desde
+        a última execução (ver manifesto.ManifestoConversao)
+    :return: {arquivo .xls: caminho do .xlsx ou None em caso de erro}
+    """
+    backend = escolher_backend(backend)
+    log(f"[ARQUIVO] Backend de conversão: {backend}")
+
+    tarefas = []
+    for regex, novo_nome in arquivos_info:
+        arquivo = localizar_arquivo(folder_data, regex)
+        if not arquivo:
+            log(f"[ARQUIVO] Nenhum arquivo encontrado para padrão: {regex}")
+            continue
+
+        if any(arquivo == origem for origem, _ in tarefas):
+            log(f"[ARQUIVO] {arquivo.name} já incluído na conversão")
+            continue
+
+        # Definir caminho de destino na pasta uploads
+        tarefas.append((arquivo, folder_data / "uploads" / novo_nome))
+
+    return converter_arquivos(
+        folder_data, tarefas, del_xls, backend, paralelo, usar_cache
+    )
+
+
+def converter_arquivos(
+    folder_data: Path,
+    tarefas: list[tuple[Path, Path]],
+    del_xls: bool,
+    backend: str,
+    paralelo: bool = CONVERSAO_PARALELA,
+    usar_cache: bool = CACHE_CONVERSAO,
+) -> dict:
+    """
+    Converte os arquivos já localizados: tarefas é uma lista de (arquivo
+    .xls, caminho do .xlsx). Usada por processar_arquivos_xls e pelo modo
+    vigia (um arquivo por vez, assim que chega).
+
+    :return: {arquivo .xls: caminho do .xlsx ou None em caso de erro}
+    """
+    # Exportações sem alteração desde a última conversão reutilizam o .xlsx
+    resultados = {}
+    regras = regras_limpeza(backend)
+    manifesto = ManifestoConversao(folder_data) if usar_cache else None
+    if manifesto is not None:
+        pendentes = []
+        for arquivo, caminho_destino in tarefas:
+            if manifesto.valido(arquivo, caminho_destino, regras):
+                log(
+                    f"[CACHE] {arquivo.name} sem alterações, reutilizando {caminho_destino.name}"
+                )
+                resultados[arquivo] = caminho_destino
+            else:
+                pendentes.append((arquivo, caminho_destino))
+        tarefas = pendentes
+
+    if backend == "python" and paralelo and processos_conversao(len(tarefas)) > 1:
+        convertidos = _converter_em_paralelo(tarefas)
+    else:
+        convertidos = {}
+        excel = abrir_excel() if backend == "excel" and tarefas else None
+        try:
+            for arquivo, caminho_destino in tarefas:
+                # Processar o arquivo
+                with log_tempo(f"[ARQUIVO] Processar {arquivo.name}"):
+                    if excel is not None:
+                        resultado = processar_arquivo_xlsx(
+                            arquivo, caminho_destino, excel
+                        )
+                    else:
+                        resultado = processar_arquivo_python(arquivo, caminho_destino)
+                convertidos[arquivo] = resultado
+        finally:
+            if excel is not None:
+                excel.Quit()
+
+    if manifesto is not None:
+        for arquivo, resultado in convertidos.items():
+            if resultado:
+                manifesto.registrar(arquivo, resultado, regras)
+        if manifesto.alterado:
+            manifesto.salvar()
+    resultados.update(convertidos)
+
+    for arquivo, resultado in resultados.items():
+        if resultado and del_xls and arquivo.suffix.lower() == ".xls":
+            arquivo.unlink()
+            log(f"[ARQUIVO] .xls original removido: {arquivo.name}")
+
+    return resultados
 
 
 def main():
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Subpasta de data onde cada execução grava o seu rastreio
+PASTA_RASTREIOS = "rastreios"
+
+# Separador entre etapas no caminho exibido pela comparação
+SEPARADOR = " > "
+
+# ru_maxrss vem em bytes no macOS e em KB nos demais sistemas
+_ESCALA_RSS = 1 if sys.platform == "darwin" else 1024
+
+# Etapa em andamento no contexto atual (cada thread tem o seu)
+_ETAPA_ATUAL = ContextVar("etapa_atual", default=None)
+
+
+class Etapa:
+    """
+    Uma etapa cronometrada (um bloco de log_tempo): tempo de relógio e de
+    CPU, linhas processadas, pico de memória (com tracemalloc), pico de RSS
+    do processo até o fim da etapa e as etapas filhas, na ordem em que
+    começaram.
+    """
+
+    def __init__(self, nome: str, pai=None, memoria: bool = False):
+        self.nome = nome
+        self.pai = pai
+        self.filhos = []
+        self.inicio = datetime.now()
+        self.duracao = None
+        self.cpu = None
+        self.linhas = 0
+        self.memoria = memoria
+        self.memoria_pico = 0
+        self.rss_pico = None
+        self.erro = None
+        self._relogio = time.perf_counter()
+        self._cpu = time.process_time()
+        self._token = None
+
+    def decorrido(self) -> float:
+        """Segundos desde o início (ou a duração, se já encerrada)."""
+        if self.duracao is not None:
+            return self.duracao
+        return time.perf_counter() - self._relogio
+
+    def adicionar_linhas(self, quantidade: int):
+        self.linhas += quantidade
+
+    def _medir_memoria(self):
+        """Acumula o pico do tracemalloc desde a última medição e reinicia."""
+        if self.memoria and tracemalloc.is_tracing():
+            self.memoria_pico = max(
+                self.memoria_pico, tracemalloc.get_traced_memory()[1]
+            )
+            tracemalloc.reset_peak()
+
+    def para_dict(self) -> dict:
+        dados = {
+            "nome": self.nome,
+            "inicio": self.inicio.isoformat(timespec="milliseconds"),
+            "duracao": round(self.decorrido(), 6),
+            "cpu": round(self.cpu, 6) if self.cpu is not None else None,
+            "linhas": self.linhas,
+        }
+        if self.rss_pico is not None:
+            dados["rss_pico_mb"] = round(self.rss_pico / 1024 / 1024, 1)
+        if self.memoria:
+            dados["memoria_pico_mb"] = round(self.memoria_pico / 1024 / 1024, 3)
+        if self.erro:
+            dados["erro"] = self.erro
+        dados["filhos"] = [filho.para_dict() for filho in self.filhos]
+        return dados
+
+
+def rss_pico() -> int | None:
+    """Maior RSS do processo até agora, em bytes (None sem o módulo resource)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _ESCALA_RSS
+
+
+def etapa_atual() -> Etapa | None:
+    return _ETAPA_ATUAL.get()
+
+
+def iniciar_etapa(nome: str, memoria: bool = False) -> Etapa:
+    """
+    Abre uma etapa filha da etapa atual (ou raiz, se não houver). Com
+    memoria na etapa raiz, o tracemalloc é ligado até o fim dela.
+    """
+    pai = _ETAPA_ATUAL.get()
+    if pai is not None:
+        memoria = pai.memoria
+        pai._medir_memoria()
+    elif memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    etapa = Etapa(nome, pai, memoria)
+    if pai is not None:
+        pai.filhos.append(etapa)
+    etapa._token = _ETAPA_ATUAL.set(etapa)
+    return etapa
+
+
+def encerrar_etapa(etapa: Etapa, erro: BaseException = None):
+    """Fecha a etapa, registrando tempos e memória, e volta para a etapa pai."""
+    etapa.duracao = time.perf_counter() - etapa._relogio
+    etapa.cpu = time.process_time() - etapa._cpu
+    etapa.rss_pico = rss_pico()
+    if erro is not None:
+        etapa.erro = type(erro).__name__
+
+    etapa._medir_memoria()
+    if etapa.pai is not None:
+        etapa.pai.memoria_pico = max(etapa.pai.memoria_pico, etapa.memoria_pico)
+    elif etapa.memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    _ETAPA_ATUAL.reset(etapa._token)
+
+
+def registrar_linhas(quantidade: int):
+    """Soma linhas processadas à etapa atual (se houver)."""
+    etapa = _ETAPA_ATUAL.get()
+    if etapa is not None:
+        etapa.adicionar_linhas(quantidade)
+
+
+def gravar_rastreio(etapa: Etapa, pasta: Path) -> Path:
+    """
+    Grava a árvore de etapas em pasta/rastreio_<data>_<hora>_<ms>.json (com
+    o pid no fim se outro processo já gravou um rastreio no mesmo ms, ex.:
+    relatórios em paralelo).
+    """
+    inicio = etapa.inicio
+    base = f"rastreio_{inicio:%Y%m%d_%H%M%S}_{inicio.microsecond // 1000:03d}"
+    dados = {
+        "versao": 1,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "etapas": etapa.para_dict(),
+    }
+    try:
+        caminho = pasta / f"{base}.json"
+        arquivo = open(caminho, "x", encoding="utf-8")
+    except FileExistsError:
+        caminho = pasta / f"{base}_{os.getpid()}.json"
+        arquivo = open(caminho, "w", encoding="utf-8")
+    with arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def limpar_rastreios(pasta: Path, manter: int) -> int:
+    """
+    Remove os rastreios mais antigos da pasta (pela data no nome), deixando
+    só os manter mais recentes.
+
+    Returns: int: quantidade de arquivos removidos.
+    """
+    rastreios = sorted(pasta.glob("rastreio_*.json"), key=lambda p: p.name)
+    removidos = 0
+    for antigo in rastreios[: max(len(rastreios) - manter, 0)]:
+        try:
+            antigo.unlink()
+            removidos += 1
+        except FileNotFoundError:
+            pass  # removido por outro processo (relatórios em paralelo)
+    return removidos
+
+
+def achatar(etapa: dict, prefixo: str = "") -> dict:
+    """
+    Caminho de cada etapa ("[MASTER] ... > [RELATÓRIO] ...") -> dados. Nomes
+    repetidos sob o mesmo pai ganham " #2", " #3"...
+    """
+    caminho = prefixo + etapa["nome"]
+    etapas = {caminho: etapa}
+    vistos = {}
+    for filho in etapa.get("filhos", []):
+        vistos[filho["nome"]] = vistos.get(filho["nome"], 0) + 1
+        nome = filho["nome"]
+        if vistos[nome] > 1:
+            filho = dict(filho, nome=f"{nome} #{vistos[nome]}")
+        etapas.update(achatar(filho, caminho + SEPARADOR))
+    return etapas
+
+
+def comparar(antes: dict, depois: dict) -> list[dict]:
+    """
+    Compara dois rastreios etapa a etapa (pelo caminho). Etapas que só
+    existem em um deles aparecem com o outro lado vazio.
+    """
+    etapas_antes = achatar(antes["etapas"])
+    etapas_depois = achatar(depois["etapas"])
+    caminhos = list(etapas_antes) + [c for c in etapas_depois if c not in etapas_antes]
+
+    resultado = []
+    for caminho in caminhos:
+        a, d = etapas_antes.get(caminho), etapas_depois.get(caminho)
+        duracao_a = a["duracao"] if a else None
+        duracao_d = d["duracao"] if d else None
+        variacao = None
+        if duracao_a and duracao_d is not None:
+            variacao = (duracao_d - duracao_a) / duracao_a * 100
+        resultado.append(
+            {
+                "caminho": caminho,
+                "nivel": caminho.count(SEPARADOR),
+                "antes": duracao_a,
+                "depois": duracao_d,
+                "diferenca": (
+                    duracao_d - duracao_a if a is not None and d is not None else None
+                ),
+                "variacao": variacao,
+                "linhas_antes": a["linhas"] if a else None,
+                "linhas_depois": d["linhas"] if d else None,
+            }
+        )
+    return resultado
+
+
+def _formatar(valor, formato: str) -> str:
+    return "-" if valor is None else format(valor, formato)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara dois rastreios (data/rastreios/*.json) etapa a etapa."
+    )
+    parser.add_argument("antes", type=Path, help="rastreio de referência")
+    parser.add_argument("depois", type=Path, help="rastreio a comparar")
+    parser.add_argument(
+        "--limite",
+        type=float,
+        default=0.0,
+        help="mostra só etapas com variação (%%) acima deste valor, em módulo",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.antes, encoding="utf-8") as arquivo:
+        antes = json.load(arquivo)
+    with open(args.depois, encoding="utf-8") as arquivo:
+        depois = json.load(arquivo)
+
+    print(
+        f"{'Etapa':<60} {'Antes (s)':>10} {'Depois (s)':>10} {'Dif. (s)':>9} "
+        f"{'Var. %':>8} {'Linhas':>15}"
+    )
+    for item in comparar(antes, depois):
+        variacao = item["variacao"]
+        if args.limite and (variacao is None or abs(variacao) < args.limite):
+            continue
+        nome = "  " * item["nivel"] + item["caminho"].rsplit(SEPARADOR, 1)[-1]
+        linhas = f"{_formatar(item['linhas_antes'], 'd')}/{_formatar(item['linhas_depois'], 'd')}"
+        print(
+            f"{nome[:60]:<60} {_formatar(item['antes'], '.2f'):>10} "
+            f"{_formatar(item['depois'], '.2f'):>10} "
+            f"{_formatar(item['diferenca'], '+.2f'):>9} "
+            f"{_formatar(variacao, '+.1f'):>8} {linhas:>15}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
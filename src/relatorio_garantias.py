@@ -1,340 +1,564 @@
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
-from openpyxl import load_workbook
-
-from config import COLUNAS_RELATORIO, MAPEAMENTO_COLUNAS
+from cache_tabelas import ler_tabela
+from config import (
+    ATUALIZACAO_INCREMENTAL,
+    COLUNAS_RELATORIO,
+    EXECUCAO_POR_ESTAGIOS,
+    GRAVACAO_PARCIAL,
+    LEITURA_STREAMING,
+    MAPEAMENTO_COLUNAS,
+    PROCESSOS_ESTAGIOS,
+    PROCESSOS_RENDERIZACAO,
+    RENDERIZACAO_PARALELA,
+)
+from estagios import Estagio, assinatura_arquivo, executar_estagios
+from gravador_xlsx import (
+    AbaRenderizada,
+    abrir_aba,
+    abrir_relatorio,
+    gravar_abas_renderizadas,
+    renderizar_aba,
+    salvar_relatorio,
+)
 from processar_xls import processar_arquivos_xls
+from rastreio import registrar_linhas
+from tabela import Tabela, como_tabela
 from utils import (
-    copiar_linha_com_formula,
-    filtrar_linhas,
+    colunas_usadas,
+    gravar_aba,
     log,
     log_tempo,
-    obter_ultima_linha_com_dados,
-    preparar_destino,
+    particionar_incidentes,
+    preparar_mapeamento,
     preparar_pasta,
 )
 
+# Abas de destino alimentadas pela extração de incidentes e seus filtros por
+# "Situação". Uma nova aba entra aqui, sem nova leitura da origem.
+DESTINOS_INCIDENTES = {
+    "RI": {"excluir": ["Resolvido", "Finalizado"]},
+    "Resolvidos-Fechados": {"incluir": ["Resolvido", "Finalizado"]},
+}
+
+# Exportações do Jira (.xls) usadas pelo relatório e o nome do .xlsx gerado
+ARQUIVOS_XLS = [
+    (r"Relatório RM \(Jira\).*\.xls", "Relatório RM (Jira).xlsx"),
+    (
+        r"Filtro Incidentes - Garantia de Projetos \(Jira\).*\.xls",
+        "Filtro Incidentes (Jira).xlsx",
+    ),
+    (r"Projetos \(Jira\).*\.xls", "Projetos (Jira).xlsx"),
+    (r"Defeitos SKY AD \(Jira\).*\.xls", "Defeitos SKY AD (Jira).xlsx"),
+]
+
 # Nome do relatorio
 NOME_RELATORIO = "Relatorio Incidentes_Garantia_Projetos_v5.xlsx"
 
+# Extrações (em uploads) lidas pelo relatório
+ORIGEM_FILTROS = "Filtro Incidentes (Jira).xlsx"
+ORIGEM_PROJETOS = "Projetos (Jira).xlsx"
+
+# Extrações de que o relatório depende (as demais de ARQUIVOS_XLS só são
+# convertidas; ver vigia.py)
+ORIGENS = (ORIGEM_FILTROS, ORIGEM_PROJETOS)
+
+
+def abrir_planilhas(somente_leitura: bool = LEITURA_STREAMING):
+    """
+    Lê as planilhas de origem (como Tabela, só com as colunas usadas, ver
+    ler_origem) e abre a de destino, retornando as tabelas, o workbook e as
+    worksheets.
 
-def abrir_planilhas():
-    """Abre planilha de origem e destino, retornando workbooks e worksheets."""
+    Com somente_leitura, as origens do Jira são abertas em modo read_only:
+    as linhas são lidas sob demanda, uma única vez, e a memória não cresce
+    com o tamanho da exportação.
+    """
 
     # Diretório onde os arquivos estao
-    dir_base = Path(__file__).resolve().parent / "data"
+    dir_base = preparar_pasta()
 
     # Onde vamos filtrar os dados, para copiar na planilha de destino
     # Filtros
     # - (Resolvidos e Fechados) vão para abra - [Resolvidos-Fechados]
     # - Diferentes de (Resolvidos e Fechados) vão para RI - [RI]
-    wb_origem_filtros = load_workbook(
-        dir_base / "uploads" / "Filtro Incidentes (Jira).xlsx"
-    )
-    ws_origem_filtros = wb_origem_filtros.active
+    origem_filtros = ler_origem(dir_base, ORIGEM_FILTROS, somente_leitura)
 
     # Planilha de destino - [Relatório]
-    wb_destino_relatorio = load_workbook(dir_base / NOME_RELATORIO)
+    wb_destino_relatorio = abrir_relatorio(dir_base / NOME_RELATORIO)
     ws_destino_resolvidos_fechados = wb_destino_relatorio["Resolvidos-Fechados"]
     ws_destino_ri = wb_destino_relatorio["RI"]
     ws_destino_projetos = wb_destino_relatorio["Projetos"]
 
     # Planilha de origem - [Extração de Projetos]
-    wb_origem_projetos = load_workbook(dir_base / "uploads" / "Projetos (Jira).xlsx")
-    ws_origem_projetos = wb_origem_projetos.active
+    origem_projetos = ler_origem(dir_base, ORIGEM_PROJETOS, somente_leitura)
 
     return (
-        wb_origem_filtros,
-        ws_origem_filtros,
+        origem_filtros,
         wb_destino_relatorio,
         ws_destino_resolvidos_fechados,
         ws_destino_ri,
-        wb_origem_projetos,
-        ws_origem_projetos,
+        origem_projetos,
         ws_destino_projetos,
     )
 
 
-def preparar_mapeamento(ws_origem, ws_destino, mapa_colunas):
+def processar_rf(
+    ws_origem,
+    ws_destino,
+    linhas: Tabela = None,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
+):
     """
-    Prepara índices e colunas para cópia entre origem e destino.
-    Exige que seja passado um mapeamento customizado de colunas.
+    Processa a aba de Incidentes (ws_origem) e copia as linhas com status
+    'Resolvido' e 'Finalizado' para a aba de Relatório de Finalizados (ws_destino).
+
+    Args:
+        ws_origem (Worksheet | Tabela): Aba de Incidentes (ou a Tabela já lida).
+        ws_destino (Worksheet): Aba de Relatório de Finalizados.
+        linhas (Tabela): Lote já particionado (ver particionar_incidentes). Se
+            None, a origem é lida e filtrada só para esta aba.
+        incremental (bool): Atualiza só as linhas que mudaram (ver gravar_aba).
     """
-    cabecalhos_origem = [cell.value for cell in ws_origem[1]]
-    cabecalhos_destino = [cell.value for cell in ws_destino[1]]
 
-    indices_origem = {name: idx + 1 for idx, name in enumerate(cabecalhos_origem)}
-    indices_destino = {name: idx + 1 for idx, name in enumerate(cabecalhos_destino)}
+    # Número da Linha Modelo.
+    nun_linha = 145
 
-    # Não precisa mais de fallback; mapa_colunas é obrigatório
-    colunas_para_copiar = [
-        indices_destino[dest]
-        for dest in mapa_colunas.values()
-        if dest in indices_destino
-    ]
+    # Sem lote pronto, filtra a origem só para esta aba
+    if linhas is None:
+        linhas = particionar_incidentes(
+            ws_origem,
+            {"Resolvidos-Fechados": DESTINOS_INCIDENTES["Resolvidos-Fechados"]},
+        )["Resolvidos-Fechados"]
 
-    return mapa_colunas, indices_origem, indices_destino, colunas_para_copiar
+    # Só as colunas de origem usadas no mapeamento seguem para a cópia
+    lote = linhas.projetar(MAPEAMENTO_COLUNAS.values())
+    plano = preparar_mapeamento(lote, ws_destino, MAPEAMENTO_COLUNAS, COLUNAS_RELATORIO)
 
+    gravar_aba(ws_destino, nun_linha, lote, plano, incremental)
 
-def preparar_mapeamento_simples(ws_origem, ws_destino):
-    """Prepara índices e colunas para cópia entre origem e destino."""
 
-    # Cria os cabeçalhos
-    cabecalhos_origem = [cell.value for cell in ws_origem[1]]
-    cabecalhos_destino = [cell.value for cell in ws_destino[1]]
+def processar_ri(
+    ws_origem,
+    ws_destino,
+    linhas: Tabela = None,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
+):
+    """
+    Processa a aba de Incidentes (ws_origem) e copia as linhas com status
+    diferente de 'Resolvido' e 'Finalizado' para a aba de Relatório de Incidentes (ws_destino).
+
+    Args:
+        ws_origem (Worksheet | Tabela): Aba de Incidentes (ou a Tabela já lida).
+        ws_destino (Worksheet): Aba de Relatório de Incidentes.
+        linhas (Tabela): Lote já particionado (ver particionar_incidentes). Se
+            None, a origem é lida e filtrada só para esta aba.
+        incremental (bool): Atualiza só as linhas que mudaram (ver gravar_aba).
+    """
 
-    # Cria os indices
-    indices_origem = {name: idx + 1 for idx, name in enumerate(cabecalhos_origem)}
-    indices_destino = {name: idx + 1 for idx, name in enumerate(cabecalhos_destino)}
+    # Número da Linha Modelo.
+    nun_linha = 2
 
-    # Mapeamento entre colunas de origem e destino
-    mapa_colunas = {col: col for col in cabecalhos_destino if col in cabecalhos_origem}
+    # Sem lote pronto, filtra a origem só para esta aba
+    if linhas is None:
+        linhas = particionar_incidentes(ws_origem, {"RI": DESTINOS_INCIDENTES["RI"]})[
+            "RI"
+        ]
 
-    # Colunas do destino que devem ser copiadas
-    colunas_para_copiar = [
-        indices_destino[dest] for dest in mapa_colunas.keys() if dest in indices_destino
-    ]
+    # Só as colunas de origem usadas no mapeamento seguem para a cópia
+    lote = linhas.projetar(MAPEAMENTO_COLUNAS.values())
+    plano = preparar_mapeamento(lote, ws_destino, MAPEAMENTO_COLUNAS, COLUNAS_RELATORIO)
 
-    return mapa_colunas, indices_origem, indices_destino, colunas_para_copiar
+    gravar_aba(ws_destino, nun_linha, lote, plano, incremental)
 
 
-def copiar_para_aba(
-    ws_destino,
-    linha_modelo,
-    linhas_origem,
-    linha_destino,
+def processar_projetos(
     ws_origem,
-    mapa_colunas,
-    indice_origem,
-    indice_destino,
-    colunas_para_copiar,
-    ajustar_formulas: bool = True,
-    colunas_extras: list[str] = None,
+    ws_destino,
+    tabela: Tabela = None,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
 ):
-    """Copia linhas da origem para a aba de destino mantendo formatação e fórmulas."""
-    for linha_origem in linhas_origem:
-        copiar_linha_com_formula(
-            ws_destino,
-            linha_origem=linha_modelo,
-            linha_destino=linha_destino,
-            colunas=colunas_para_copiar,
-            colunas_extras=colunas_extras if colunas_extras else [],
-            ajustar_formulas=ajustar_formulas,
-        )
+    """
+    Processa a aba de Incidentes (ws_origem) e copia todas as linhas para a aba de Projetos (ws_destino).
 
-        for coluna_destino, coluna_origem in mapa_colunas.items():
-            idx_dest = indice_destino.get(coluna_destino)
-            idx_origem = indice_origem.get(coluna_origem)
-            if idx_dest is None or idx_origem is None:
-                continue
+    Args:
+        ws_origem (Worksheet | Tabela): Aba de Incidentes (ou a Tabela já lida).
+        ws_destino (Worksheet): Aba de Projetos.
+        tabela (Tabela): Origem já lida. Se None, é lida de ws_origem.
+        incremental (bool): Atualiza só as linhas que mudaram (ver gravar_aba).
+    """
 
-            valor_origem = ws_origem.cell(row=linha_origem, column=idx_origem).value
-            ws_destino.cell(row=linha_destino, column=idx_dest).value = valor_origem
+    # Número da Linha Modelo.
+    nun_linha = 2
 
-        linha_destino += 1
+    # prepara mapeamento entre origem e destino
+    if tabela is None:
+        tabela = como_tabela(ws_origem)
+    plano = preparar_mapeamento(tabela, ws_destino)
 
-    return linha_destino - 2
+    gravar_aba(
+        ws_destino, nun_linha, tabela, plano, incremental, ajustar_formulas=False
+    )
 
 
-def obter_ultima_linha(ws, coluna_chave):
-    """
-    Retorna o índice da última linha com dados em uma coluna chave.
-    Args: ws: Worksheet (aba do Excel) coluna_chave (str): Nome do cabeçalho da coluna usada como referência.
-    Returns: int: Número da última linha com dados.
-    """
-    cabecalho = [cell.value for cell in ws[1]]
-    if coluna_chave not in cabecalho:
-        raise ValueError(
-            f"Coluna '{coluna_chave}' não encontrada no cabeçalho da aba {ws.title}"
-        )
+# Abas processadas em paralelo (RENDERIZACAO_PARALELA): extração de origem e
+# função de cada uma. A ordem é a da gravação (a mesma do processamento em
+# série), e o relatório não depende de qual aba termina primeiro.
+ABAS_PARALELAS = {
+    "Projetos": (ORIGEM_PROJETOS, processar_projetos),
+    "RI": (ORIGEM_FILTROS, processar_ri),
+    "Resolvidos-Fechados": (ORIGEM_FILTROS, processar_rf),
+}
 
-    idx_col = cabecalho.index(coluna_chave) + 1
-    return obter_ultima_linha_com_dados(ws, idx_col)
+# Mapeamento de colunas de cada aba (None: colunas com o mesmo nome, ver
+# utils.preparar_mapeamento)
+MAPAS_ABAS = {
+    "Projetos": None,
+    "RI": MAPEAMENTO_COLUNAS,
+    "Resolvidos-Fechados": MAPEAMENTO_COLUNAS,
+}
 
 
-def processar_rf(ws_origem, ws_destino):
+def colunas_origem(data: Path, origem: str) -> list | None:
     """
-    Processa a aba de Incidentes (ws_origem) e copia as linhas com status
-    'Resolvido' e 'Finalizado' para a aba de Relatório de Finalizados (ws_destino).
+    Colunas da extração que os planos de cópia das abas que a leem (ver
+    ABAS_PARALELAS e MAPAS_ABAS) usam (ver utils.colunas_usadas).
+    """
+    mapas_abas = {
+        aba: MAPAS_ABAS[aba]
+        for aba, (origem_aba, _) in ABAS_PARALELAS.items()
+        if origem_aba == origem
+    }
+    return colunas_usadas(data / "uploads" / origem, data / NOME_RELATORIO, mapas_abas)
 
-    Args:
-        ws_origem (Worksheet): Aba de Incidentes.
-        ws_destino (Worksheet): Aba de Relatório de Finalizados.
+
+def ler_origem(
+    data: Path, origem: str, somente_leitura: bool = LEITURA_STREAMING
+) -> Tabela:
     """
+    Lê a extração de uploads como Tabela (ver cache_tabelas.ler_tabela), só
+    com as colunas de colunas_origem.
+    """
+    colunas = colunas_origem(data, origem)
+    return ler_tabela(data / "uploads" / origem, somente_leitura, colunas=colunas)
 
-    # Número da Linha Modelo.
-    nun_linha = 145
 
-    # Limpar aba de destino
-    preparar_destino(ws_destino, linha_modelo=nun_linha)
+def processos_renderizacao(total_abas: int) -> int:
+    """Quantidade de processos do pool: um por aba, até o total de núcleos."""
+    limite = PROCESSOS_RENDERIZACAO or os.cpu_count() or 1
+    return max(1, min(total_abas, limite))
 
-    # Obter a última linha
-    ultima_linha = obter_ultima_linha(ws_origem, "Chave")
 
-    mapa_colunas, indice_origem, indice_destino, colunas_para_copiar = (
-        preparar_mapeamento(ws_origem, ws_destino, MAPEAMENTO_COLUNAS)
-    )
+def _renderizar_em_processo(
+    aba: str, dir_base: Path, pasta: Path, linhas: Tabela = None
+) -> tuple[AbaRenderizada, float]:
+    """
+    Processa uma aba em um processo do pool: abre só essa aba do modelo,
+    copia as linhas e grava o XML pronto da aba em pasta. linhas: o lote já
+    particionado da aba; se None, a extração dela é lida no processo.
+    """
+    inicio = time.perf_counter()
+    origem, processar = ABAS_PARALELAS[aba]
 
-    # Copiar para RF (filtrando status = 'Resolvido' e 'Finalizado')
-    linhas_para_RF = filtrar_linhas(
-        ws_origem,
-        indice_origem["Situação"],
-        incluir=["Resolvido", "Finalizado"],
-        linha_inicial=2,
-        linha_final=ultima_linha,
-    )
-    copiar_para_aba(
-        ws_destino,
-        linha_modelo=nun_linha,
-        linhas_origem=linhas_para_RF,
-        linha_destino=nun_linha,
-        ws_origem=ws_origem,
-        mapa_colunas=mapa_colunas,
-        indice_origem=indice_origem,
-        indice_destino=indice_destino,
-        colunas_para_copiar=colunas_para_copiar,
-        colunas_extras=COLUNAS_RELATORIO,
-    )
+    if linhas is None:
+        linhas = ler_origem(dir_base, origem)
+    ws_destino = abrir_aba(dir_base / NOME_RELATORIO, aba)
+    processar(None, ws_destino, linhas)
 
+    descritor, arquivo = tempfile.mkstemp(suffix=".xml", dir=pasta)
+    os.close(descritor)
+    renderizada = renderizar_aba(ws_destino, dir_base / NOME_RELATORIO, arquivo)
+    return renderizada, time.perf_counter() - inicio
 
-def processar_ri(ws_origem, ws_destino):
-    """
-    Processa a aba de Incidentes (ws_origem) e copia as linhas com status
-    diferente de 'Resolvido' e 'Finalizado' para a aba de Relatório de Incidentes (ws_destino).
 
-    Args:
-        ws_origem (Worksheet): Aba de Incidentes.
-        ws_destino (Worksheet): Aba de Relatório de Incidentes.
+def gerar_em_paralelo(data: Path) -> bool:
+    """
+    Processa as abas de ABAS_PARALELAS ao mesmo tempo, uma por processo, e
+    monta o relatório com as partes prontas (ver
+    gravador_xlsx.gravar_abas_renderizadas). Devolve False, sem gravar o
+    relatório, quando o modo não se aplica (um núcleo só, sem gravação
+    parcial) ou alguma aba não pode ser gravada por partes.
+    """
+    processos = processos_renderizacao(len(ABAS_PARALELAS))
+    if not GRAVACAO_PARCIAL or processos < 2:
+        return False
+
+    with tempfile.TemporaryDirectory() as pasta:
+        try:
+            with log_tempo("[RELATÓRIO] ~ Relatório de Garantias"):
+                log(
+                    f"[RELATÓRIO] Processando {len(ABAS_PARALELAS)} abas em "
+                    f"{processos} processos"
+                )
+                with ProcessPoolExecutor(max_workers=processos) as pool:
+                    # As abas de outras extrações leem a sua no processo; a de
+                    # incidentes é lida e particionada uma vez aqui, enquanto
+                    # elas rodam, e cada aba recebe só o seu lote
+                    futuros = {
+                        aba: pool.submit(
+                            _renderizar_em_processo, aba, data, Path(pasta)
+                        )
+                        for aba, (origem, _) in ABAS_PARALELAS.items()
+                        if origem != ORIGEM_FILTROS
+                    }
+                    lotes = particionar_incidentes(
+                        ler_origem(data, ORIGEM_FILTROS), DESTINOS_INCIDENTES
+                    )
+                    for aba, lote in lotes.items():
+                        futuros[aba] = pool.submit(
+                            _renderizar_em_processo, aba, data, Path(pasta), lote
+                        )
+
+                    renderizadas = []
+                    for aba in ABAS_PARALELAS:
+                        renderizada, segundos = futuros[aba].result()
+                        log(
+                            f"[RELATÓRIO] Aba {aba} processada em {segundos:.2f} segundos."
+                        )
+                        renderizadas.append(renderizada)
+
+            with log_tempo("[RELATÓRIO] Gravação do relatório"):
+                gravar_abas_renderizadas(data / NOME_RELATORIO, renderizadas)
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            log(
+                f"[RELATÓRIO] Processamento paralelo indisponível ({e}), "
+                "processando em série."
+            )
+            return False
+    return True
+
+
+# Subpasta de data com os checkpoints dos estágios (EXECUCAO_POR_ESTAGIOS)
+PASTA_ESTAGIOS = Path(".cache") / "garantias"
+
+
+def _converter_extracoes(data: Path, converter: bool) -> dict:
+    """
+    Estágio de conversão dos .xls (sempre roda; com o manifesto de conversão,
+    .xls já convertidos são pulados). A saída, tamanho e data de cada
+    extração em uploads, é o que decide se a leitura roda de novo.
     """
+    if converter:
+        processar_arquivos_xls(data, ARQUIVOS_XLS, True)
+    return {
+        nome: assinatura_arquivo(data / "uploads" / nome)
+        for nome in (ORIGEM_PROJETOS, ORIGEM_FILTROS)
+    }
 
-    # Número da Linha Modelo.
-    nun_linha = 2
 
-    # Limpar aba de destino
-    preparar_destino(ws_destino)
+def _colunas_extracoes(data: Path, extracoes: dict) -> dict:
+    """
+    Estágio das colunas lidas de cada extração (ver colunas_origem; sempre
+    roda). Lê só os cabeçalhos: a leitura roda de novo quando as colunas
+    usadas mudam, e não a cada gravação do modelo.
+    """
+    return {nome: colunas_origem(data, nome) for nome in extracoes}
 
-    # Obter a última linha
-    ultima_linha = obter_ultima_linha(ws_origem, "Chave")
 
-    # Preparar mapeamento entre origem e destino
-    mapa_colunas, indice_origem, indice_destino, colunas_para_copiar = (
-        preparar_mapeamento(ws_origem, ws_destino, MAPEAMENTO_COLUNAS)
-    )
+def _ler_extracao(data: Path, nome: str, colunas: dict) -> Tabela:
+    """Estágio de leitura: as colunas usadas da extração de uploads."""
+    tabela = ler_tabela(data / "uploads" / nome, colunas=colunas[nome])
+    registrar_linhas(len(tabela))
+    log(f"[RELATÓRIO] Linhas lidas de {nome}: {len(tabela)}")
+    return tabela
 
-    linhas_para_RI = filtrar_linhas(
-        ws_origem,
-        indice_origem["Situação"],
-        excluir=["Resolvido", "Finalizado"],
-        linha_inicial=2,
-        linha_final=ultima_linha,
-    )
-    copiar_para_aba(
-        ws_destino,
-        linha_modelo=nun_linha,
-        linhas_origem=linhas_para_RI,
-        linha_destino=nun_linha,
-        ws_origem=ws_origem,
-        mapa_colunas=mapa_colunas,
-        indice_origem=indice_origem,
-        indice_destino=indice_destino,
-        colunas_para_copiar=colunas_para_copiar,
-        colunas_extras=COLUNAS_RELATORIO,
-    )
+
+def _particionar_tabela(incidentes: Tabela) -> dict:
+    """Estágio de partição: os incidentes separados por aba de destino."""
+    lotes = incidentes.particionar("Situação", DESTINOS_INCIDENTES)
+    for nome, lote in lotes.items():
+        log(f"[RELATÓRIO] Linhas filtradas para aba '{nome}': {len(lote)}")
+    return lotes
 
 
-def processar_projetos(ws_origem, ws_destino):
+def _renderizar_estagio(data: Path, aba: str, linhas) -> AbaRenderizada:
     """
-    Processa a aba de Incidentes (ws_origem) e copia todas as linhas para a aba de Projetos (ws_destino).
+    Estágio de uma aba: copia as linhas para a aba do modelo e grava o XML
+    pronto em PASTA_ESTAGIOS. linhas: a Tabela de Projetos ou os lotes da
+    partição (a aba usa o seu).
+    """
+    _, processar = ABAS_PARALELAS[aba]
+    if isinstance(linhas, dict):
+        linhas = linhas[aba]
+    ws_destino = abrir_aba(data / NOME_RELATORIO, aba)
+    processar(None, ws_destino, linhas)
+    arquivo = preparar_pasta(str(PASTA_ESTAGIOS)) / f"{aba}.xml"
+    return renderizar_aba(ws_destino, data / NOME_RELATORIO, arquivo)
 
-    Args:
-        ws_origem (Worksheet): Aba de Incidentes.
-        ws_destino (Worksheet): Aba de Projetos.
+
+def _aba_renderizada_existe(renderizada: AbaRenderizada) -> bool:
+    return renderizada.arquivo.exists()
+
+
+def _gravar_estagio(data: Path, *renderizadas: AbaRenderizada):
+    """Estágio final: monta o relatório com as abas prontas."""
+    gravar_abas_renderizadas(data / NOME_RELATORIO, list(renderizadas))
+
+
+def estagios_relatorio(data: Path, converter: bool) -> list[Estagio]:
     """
+    O relatório como grafo de estágios (ver estagios.executar_estagios):
 
-    # Número da Linha Modelo.
-    nun_linha = 2
+        converter -> colunas -> ler_projetos ------------> aba_projetos -> gravar
+                             -> ler_incidentes -> particionar -> aba_ri  -^
+                                                              -> aba_rf  -^
 
-    # Limpar aba de destino
-    preparar_destino(ws_destino)
+    As abas dependem também do modelo (o relatório salvo): enquanto ele não
+    muda (ex.: a gravação falhou), as abas já processadas são reaproveitadas.
+    """
+    modelo = [data / NOME_RELATORIO]
+    abas = {
+        "aba_projetos": ("Projetos", "ler_projetos"),
+        "aba_ri": ("RI", "particionar"),
+        "aba_rf": ("Resolvidos-Fechados", "particionar"),
+    }
+    return [
+        Estagio(
+            "converter",
+            partial(_converter_extracoes, data, converter),
+            cache=False,
+            local=True,
+        ),
+        Estagio(
+            "colunas",
+            partial(_colunas_extracoes, data),
+            ["converter"],
+            cache=False,
+            local=True,
+        ),
+        Estagio(
+            "ler_projetos",
+            partial(_ler_extracao, data, ORIGEM_PROJETOS),
+            ["colunas"],
+        ),
+        Estagio(
+            "ler_incidentes",
+            partial(_ler_extracao, data, ORIGEM_FILTROS),
+            ["colunas"],
+        ),
+        Estagio("particionar", _particionar_tabela, ["ler_incidentes"]),
+        *(
+            Estagio(
+                nome,
+                partial(_renderizar_estagio, data, aba),
+                [entrada],
+                arquivos=modelo,
+                valido=_aba_renderizada_existe,
+            )
+            for nome, (aba, entrada) in abas.items()
+        ),
+        Estagio(
+            "gravar",
+            partial(_gravar_estagio, data),
+            list(abas),
+            cache=False,
+            local=True,
+        ),
+    ]
 
-    # Obter a última linha
-    ultima_linha = obter_ultima_linha(ws_origem, "Chave")
 
-    # prepara mapeamento entre origem e destino
-    mapa_colunas, indice_origem, indice_destino, colunas_para_copiar = (
-        preparar_mapeamento_simples(ws_origem, ws_destino)
-    )
+def gerar_por_estagios(data: Path, converter: bool) -> bool:
+    """
+    Gera o relatório pelo grafo de estágios (ver estagios_relatorio), com
+    checkpoints em data/.cache: uma nova execução retoma do primeiro estágio
+    cujas entradas mudaram ou cujo checkpoint falta. Devolve False, sem
+    gravar o relatório, quando alguma aba não pode ser gravada por partes.
+    """
+    if not GRAVACAO_PARCIAL:
+        return False
+
+    processos = PROCESSOS_ESTAGIOS or os.cpu_count() or 1
+    try:
+        with log_tempo("[RELATÓRIO] ~ Relatório de Garantias (estágios)"):
+            executar_estagios(
+                estagios_relatorio(data, converter),
+                preparar_pasta(str(PASTA_ESTAGIOS)),
+                processos,
+            )
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        log(
+            f"[RELATÓRIO] Execução por estágios indisponível ({e}), "
+            "processando em série."
+        )
+        return False
+    return True
+
+
+def gerar_em_serie(data: Path):
+    """Processa as abas uma depois da outra e salva o relatório."""
+    with log_tempo("[RELATÓRIO] ~ Relatório de Garantias"):
+        # Abrir planilhas
+        (
+            origem_filtros,
+            wb_destino_relatorio,
+            ws_destino_relatorio,
+            ws_destino_ri,
+            origem_projetos,
+            ws_destino_projetos,
+        ) = abrir_planilhas()
+
+        with log_tempo("[RELATÓRIO] Copia de projetos"):
+            # [Projetos]
+            processar_projetos(origem_projetos, ws_destino_projetos)
+
+        with log_tempo("[RELATÓRIO] Particionar incidentes"):
+            # Uma única leitura da origem para todas as abas de incidentes
+            lotes = particionar_incidentes(origem_filtros, DESTINOS_INCIDENTES)
+
+        with log_tempo("[RELATÓRIO] Copia para  - RI"):
+            # [RI - Chamados Abertos]
+            processar_ri(origem_filtros, ws_destino_ri, lotes["RI"])
+
+        with log_tempo("[RELATÓRIO] Copia para  - RF"):
+            # [Resolvidos e Fechados]
+            processar_rf(
+                origem_filtros,
+                ws_destino_relatorio,
+                lotes["Resolvidos-Fechados"],
+            )
+
+    # Salvar planilha (só as abas alteradas)
+    with log_tempo("[RELATÓRIO] Gravação do relatório"):
+        salvar_relatorio(
+            wb_destino_relatorio,
+            data / NOME_RELATORIO,
+            [ws_destino_relatorio, ws_destino_ri, ws_destino_projetos],
+        )
 
-    linhas = list(range(2, ultima_linha + 1))
-    total_copiados = copiar_para_aba(
-        ws_destino,
-        linha_modelo=nun_linha,
-        linhas_origem=linhas,
-        linha_destino=nun_linha,
-        ws_origem=ws_origem,
-        mapa_colunas=mapa_colunas,
-        indice_origem=indice_origem,
-        indice_destino=indice_destino,
-        colunas_para_copiar=colunas_para_copiar,
-        ajustar_formulas=False,
-    )
-    log(
-        f"[RELATÓRIO] Total de registros copiados para aba {ws_destino.title}: {total_copiados}"
-    )
+    # Fechar o workbook
+    wb_destino_relatorio.close()
 
 
-def main():
+def main(converter: bool = True):
+    """
+    Gera o relatório de Garantias. Com converter=False, usa os .xlsx já
+    convertidos em uploads (ver main.py). Com RENDERIZACAO_PARALELA, as abas
+    são processadas em paralelo (ver gerar_em_paralelo); com
+    EXECUCAO_POR_ESTAGIOS, pelo grafo de estágios com checkpoints (ver
+    gerar_por_estagios).
+    """
     with log_tempo("[PROCESSAMENTO] Garantias"):
         # Diretório onde os arquivos estao
         data = preparar_pasta()
 
-        mapeamento = [
-            (r"Relatório RM \(Jira\).*\.xls", "Relatório RM (Jira).xlsx"),
-            (
-                r"Filtro Incidentes - Garantia de Projetos \(Jira\).*\.xls",
-                "Filtro Incidentes (Jira).xlsx",
-            ),
-            (r"Projetos \(Jira\).*\.xls", "Projetos (Jira).xlsx"),
-            (r"Defeitos SKY AD \(Jira\).*\.xls", "Defeitos SKY AD (Jira).xlsx"),
-        ]
+        if EXECUCAO_POR_ESTAGIOS and gerar_por_estagios(data, converter):
+            log("[RELATÓRIO] Relatório salvo com sucesso.")
+            return
 
-        with log_tempo("[ARQUIVOS] Conversão e tratamento dos .xls"):
-            processar_arquivos_xls(data, mapeamento, True)
+        if converter:
+            with log_tempo("[ARQUIVOS] Conversão e tratamento dos .xls"):
+                processar_arquivos_xls(data, ARQUIVOS_XLS, True)
 
-        with log_tempo("[RELATÓRIO] ~ Relatório de Garantias"):
-            # Abrir planilhas
-            (
-                wb_origem_filtros,
-                ws_origem_filtros,
-                wb_destino_relatorio,
-                ws_destino_relatorio,
-                ws_destino_ri,
-                wb_origem_projetos,
-                ws_origem_projetos,
-                ws_destino_projetos,
-            ) = abrir_planilhas()
-
-            with log_tempo("[RELATÓRIO] Copia de projetos"):
-                # [Projetos]
-                processar_projetos(ws_origem_projetos, ws_destino_projetos)
-
-            with log_tempo("[RELATÓRIO] Copia para  - RI"):
-                # [RI - Chamados Abertos]
-                processar_ri(ws_origem_filtros, ws_destino_ri)
-
-            with log_tempo("[RELATÓRIO] Copia para  - RF"):
-                # [Resolvidos e Fechados]
-                processar_rf(ws_origem_filtros, ws_destino_relatorio)
-
-        # Salvar planilha
-        wb_destino_relatorio.save(data / NOME_RELATORIO)
+        if not (RENDERIZACAO_PARALELA and gerar_em_paralelo(data)):
+            gerar_em_serie(data)
         log("[RELATÓRIO] Relatório salvo com sucesso.")
 
-        # Fechar os workbooks
-        wb_origem_filtros.close()
-        wb_destino_relatorio.close()
-        wb_origem_projetos.close()
-
 
 if __name__ == "__main__":
     main()
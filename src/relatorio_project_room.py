@@ -1,251 +1,207 @@
-from pathlib import Path
-from openpyxl import load_workbook
-
+from cache_tabelas import ler_tabela
+from gravador_xlsx import abrir_relatorio, salvar_relatorio
 from processar_xls import processar_arquivos_xls
-from config import MAPEAMENTO_COLUNAS, COLUNAS_RELATORIO
+from config import (
+    ATUALIZACAO_INCREMENTAL,
+    COLUNAS_RELATORIO,
+    LEITURA_STREAMING,
+    MAPEAMENTO_COLUNAS,
+)
+from tabela import Tabela
 from utils import (
     log,
     log_tempo,
-    copiar_linha_com_formula,
-    filtrar_linhas,
-    obter_ultima_linha_com_dados,
+    colunas_usadas,
+    gravar_aba,
+    particionar_incidentes,
+    preparar_mapeamento,
     preparar_pasta,
-    preparar_destino,
 )
 
+# Abas de destino alimentadas pela extração de incidentes e seus filtros por
+# "Situação". Uma nova aba entra aqui, sem nova leitura da origem.
+DESTINOS_INCIDENTES = {
+    "Relatório de Incidentes": {"excluir": ["Resolvido", "Finalizado", "Cancelado"]},
+    "Resolvidos-Fechados": {"incluir": ["Resolvido", "Finalizado"]},
+}
+
+# Exportações do Jira (.xls) usadas pelo relatório e o nome do .xlsx gerado
+ARQUIVOS_XLS = [
+    (r"Project Room \(Jira\).*\.xls", "Project Room (Jira).xlsx"),
+]
+
 # Nome do relatorio
 NOME_RELATORIO = "Relatorio de Incidentes_Project Room_v1.xlsx"
 
+# Extração (em uploads) lida pelo relatório
+ORIGEM_FILTROS = "Project Room (Jira).xlsx"
+
+# Extrações de que o relatório depende (ver vigia.py)
+ORIGENS = (ORIGEM_FILTROS,)
+
 
-def abrir_planilhas():
-    """Abre planilha de origem e destino, retornando workbooks e worksheets."""
+def abrir_planilhas(somente_leitura: bool = LEITURA_STREAMING):
+    """
+    Lê a planilha de origem (como Tabela, ver cache_tabelas.ler_tabela, só
+    com as colunas usadas pelas abas de DESTINOS_INCIDENTES, ver
+    utils.colunas_usadas) e abre a de destino, retornando a
+    tabela, o workbook e as worksheets.
+
+    Com somente_leitura, as origens do Jira são abertas em modo read_only:
+    as linhas são lidas sob demanda, uma única vez, e a memória não cresce
+    com o tamanho da exportação.
+    """
 
     # Diretório onde os arquivos estao
-    dir_base = Path(__file__).resolve().parent / "data"
+    dir_base = preparar_pasta()
 
     # Onde vamos filtrar os dados, para copiar na planilha de destino
     # Filtros
     # - (Resolvidos e Fechados) vão para abra - [Resolvidos-Fechados]
     # - Diferentes de (Resolvidos e Fechados) vão para [Relatório de Incidentes]
-    wb_origem_filtros = load_workbook(dir_base / "uploads" / "Project Room (Jira).xlsx")
-    ws_origem_filtros = wb_origem_filtros.active
+    origem_filtros = ler_tabela(
+        dir_base / "uploads" / ORIGEM_FILTROS,
+        somente_leitura,
+        colunas=colunas_usadas(
+            dir_base / "uploads" / ORIGEM_FILTROS,
+            dir_base / NOME_RELATORIO,
+            dict.fromkeys(DESTINOS_INCIDENTES, MAPEAMENTO_COLUNAS),
+        ),
+    )
 
     # Planilha de destino - [Relatório]
-    wb_destino_relatorio = load_workbook(dir_base / NOME_RELATORIO)
+    wb_destino_relatorio = abrir_relatorio(dir_base / NOME_RELATORIO)
     ws_destino_rf = wb_destino_relatorio["Resolvidos-Fechados"]
     ws_destino_ri = wb_destino_relatorio["Relatório de Incidentes"]
 
     return (
-        wb_origem_filtros,
-        ws_origem_filtros,
+        origem_filtros,
         wb_destino_relatorio,
         ws_destino_rf,
         ws_destino_ri,
     )
 
 
-def preparar_mapeamento(ws_origem, ws_destino, mapa_colunas):
-    """
-    Prepara índices e colunas para cópia entre origem e destino.
-    Exige que seja passado um mapeamento customizado de colunas.
-    """
-    cabecalhos_origem = [cell.value for cell in ws_origem[1]]
-    cabecalhos_destino = [cell.value for cell in ws_destino[1]]
-
-    indices_origem = {name: idx + 1 for idx, name in enumerate(cabecalhos_origem)}
-    indices_destino = {name: idx + 1 for idx, name in enumerate(cabecalhos_destino)}
-
-    # Não precisa mais de fallback; mapa_colunas é obrigatório
-    colunas_para_copiar = [
-        indices_destino[dest]
-        for dest in mapa_colunas.values()
-        if dest in indices_destino
-    ]
-
-    return mapa_colunas, indices_origem, indices_destino, colunas_para_copiar
-
-
-def copiar_para_aba(
-    ws_destino,
-    linha_modelo,
-    linhas_origem,
-    linha_destino,
+def processar_rf(
     ws_origem,
-    mapa_colunas,
-    indice_origem,
-    indice_destino,
-    colunas_para_copiar,
-    ajustar_formulas: bool = True,
-    colunas_extras: list[str] = None,
+    ws_destino,
+    linhas: Tabela = None,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
 ):
-    """Copia linhas da origem para a aba de destino mantendo formatação e fórmulas."""
-    for linha_origem in linhas_origem:
-        copiar_linha_com_formula(
-            ws_destino,
-            linha_origem=linha_modelo,
-            linha_destino=linha_destino,
-            colunas=colunas_para_copiar,
-            colunas_extras=colunas_extras if colunas_extras else [],
-            ajustar_formulas=ajustar_formulas,
-        )
-
-        for coluna_destino, coluna_origem in mapa_colunas.items():
-            idx_dest = indice_destino.get(coluna_destino)
-            idx_origem = indice_origem.get(coluna_origem)
-            if idx_dest is None or idx_origem is None:
-                continue
-
-            valor_origem = ws_origem.cell(row=linha_origem, column=idx_origem).value
-            ws_destino.cell(row=linha_destino, column=idx_dest).value = valor_origem
-
-        linha_destino += 1
-
-    return linha_destino - 2
-
-
-def obter_ultima_linha(ws, coluna_chave):
-    """
-    Retorna o índice da última linha com dados em uma coluna chave.
-    Args: ws: Worksheet (aba do Excel) coluna_chave (str): Nome do cabeçalho da coluna usada como referência.
-    Returns: int: Número da última linha com dados.
-    """
-
-    cabecalho = [cell.value for cell in ws[1]]
-    if coluna_chave not in cabecalho:
-        raise ValueError(
-            f"Coluna '{coluna_chave}' não encontrada no cabeçalho da aba {ws.title}"
-        )
-
-    idx_col = cabecalho.index(coluna_chave) + 1
-    return obter_ultima_linha_com_dados(ws, idx_col)
-
-
-def processar_rf(ws_origem, ws_destino):
     """
     Processa a aba de Incidentes (ws_origem) e copia as linhas com status
     'Resolvido' e 'Finalizado' para a aba de Relatório de Finalizados (ws_destino).
 
     Args:
-        ws_origem (Worksheet): Aba de Incidentes.
+        ws_origem (Worksheet | Tabela): Aba de Incidentes (ou a Tabela já lida).
         ws_destino (Worksheet): Aba de Relatório de Finalizados.
+        linhas (Tabela): Lote já particionado (ver particionar_incidentes). Se
+            None, a origem é lida e filtrada só para esta aba.
+        incremental (bool): Atualiza só as linhas que mudaram (ver gravar_aba).
     """
 
     # Número da Linha Modelo.
     nun_linha = 347
 
-    # Limpar aba de destino
-    preparar_destino(ws_destino, linha_modelo=nun_linha)
+    # Sem lote pronto, filtra a origem só para esta aba
+    if linhas is None:
+        linhas = particionar_incidentes(
+            ws_origem,
+            {"Resolvidos-Fechados": DESTINOS_INCIDENTES["Resolvidos-Fechados"]},
+        )["Resolvidos-Fechados"]
 
-    # Obter a última linha
-    ultima_linha = obter_ultima_linha(ws_origem, "Chave")
+    # Só as colunas de origem usadas no mapeamento seguem para a cópia
+    lote = linhas.projetar(MAPEAMENTO_COLUNAS.values())
+    plano = preparar_mapeamento(lote, ws_destino, MAPEAMENTO_COLUNAS, COLUNAS_RELATORIO)
 
-    mapa_colunas, indice_origem, indice_destino, colunas_para_copiar = (
-        preparar_mapeamento(ws_origem, ws_destino, MAPEAMENTO_COLUNAS)
-    )
-
-    # Copiar para RF (filtrando status = 'Resolvido' e 'Finalizado')
-    linhas_para_RF = filtrar_linhas(
-        ws_origem,
-        indice_origem["Situação"],
-        incluir=["Resolvido", "Finalizado"],
-        linha_inicial=2,
-        linha_final=ultima_linha,
-    )
-    copiar_para_aba(
-        ws_destino,
-        linha_modelo=nun_linha,
-        linhas_origem=linhas_para_RF,
-        linha_destino=nun_linha,
-        ws_origem=ws_origem,
-        mapa_colunas=mapa_colunas,
-        indice_origem=indice_origem,
-        indice_destino=indice_destino,
-        colunas_para_copiar=colunas_para_copiar,
-        colunas_extras=COLUNAS_RELATORIO,
-    )
+    gravar_aba(ws_destino, nun_linha, lote, plano, incremental)
 
 
-def processar_ri(ws_origem, ws_destino):
+def processar_ri(
+    ws_origem,
+    ws_destino,
+    linhas: Tabela = None,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
+):
     """
     Processa a aba de Incidentes (ws_origem) e copia as linhas com status
     diferente de 'Resolvido', 'Finalizado' e 'Cancelado' para a aba de Relatório de Incidentes (ws_destino).
 
     Args:
-        ws_origem (Worksheet): Aba de Incidentes.
+        ws_origem (Worksheet | Tabela): Aba de Incidentes (ou a Tabela já lida).
         ws_destino (Worksheet): Aba de Relatório de Incidentes.
+        linhas (Tabela): Lote já particionado (ver particionar_incidentes). Se
+            None, a origem é lida e filtrada só para esta aba.
+        incremental (bool): Atualiza só as linhas que mudaram (ver gravar_aba).
     """
 
     # Número da Linha Modelo.
     nun_linha = 2
 
-    # Limpar aba de destino
-    preparar_destino(ws_destino)
-
-    # Obter a última linha
-    ultima_linha = obter_ultima_linha(ws_origem, "Chave")
+    # Sem lote pronto, filtra a origem só para esta aba
+    if linhas is None:
+        linhas = particionar_incidentes(
+            ws_origem,
+            {"Relatório de Incidentes": DESTINOS_INCIDENTES["Relatório de Incidentes"]},
+        )["Relatório de Incidentes"]
 
-    # Preparar mapeamento entre origem e destino
-    mapa_colunas, indice_origem, indice_destino, colunas_para_copiar = (
-        preparar_mapeamento(ws_origem, ws_destino, MAPEAMENTO_COLUNAS)
-    )
+    # Só as colunas de origem usadas no mapeamento seguem para a cópia
+    lote = linhas.projetar(MAPEAMENTO_COLUNAS.values())
+    plano = preparar_mapeamento(lote, ws_destino, MAPEAMENTO_COLUNAS, COLUNAS_RELATORIO)
 
-    linhas_para_RI = filtrar_linhas(
-        ws_origem,
-        indice_origem["Situação"],
-        excluir=["Resolvido", "Finalizado", "Cancelado"],
-        linha_inicial=2,
-        linha_final=ultima_linha,
-    )
-    copiar_para_aba(
-        ws_destino,
-        linha_modelo=nun_linha,
-        linhas_origem=linhas_para_RI,
-        linha_destino=nun_linha,
-        ws_origem=ws_origem,
-        mapa_colunas=mapa_colunas,
-        indice_origem=indice_origem,
-        indice_destino=indice_destino,
-        colunas_para_copiar=colunas_para_copiar,
-        colunas_extras=COLUNAS_RELATORIO,
-    )
+    gravar_aba(ws_destino, nun_linha, lote, plano, incremental)
 
 
-def main():
+def main(converter: bool = True):
+    """
+    Gera o relatório de Project Room. Com converter=False, usa os .xlsx já
+    convertidos em uploads (ver main.py).
+    """
     with log_tempo("[PROCESSAMENTO] Project Room"):
         # Diretório onde os arquivos estao
         data = preparar_pasta()
 
-        mapeamento = [
-            (r"Project Room \(Jira\).*\.xls", "Project Room (Jira).xlsx"),
-        ]
-
-        with log_tempo("[ARQUIVOS] Conversão e tratamento dos .xls"):
-            processar_arquivos_xls(data, mapeamento, True)
+        if converter:
+            with log_tempo("[ARQUIVOS] Conversão e tratamento dos .xls"):
+                processar_arquivos_xls(data, ARQUIVOS_XLS, True)
 
         with log_tempo("[RELATÓRIO] ~ Relatório de Project Room"):
             # Abrir planilhas
             (
-                wb_origem_filtros,
-                ws_origem_filtros,
+                origem_filtros,
                 wb_destino_relatorio,
                 ws_destino_relatorio,
                 ws_destino_ri,
             ) = abrir_planilhas()
 
+            with log_tempo("[RELATÓRIO] Particionar incidentes"):
+                # Uma única leitura da origem para todas as abas de incidentes
+                lotes = particionar_incidentes(origem_filtros, DESTINOS_INCIDENTES)
+
             with log_tempo("[RELATÓRIO] Copia para - RI"):
                 # [RI - Chamados Abertos]
-                processar_ri(ws_origem_filtros, ws_destino_ri)
+                processar_ri(
+                    origem_filtros, ws_destino_ri, lotes["Relatório de Incidentes"]
+                )
 
             with log_tempo("[RELATÓRIO] Copia para - RF"):
                 # [Resolvidos e Fechados]
-                processar_rf(ws_origem_filtros, ws_destino_relatorio)
-
-        # Salvar planilha
-        wb_destino_relatorio.save(data / NOME_RELATORIO)
+                processar_rf(
+                    origem_filtros,
+                    ws_destino_relatorio,
+                    lotes["Resolvidos-Fechados"],
+                )
+
+        # Salvar planilha (só as abas alteradas)
+        with log_tempo("[RELATÓRIO] Gravação do relatório"):
+            salvar_relatorio(
+                wb_destino_relatorio,
+                data / NOME_RELATORIO,
+                [ws_destino_relatorio, ws_destino_ri],
+            )
         log("[RELATÓRIO] Relatório salvo com sucesso.")
 
-        # Fechar os workbooks
-        wb_origem_filtros.close()
+        # Fechar o workbook
         wb_destino_relatorio.close()
 
 
@@ -0,0 +1,195 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+import relatorio_garantias
+import relatorio_project_room
+from gravador_xlsx import carregar_residente, manter_residentes, relatorios_residentes
+from utils import log, preparar_pasta
+
+# Endereço do serviço: só localhost
+HOST = "127.0.0.1"
+PORTA = 8765
+
+# Relatórios que o serviço sabe gerar (nome na URL -> módulo)
+RELATORIOS = {
+    "garantias": relatorio_garantias,
+    "project_room": relatorio_project_room,
+}
+
+
+class Servico:
+    """
+    Estado do processo residente: os relatórios rodam um por vez (gravam os
+    mesmos arquivos) e os modelos ficam em memória entre as execuções (ver
+    gravador_xlsx.manter_residentes).
+    """
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.inicio = time.time()
+        self.execucoes = []
+
+    def aquecer(self):
+        """Carrega os modelos dos relatórios antes do primeiro pedido."""
+        manter_residentes(True)
+        data = preparar_pasta()
+        for modulo in RELATORIOS.values():
+            caminho = data / modulo.NOME_RELATORIO
+            if caminho.exists():
+                carregar_residente(caminho)
+                log(f"[SERVIÇO] Modelo carregado: {caminho.name}")
+
+    def gerar(self, nome: str, converter: bool = False) -> dict:
+        """Gera o relatório nome; devolve o resumo da execução."""
+        modulo = RELATORIOS[nome]
+        with self.trava:
+            inicio = time.perf_counter()
+            resultado = {"relatorio": nome, "ok": True}
+            try:
+                modulo.main(converter=converter)
+            except Exception as e:
+                log(f"[SERVIÇO] Falha ao gerar {nome}: {e}")
+                traceback.print_exc()
+                resultado.update(ok=False, erro=f"{type(e).__name__}: {e}")
+            resultado["duracao"] = round(time.perf_counter() - inicio, 3)
+            self.execucoes.append(dict(resultado, em=time.strftime("%H:%M:%S")))
+            return resultado
+
+    def estado(self) -> dict:
+        return {
+            "relatorios": list(RELATORIOS),
+            "residentes": relatorios_residentes(),
+            "ocupado": self.trava.locked(),
+            "ativo_ha": round(time.time() - self.inicio),
+            "execucoes": self.execucoes[-20:],
+        }
+
+
+def criar_manipulador(servico: Servico):
+    class Manipulador(BaseHTTPRequestHandler):
+        """
+        GET  /estado                         -> estado do serviço
+        POST /relatorios/<nome>[?converter=1] -> gera o relatório
+        POST /encerrar                       -> encerra o serviço
+        """
+
+        def _responder(self, status: int, dados: dict):
+            corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            if urlparse(self.path).path.rstrip("/") in ("", "/estado"):
+                self._responder(200, servico.estado())
+            else:
+                self._responder(404, {"erro": "caminho desconhecido"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            partes = url.path.strip("/").split("/")
+            if partes == ["encerrar"]:
+                self._responder(200, {"encerrando": True})
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            if len(partes) != 2 or partes[0] != "relatorios":
+                self._responder(404, {"erro": "caminho desconhecido"})
+                return
+            if partes[1] not in RELATORIOS:
+                self._responder(
+                    404,
+                    {"erro": f"relatório desconhecido (use {', '.join(RELATORIOS)})"},
+                )
+                return
+
+            converter = parse_qs(url.query).get("converter", ["0"])[0] in ("1", "true")
+            resultado = servico.gerar(partes[1], converter)
+            self._responder(200 if resultado["ok"] else 500, resultado)
+
+        def log_message(self, formato, *args):
+            log(f"[SERVIÇO] {self.address_string()} {formato % args}")
+
+    return Manipulador
+
+
+def servir(host: str = HOST, porta: int = PORTA):
+    """Sobe o serviço e atende até POST /encerrar (ou Ctrl+C)."""
+    servico = Servico()
+    servico.aquecer()
+    servidor = ThreadingHTTPServer((host, porta), criar_manipulador(servico))
+    log(f"[SERVIÇO] Atendendo em http://{host}:{porta}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        manter_residentes(False)
+        log("[SERVIÇO] Encerrado.")
+
+
+def pedir(caminho: str, host: str = HOST, porta: int = PORTA, metodo: str = "POST"):
+    """Envia um pedido ao serviço em execução e devolve a resposta (dict)."""
+    pedido = Request(f"http://{host}:{porta}{caminho}", method=metodo)
+    try:
+        with urlopen(pedido) as resposta:
+            return json.load(resposta)
+    except HTTPError as e:
+        return json.load(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serviço local que mantém os modelos dos relatórios em memória."
+    )
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--porta", type=int, default=PORTA)
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument(
+        "--gerar",
+        choices=RELATORIOS,
+        help="pede ao serviço em execução que gere o relatório",
+    )
+    grupo.add_argument(
+        "--estado", action="store_true", help="mostra o estado do serviço"
+    )
+    grupo.add_argument("--encerrar", action="store_true", help="encerra o serviço")
+    parser.add_argument(
+        "--converter", action="store_true", help="com --gerar, converte os .xls antes"
+    )
+    args = parser.parse_args(argv)
+
+    if not (args.gerar or args.estado or args.encerrar):
+        servir(args.host, args.porta)
+        return 0
+
+    try:
+        if args.gerar:
+            caminho = f"/relatorios/{args.gerar}" + (
+                "?converter=1" if args.converter else ""
+            )
+            resposta = pedir(caminho, args.host, args.porta)
+        elif args.estado:
+            resposta = pedir("/estado", args.host, args.porta, "GET")
+        else:
+            resposta = pedir("/encerrar", args.host, args.porta)
+    except URLError as e:
+        print(f"Serviço indisponível em {args.host}:{args.porta} ({e.reason})")
+        return 2
+
+    print(json.dumps(resposta, ensure_ascii=False, indent=2))
+    return 0 if resposta.get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
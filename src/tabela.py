@@ -0,0 +1,239 @@
+import unicodedata
+from itertools import compress, islice
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele, as colunas são listas
+    np = None
+
+# Linhas transpostas por vez em Tabela.de_linhas: só um bloco existe em
+# linhas ao mesmo tempo, e não a extração inteira
+LINHAS_POR_BLOCO = 1024
+
+
+def normalizar_cabecalho(nome) -> str:
+    """
+    Normaliza um cabeçalho para comparação: sem acentos, minúsculo e com
+    espaços colapsados ("SUMÁRIO" e "Sumario" ficam iguais).
+    """
+    if nome is None:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(nome))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split()).casefold()
+
+
+def normalizar_status(valores: list[str] | None) -> set[str] | None:
+    """Normaliza uma lista de status para comparação (sem espaços e minúsculo)."""
+    return {s.strip().lower() for s in valores} if valores else None
+
+
+def ultima_preenchida(valores) -> int:
+    """
+    Quantidade de valores até o último preenchido (0 se todos são None),
+    procurando de trás para frente: o custo é o das linhas vazias no fim
+    (ex.: linhas só formatadas no fim da extração), e não o da coluna toda.
+    """
+    for idx in range(len(valores) - 1, -1, -1):
+        if valores[idx] is not None:
+            return idx + 1
+    return 0
+
+
+def _como_coluna(valores):
+    """Converte uma sequência de valores no tipo de coluna da tabela."""
+    if np is None:
+        return valores if isinstance(valores, list) else list(valores)
+    if isinstance(valores, np.ndarray) and valores.dtype == object:
+        return valores
+    if not isinstance(valores, list):
+        valores = list(valores)
+    coluna = np.empty(len(valores), dtype=object)
+    coluna[:] = valores
+    return coluna
+
+
+class Tabela:
+    """
+    Tabela em colunas: uma sequência de valores por coluna da origem (array
+    NumPy de objetos, ou lista sem NumPy), na ordem do cabeçalho. As colunas
+    são localizadas pelo cabeçalho normalizado (ver normalizar_cabecalho).
+
+    Filtros viram máscaras booleanas aplicadas a todas as colunas de uma vez,
+    e as linhas só voltam a ser tuplas na hora de gravar (ver linhas()).
+    """
+
+    def __init__(self, cabecalho, colunas, titulo: str = ""):
+        self.cabecalho = tuple(cabecalho)
+        self.colunas = [_como_coluna(coluna) for coluna in colunas]
+        self.titulo = titulo
+        self._indices = {
+            normalizar_cabecalho(nome): idx
+            for idx, nome in enumerate(self.cabecalho)
+            if nome is not None
+        }
+        self._status = {}
+
+    @classmethod
+    def de_linhas(cls, cabecalho, linhas, titulo: str = ""):
+        """
+        Monta a tabela a partir de tuplas de valores, em uma única passada.
+        Linhas curtas são completadas com None; valores além do cabeçalho
+        são descartados.
+
+        As linhas são transpostas em blocos de LINHAS_POR_BLOCO e os valores
+        vão direto para as colunas: a cópia da extração em linhas nunca
+        existe inteira, e cada coluna é convertida (ver _como_coluna) e
+        liberada antes da próxima.
+        """
+        largura = len(cabecalho)
+        colunas = [[] for _ in range(largura)]
+        linhas = iter(linhas)
+        while bloco := [
+            (
+                linha[:largura]
+                if len(linha) >= largura
+                else linha + (None,) * (largura - len(linha))
+            )
+            for linha in map(tuple, islice(linhas, LINHAS_POR_BLOCO))
+        ]:
+            for coluna, valores in zip(colunas, zip(*bloco)):
+                coluna.extend(valores)
+        for idx, coluna in enumerate(colunas):
+            colunas[idx] = _como_coluna(coluna)
+        return cls(cabecalho, colunas, titulo)
+
+    @classmethod
+    def de_aba(cls, ws, coluna_chave: str = "Chave"):
+        """
+        Lê uma aba (completa ou read_only) uma única vez: cabeçalho na linha 1
+        e dados da linha 2 até a última com coluna_chave preenchida.
+        """
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(linhas, ())
+        tabela = cls.de_linhas(cabecalho, linhas, ws.title)
+        if coluna_chave is not None:
+            tabela = tabela.fatiar(tabela.ultima_com_dados(coluna_chave))
+        return tabela
+
+    def __len__(self):
+        return len(self.colunas[0]) if self.colunas else 0
+
+    def __iter__(self):
+        return self.linhas()
+
+    def indice(self, nome: str) -> int:
+        """Retorna o índice (começando em 0) de uma coluna pelo cabeçalho."""
+        idx = self._indices.get(normalizar_cabecalho(nome))
+        if idx is None:
+            raise ValueError(
+                f"Coluna '{nome}' não encontrada no cabeçalho da aba {self.titulo}"
+            )
+        return idx
+
+    def coluna(self, nome: str):
+        """Retorna os valores de uma coluna pelo cabeçalho."""
+        return self.colunas[self.indice(nome)]
+
+    def linhas(self):
+        """Devolve as linhas como tuplas de valores, na ordem do cabeçalho."""
+        return zip(*self.colunas)
+
+    def status(self, nome: str):
+        """
+        Valores da coluna normalizados para comparação de status (texto sem
+        espaços nas pontas e minúsculo; vazios viram ""). Calculado uma vez
+        por coluna.
+        """
+        idx = self.indice(nome)
+        if idx not in self._status:
+            coluna = self.colunas[idx]
+            if np is None:
+                self._status[idx] = [
+                    str(valor).strip().lower() if valor else "" for valor in coluna
+                ]
+            else:
+                texto = np.char.lower(np.char.strip(coluna.astype(str)))
+                self._status[idx] = np.where(coluna.astype(bool), texto, "")
+        return self._status[idx]
+
+    def mascara(self, nome: str, incluir: list[str] = None, excluir: list[str] = None):
+        """
+        Máscara booleana das linhas cujo status (coluna nome) passa pelo
+        filtro: está em incluir (se informado) e não está em excluir.
+        """
+        status = self.status(nome)
+        incluir_norm = normalizar_status(incluir)
+        excluir_norm = normalizar_status(excluir)
+
+        if np is None:
+            return [
+                (not incluir_norm or valor in incluir_norm)
+                and not (excluir_norm and valor in excluir_norm)
+                for valor in status
+            ]
+
+        mascara = np.ones(len(status), dtype=bool)
+        if incluir_norm:
+            mascara &= np.isin(status, list(incluir_norm))
+        if excluir_norm:
+            mascara &= ~np.isin(status, list(excluir_norm))
+        return mascara
+
+    def filtrar(self, mascara):
+        """Nova tabela só com as linhas selecionadas pela máscara."""
+        if np is None:
+            colunas = [compress(coluna, mascara) for coluna in self.colunas]
+        else:
+            colunas = [coluna[mascara] for coluna in self.colunas]
+        return Tabela(self.cabecalho, colunas, self.titulo)
+
+    def fatiar(self, fim: int):
+        """Nova tabela com as primeiras fim linhas."""
+        return Tabela(self.cabecalho, [c[:fim] for c in self.colunas], self.titulo)
+
+    def projetar(self, nomes):
+        """
+        Nova tabela só com as colunas informadas (pelo cabeçalho), na ordem
+        da origem. Nomes ausentes ou repetidos são ignorados.
+        """
+        indices = sorted(
+            {
+                self._indices[chave]
+                for chave in map(normalizar_cabecalho, nomes)
+                if chave in self._indices
+            }
+        )
+        return Tabela(
+            [self.cabecalho[idx] for idx in indices],
+            [self.colunas[idx] for idx in indices],
+            self.titulo,
+        )
+
+    def ultima_com_dados(self, nome: str) -> int:
+        """
+        Quantidade de linhas até a última com a coluna preenchida (0 se a
+        coluna estiver vazia).
+        """
+        return ultima_preenchida(self.coluna(nome))
+
+    def particionar(self, nome: str, destinos: dict) -> dict:
+        """
+        Separa as linhas em uma tabela por destino, conforme o filtro de
+        status (coluna nome) de cada um. Uma linha pode ir para mais de um
+        destino.
+
+        destinos: {destino: {"incluir": [...], "excluir": [...]}}.
+        Returns: dict: {destino: Tabela}.
+        """
+        return {
+            destino: self.filtrar(
+                self.mascara(nome, filtro.get("incluir"), filtro.get("excluir"))
+            )
+            for destino, filtro in destinos.items()
+        }
+
+
+def como_tabela(origem) -> Tabela:
+    """A origem como Tabela: ela mesma, se já lida, ou a aba lida (Tabela.de_aba)."""
+    return origem if isinstance(origem, Tabela) else Tabela.de_aba(origem)
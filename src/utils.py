@@ -1,11 +1,36 @@
 import re
-import time
 from pathlib import Path
-from copy import copy
 from contextlib import contextmanager
+from functools import lru_cache
+from openpyxl.cell.cell import TIME_FORMATS, Cell
+from openpyxl.formula.tokenizer import Token, Tokenizer, TokenizerError
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import is_date_format
 from openpyxl.utils import column_index_from_string
+from openpyxl.worksheet.cell_range import MultiCellRange
 from openpyxl.worksheet.worksheet import Worksheet
 
+from config import (
+    ATUALIZACAO_INCREMENTAL,
+    ESCRITA_STREAMING,
+    LEITURA_PROJETADA,
+    PASTA_DADOS,
+    RASTREIO,
+    RASTREIO_MEMORIA,
+    RASTREIOS_MANTIDOS,
+)
+from leitor_xlsx import ler_cabecalho
+from perfilador import PASTA_PERFIS, iniciar_perfil
+from rastreio import (
+    PASTA_RASTREIOS,
+    encerrar_etapa,
+    gravar_rastreio,
+    iniciar_etapa,
+    limpar_rastreios,
+    registrar_linhas,
+)
+from tabela import Tabela, como_tabela, normalizar_cabecalho
+
 
 def log(message):
     """Função para registrar mensagens de log."""
@@ -18,25 +43,99 @@ def log_tempo(mensagem="Processo finalizado"):
     código. Registra a mensagem de início e fim do bloco com o tempo de
     execução em minutos e segundos.
 
+    Cada bloco é uma etapa do rastreio da execução (ver rastreio.py): blocos
+    aninhados viram etapas filhas, com tempo de relógio e de CPU, linhas
+    (registrar_linhas) e pico de memória (RASTREIO_MEMORIA). Ao fim do bloco
+    mais externo, o rastreio é gravado em data/rastreios (só os
+    RASTREIOS_MANTIDOS mais recentes são mantidos).
+
+    Blocos cujo nome casa com o padrão de perfil (PERFIL_ETAPAS ou
+    main.py --perfil) são perfilados (ver perfilador.py), gravando .pstats e
+    pilhas colapsadas em data/profiles.
+
     Args:
         mensagem (str): Mensagem para identificar o bloco de código.
+
+    Yields:
+        Etapa: a etapa do bloco.
     """
-    inicio = time.time()
+    etapa = iniciar_etapa(mensagem, memoria=RASTREIO_MEMORIA)
     log(f"{mensagem} iniciado...")
+    perfil = iniciar_perfil(mensagem)
+    erro = None
     try:
-        yield
+        yield etapa
+    except BaseException as e:
+        erro = e
+        raise
     finally:
-        fim = time.time()
-        total = fim - inicio
-        minutos, segundos = divmod(total, 60)
+        if perfil is not None:
+            try:
+                arquivos = perfil.encerrar(preparar_pasta(PASTA_PERFIS))
+                log(f"[PERFIL] {mensagem}: {', '.join(a.name for a in arquivos)}")
+            except OSError as e:
+                log(f"[PERFIL] Não foi possível gravar o perfil: {e}")
+        encerrar_etapa(etapa, erro)
+        minutos, segundos = divmod(etapa.duracao, 60)
         log(f"{mensagem} em {int(minutos)} minutos e {segundos:.2f} segundos.")
 
+        if etapa.pai is None and RASTREIO:
+            try:
+                pasta = preparar_pasta(PASTA_RASTREIOS)
+                caminho = gravar_rastreio(etapa, pasta)
+                log(f"[RASTREIO] Etapas gravadas em {caminho.name}")
+                if RASTREIOS_MANTIDOS is not None:
+                    limpar_rastreios(pasta, RASTREIOS_MANTIDOS)
+            except OSError as e:
+                log(f"[RASTREIO] Não foi possível gravar o rastreio: {e}")
+
+
+def _intervalos_ate(sqref, ultima_linha: int) -> MultiCellRange:
+    """Mantém em sqref só os intervalos que começam até ultima_linha."""
+    return MultiCellRange([rng for rng in sqref.ranges if rng.min_row <= ultima_linha])
+
+
+def truncar_aba(ws: Worksheet, ultima_linha: int) -> int:
+    """
+    Remove tudo o que está abaixo de ultima_linha sem deslocar células:
+    apaga as entradas de células direto em ws._cells e descarta mesclagens,
+    formatações condicionais e validações de dados que ficam inteiramente
+    após o corte. Intervalos que cruzam o corte são mantidos.
+
+    Diferente de ws.delete_rows, o custo é proporcional às células
+    removidas, e não a linhas x colunas deslocadas.
+
+    Returns: int: quantidade de células removidas.
+    """
+    cells = ws._cells
+    removidas = [chave for chave in cells if chave[0] > ultima_linha]
+    for chave in removidas:
+        del cells[chave]
+
+    for rng in [r for r in ws.merged_cells.ranges if r.min_row > ultima_linha]:
+        ws.merged_cells.remove(rng)
+
+    formatacoes = ws.conditional_formatting._cf_rules
+    for cf in list(formatacoes):
+        regras = formatacoes.pop(cf)
+        cf.sqref = _intervalos_ate(cf.sqref, ultima_linha)
+        if cf.sqref.ranges:
+            formatacoes.setdefault(cf, []).extend(regras)
+
+    validacoes = ws.data_validations.dataValidation
+    for dv in validacoes:
+        dv.sqref = _intervalos_ate(dv.sqref, ultima_linha)
+    validacoes[:] = [dv for dv in validacoes if dv.sqref.ranges]
+
+    ws._current_row = ws.max_row if cells else 0
+    return len(removidas)
+
 
 def preparar_destino(ws_destino, linha_modelo: int = 2):
     """Limpa a planilha de destino, mantendo a linha modelo."""
 
     if ws_destino.max_row > linha_modelo:
-        ws_destino.delete_rows(linha_modelo + 1, ws_destino.max_row - linha_modelo)
+        truncar_aba(ws_destino, linha_modelo)
     log(
         f"[RELATÓRIO] Após limpeza, '{ws_destino.title}' tem {ws_destino.max_row} linhas"
     )
@@ -45,12 +144,16 @@ def preparar_destino(ws_destino, linha_modelo: int = 2):
 def preparar_pasta(subpasta: str | None = None) -> Path:
     """
     Garante que a estrutura de pastas de extração exista:
-    - Sempre cria a pasta base 'data' no diretório do script.
+    - Sempre cria a pasta base 'data' no diretório do script (ou a pasta
+      PASTA_DADOS, se configurada).
     - Se 'subpasta' for informado, cria dentro de 'data'.
 
     Retorna o Path absoluto da pasta resultante.
     """
-    base = Path(__file__).resolve().parent / "data"
+    if PASTA_DADOS:
+        base = Path(PASTA_DADOS).resolve()
+    else:
+        base = Path(__file__).resolve().parent / "data"
     base.mkdir(parents=True, exist_ok=True)
 
     if subpasta:
@@ -74,118 +177,515 @@ def localizar_arquivo(pasta: Path, nome_arquivo: str) -> Path | None:
     return None
 
 
-def ajustar_formula_linha(formula: str, linha_origem: int, linha_destino: int) -> str:
+# Partes de uma referência: célula (A1, $A$1), coluna (A, $A) ou linha (1, $1)
+REGEX_REF_CELULA = re.compile(r"(\$?)([A-Za-z]{1,3})(\$?)(\d+)")
+REGEX_REF_LINHA = re.compile(r"(\$?)(\d+)")
+REGEX_REF_COLUNA = re.compile(r"\$?[A-Za-z]{1,3}")
+
+
+class FormulaModelo:
     """
-    Ajusta referências de linha relativas em uma fórmula ao copiar para outra linha.
-    Ex: '=A1+D1*C1' da linha 1 para 10 → '=A10+D10*C10'
+    Fórmula da linha modelo tokenizada uma única vez. As linhas relativas das
+    referências viram "slots" com o deslocamento em relação à linha modelo;
+    levar a fórmula para a linha N é só juntar as partes.
+
+    Referências absolutas ($A$1, A$1), textos entre aspas e colunas inteiras
+    não são alteradas. Referências a outras abas (Aba!A1) seguem a mesma regra
+    das referências locais, como no Excel.
     """
 
-    def repl(match):
-        col, row = match.groups()
-        row = int(row)
-        nova_linha = row - linha_origem + linha_destino
-        return f"{col}{nova_linha}"
+    def __init__(self, formula: str, linha_origem: int):
+        self.formula = formula
+        self.linha_origem = linha_origem
 
-    pattern = re.compile(r"([A-Z]+)(\d+)")
-    return pattern.sub(repl, formula)
+        partes = []
+        try:
+            tokens = Tokenizer(formula)
+            if tokens.render() != formula:
+                raise TokenizerError("Fórmula não reconstruída pelo tokenizador")
+            partes.append("=")
+            for token in tokens.items:
+                if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+                    partes.extend(self._partes_referencia(token.value))
+                else:
+                    partes.append(token.value)
+        except TokenizerError:
+            # Fórmula que o tokenizador não entende: ajuste de linha simples
+            partes = self._partes_regex(formula)
+
+        # Junta as partes fixas consecutivas
+        self.partes = []
+        for parte in partes:
+            if (
+                isinstance(parte, str)
+                and self.partes
+                and isinstance(self.partes[-1], str)
+            ):
+                self.partes[-1] += parte
+            else:
+                self.partes.append(parte)
+
+    def _partes_referencia(self, ref: str) -> list:
+        # Separa o nome da aba (Aba!A1 ou 'Minha aba'!A1)
+        prefixo = ""
+        pos = ref.rfind("!")
+        if pos >= 0:
+            prefixo, ref = ref[: pos + 1], ref[pos + 1 :]
+
+        partes = [prefixo]
+        for i, trecho in enumerate(ref.split(":")):
+            if i > 1:
+                return [prefixo + ref]
+            if i:
+                partes.append(":")
+
+            celula = REGEX_REF_CELULA.fullmatch(trecho)
+            linha = REGEX_REF_LINHA.fullmatch(trecho)
+            if celula:
+                dolar_col, col, dolar_lin, lin = celula.groups()
+                partes.append(f"{dolar_col}{col}{dolar_lin}")
+                partes.append(lin if dolar_lin else int(lin) - self.linha_origem)
+            elif linha:
+                dolar_lin, lin = linha.groups()
+                partes.append(dolar_lin)
+                partes.append(lin if dolar_lin else int(lin) - self.linha_origem)
+            elif REGEX_REF_COLUNA.fullmatch(trecho):
+                partes.append(trecho)
+            else:
+                # Nome definido, referência estruturada etc.
+                return [prefixo + ref]
+        return partes
+
+    def _partes_regex(self, formula: str) -> list:
+        partes = []
+        pos = 0
+        for match in re.finditer(r"([A-Z]+)(\d+)", formula):
+            partes.append(formula[pos : match.start()] + match.group(1))
+            partes.append(int(match.group(2)) - self.linha_origem)
+            pos = match.end()
+        partes.append(formula[pos:])
+        return partes
+
+    def para_linha(self, linha_destino: int) -> str:
+        """Retorna a fórmula com as referências relativas na linha de destino."""
+        return "".join(
+            parte if isinstance(parte, str) else str(parte + linha_destino)
+            for parte in self.partes
+        )
+
+
+@lru_cache(maxsize=1024)
+def compilar_formula(formula: str, linha_origem: int) -> FormulaModelo:
+    """Retorna o FormulaModelo da fórmula, reaproveitando os já compilados."""
+    return FormulaModelo(formula, linha_origem)
+
+
+class ModeloLinha:
+    """
+    Linha modelo capturada uma única vez: valor, fórmula e estilo de cada
+    coluna. A cada linha de destino, as células são criadas já apontando para o
+    StyleArray da célula modelo, sem copiar fontes, bordas ou preenchimentos.
 
+    O StyleArray é compartilhado entre todas as linhas geradas: alterar o
+    estilo de uma célula gerada (ex.: cell.font = ...) altera todas. Para isso,
+    atribua antes um novo StyleArray à célula. Os valores copiados da origem
+    devem ser passados em aplicar(), que já trata o formato de datas.
 
-def copiar_linha_com_formula(
-    ws: Worksheet,
-    linha_origem: int,
-    linha_destino: int,
-    colunas: list[int] = None,
+    pares: tuplas (índice na linha de origem, coluna de destino) de um
+    PlanoCopia; essas colunas recebem o valor da origem em aplicar().
+    """
+
+    def __init__(
+        self,
+        ws: Worksheet,
+        linha_modelo: int,
+        colunas,
+        ajustar_formulas: bool = True,
+        pares=(),
+    ):
+        self.ws = ws
+        self.linha_modelo = linha_modelo
+
+        # coluna -> (valor ou FormulaModelo, é fórmula, StyleArray ou None,
+        # formato é data)
+        self.celulas = {}
+        for col in sorted(set(colunas)):
+            cel = ws._cells.get((linha_modelo, col))
+            if cel is None or (cel.value is None and not cel.has_style):
+                continue
+
+            valor = cel.value
+            formula = ajustar_formulas and cel.data_type == "f"
+            if formula:
+                valor = compilar_formula(valor, linha_modelo)
+
+            estilo = cel._style if cel.has_style else None
+            self.celulas[col] = (
+                valor,
+                formula,
+                estilo,
+                is_date_format(cel.number_format),
+            )
+
+        # Estilos derivados para datas, um por (coluna, tipo de data)
+        self._estilos_data = {}
+
+        # Plano de carimbo, em ordem de coluna: (índice na tupla de origem ou
+        # None, coluna, valor do modelo, é fórmula, StyleArray, formato é data)
+        origem = {dst: src for src, dst in pares}
+        vazia = (None, False, None, False)
+        self._plano = tuple(
+            (origem.get(col), col, *self.celulas.get(col, vazia))
+            for col in sorted(self.celulas.keys() | origem.keys())
+        )
+
+    def _estilo_data(self, col: int, estilo, tipo):
+        """StyleArray da coluna com o formato de data que o openpyxl aplicaria."""
+        chave = (col, tipo)
+        if chave not in self._estilos_data:
+            temp = Cell(self.ws)
+            temp._style = StyleArray(estilo) if estilo is not None else StyleArray()
+            temp.number_format = TIME_FORMATS[tipo]
+            self._estilos_data[chave] = temp._style
+        return self._estilos_data[chave]
+
+    def aplicar(self, linha_destino: int, linha_origem: tuple = ()):
+        """
+        Carimba a linha modelo na linha de destino (valores, fórmulas e
+        estilos). As colunas dos pares recebem o valor de linha_origem; se a
+        tupla for mais curta, fica o valor do modelo.
+        """
+        ws = self.ws
+        cells = ws._cells
+        tamanho = len(linha_origem)
+
+        for src, col, valor, formula, estilo, eh_data in self._plano:
+            if src is not None and src < tamanho:
+                valor = linha_origem[src]
+            elif formula:
+                valor = valor.para_linha(linha_destino)
+
+            # Datas em colunas sem formato de data ganham um estilo próprio,
+            # sem alterar o StyleArray compartilhado
+            tipo = type(valor)
+            if tipo in TIME_FORMATS and not eh_data:
+                estilo = self._estilo_data(col, estilo, tipo)
+
+            cel = Cell(ws, row=linha_destino, column=col)
+            if estilo is not None:
+                cel._style = estilo
+            cel.value = valor
+            cells[(linha_destino, col)] = cel
+
+
+class PlanoCopia:
+    """
+    Plano de cópia entre duas abas, resolvido uma única vez pelos cabeçalhos.
+
+    pares: tupla de (índice na tupla de origem, começando em 0; coluna de
+    destino, começando em 1).
+    colunas: colunas de destino que recebem estilo/fórmula da linha modelo.
+    """
+
+    def __init__(self, pares, colunas):
+        self.pares = tuple(pares)
+        self.colunas = frozenset(colunas)
+
+    def __len__(self):
+        return len(self.pares)
+
+
+def compilar_plano_copia(
+    cabecalho_origem,
+    cabecalho_destino,
+    mapa_colunas: dict = None,
     colunas_extras: list[str] = None,
-    ajustar_formulas: bool = True,  # novo parâmetro
-):
+) -> PlanoCopia:
     """
-    Copia uma linha para outra linha dentro da mesma planilha,
-    mantendo formatação e, opcionalmente, ajustando fórmulas relativas.
+    Resolve os cabeçalhos de origem e destino em um PlanoCopia, comparando
+    os nomes com normalizar_cabecalho().
+
+    mapa_colunas: {cabeçalho de destino: cabeçalho de origem}. Se None, as
+    colunas com o mesmo nome nas duas abas são copiadas.
+    colunas_extras: letras de colunas de destino que também recebem o
+    estilo/fórmula da linha modelo.
 
-    colunas: lista de índices de colunas para copiar. Se None, copia todas.
-    colunas_extras: lista de letras de colunas adicionais a copiar.
-    ajustar_formulas: se False, copia valores de fórmulas como estão.
+    Os planos ficam em cache pelos cabeçalhos: no modo serviço, as
+    extrações seguintes com o mesmo layout reaproveitam o plano.
     """
-    if colunas is None:
-        colunas = list(range(1, ws.max_column + 1))
+    return _compilar_plano_copia(
+        tuple(cabecalho_origem),
+        tuple(cabecalho_destino),
+        tuple(mapa_colunas.items()) if mapa_colunas is not None else None,
+        tuple(colunas_extras or ()),
+    )
 
-    # Adiciona colunas extras, convertendo de letra para índice
-    if colunas_extras:
-        for letra in colunas_extras:
-            idx = column_index_from_string(letra)
-            if idx not in colunas:
-                colunas.append(idx)
-        colunas.sort()
 
-    for col in colunas:
-        cel_origem = ws.cell(row=linha_origem, column=col)
-        cel_dest = ws.cell(row=linha_destino, column=col)
+@lru_cache(maxsize=64)
+def _compilar_plano_copia(
+    cabecalho_origem: tuple,
+    cabecalho_destino: tuple,
+    mapa_colunas: tuple | None,
+    colunas_extras: tuple,
+) -> PlanoCopia:
+    indices_origem = {
+        normalizar_cabecalho(nome): idx
+        for idx, nome in enumerate(cabecalho_origem)
+        if nome is not None
+    }
+    indices_destino = {
+        normalizar_cabecalho(nome): idx + 1
+        for idx, nome in enumerate(cabecalho_destino)
+        if nome is not None
+    }
+
+    if mapa_colunas is None:
+        mapa_colunas = [(nome, nome) for nome in cabecalho_destino if nome is not None]
+
+    # Uma entrada por coluna de destino (a última do mapa prevalece)
+    destino_origem = {}
+    for nome_destino, nome_origem in mapa_colunas:
+        idx_dest = indices_destino.get(normalizar_cabecalho(nome_destino))
+        idx_origem = indices_origem.get(normalizar_cabecalho(nome_origem))
+        if idx_dest is not None and idx_origem is not None:
+            destino_origem[idx_dest] = idx_origem
+
+    pares = sorted((src, dst) for dst, src in destino_origem.items())
+    colunas = set(destino_origem)
+    colunas.update(column_index_from_string(letra) for letra in colunas_extras)
+
+    return PlanoCopia(pares, colunas)
+
+
+def colunas_do_plano(cabecalho_origem, *planos: PlanoCopia) -> set:
+    """Cabeçalhos das colunas de origem que os planos copiam."""
+    return {cabecalho_origem[src] for plano in planos for src, _ in plano.pares}
+
+
+def sincronizar_aba(
+    ws: Worksheet,
+    linha_modelo: int,
+    linhas_origem,
+    plano: PlanoCopia,
+    idx_chave: int,
+    ajustar_formulas: bool = True,
+) -> dict:
+    """
+    Atualiza a aba de destino em vez de recriá-la: as linhas a partir de
+    linha_modelo são indexadas pela chave e comparadas com a origem.
 
-        # Copiar valor ou ajustar fórmula
-        if ajustar_formulas and cel_origem.data_type == "f":
-            cel_dest.value = ajustar_formula_linha(
-                cel_origem.value, linha_origem, linha_destino
-            )
+    - chave igual e valores mapeados iguais: a linha não é tocada;
+    - valores diferentes: a linha é regravada no mesmo lugar;
+    - chave nova: entra nas linhas liberadas ou no fim;
+    - chave que saiu da origem (ex.: incidente que mudou de aba): a linha é
+      liberada. As últimas linhas sobem para os buracos e a aba é truncada.
+
+    A ordem das linhas deixa de seguir a da origem. Linhas da origem sem
+    chave são ignoradas.
+
+    idx_chave: índice da chave na tupla de origem (começando em 0).
+    Returns: dict: quantidade de linhas iguais, alteradas, novas, removidas e
+    movidas.
+    """
+    destinos = dict(plano.pares)
+    if idx_chave not in destinos:
+        raise ValueError(f"Coluna chave sem correspondência na aba {ws.title}")
+    col_chave = destinos[idx_chave]
+    modelo = ModeloLinha(ws, linha_modelo, plano.colunas, ajustar_formulas, plano.pares)
+    cells = ws._cells
+
+    # Linhas atuais do destino, pela chave (repetidas contam como removidas)
+    existentes = {}
+    for linha in range(linha_modelo, ws.max_row + 1):
+        cel = cells.get((linha, col_chave))
+        chave = cel.value if cel is not None else None
+        if chave is not None and chave not in existentes:
+            existentes[chave] = linha
+
+    origem = {}
+    for valores in linhas_origem:
+        chave = valores[idx_chave]
+        if chave is not None and chave not in origem:
+            origem[chave] = valores
+
+    ocupadas = {linha: chave for chave, linha in existentes.items() if chave in origem}
+    novas = [chave for chave in origem if chave not in existentes]
+
+    # Ao fim, os dados ocupam exatamente linha_modelo..limite
+    limite = linha_modelo + len(ocupadas) + len(novas) - 1
+
+    resumo = {
+        "iguais": 0,
+        "alteradas": 0,
+        "novas": len(novas),
+        "removidas": len(existentes) - len(ocupadas),
+    }
+    for linha, chave in ocupadas.items():
+        if linha > limite:
+            continue  # será regravada ao subir para um buraco
+        valores = origem[chave]
+        for src, col in plano.pares:
+            cel = cells.get((linha, col))
+            atual = cel.value if cel is not None else None
+            if atual != (valores[src] if src < len(valores) else None):
+                modelo.aplicar(linha, valores)
+                resumo["alteradas"] += 1
+                break
         else:
-            cel_dest.value = cel_origem.value
+            resumo["iguais"] += 1
 
-        # Copiar estilos
-        if cel_origem.has_style:
-            cel_dest.font = copy(cel_origem.font)
-            cel_dest.border = copy(cel_origem.border)
-            cel_dest.fill = copy(cel_origem.fill)
-            cel_dest.number_format = copy(cel_origem.number_format)
-            cel_dest.protection = copy(cel_origem.protection)
-            cel_dest.alignment = copy(cel_origem.alignment)
+    movidas = [chave for linha, chave in sorted(ocupadas.items()) if linha > limite]
+    resumo["movidas"] = len(movidas)
+    buracos = (
+        linha for linha in range(linha_modelo, limite + 1) if linha not in ocupadas
+    )
+    for linha, chave in zip(buracos, novas + movidas):
+        modelo.aplicar(linha, origem[chave])
 
+    truncar_aba(ws, max(limite, linha_modelo))
+    return resumo
 
-def filtrar_linhas(
-    ws: Worksheet,
-    col_status: int,
-    incluir: list[str] = None,
-    excluir: list[str] = None,
-    linha_inicial: int = 2,
-    linha_final: int = None,
-) -> list[int]:
+
+# Colunas da origem usadas fora dos planos de cópia: "Chave" (fim dos dados e
+# atualização incremental) e "Situação" (partição dos incidentes)
+COLUNAS_CONTROLE = ("Chave", "Situação")
+
+
+def colunas_usadas(origem: Path, modelo: Path, mapas_abas: dict) -> list | None:
     """
-    Filtra linhas de uma planilha com base em uma coluna (status)
-    e retorna uma lista com os índices das linhas que devem ser
-    consideradas..
+    Colunas da extração origem que os planos de cópia das abas do modelo
+    usam, mais COLUNAS_CONTROLE. Os planos são compilados só com os
+    cabeçalhos da extração e do modelo. None (todas as colunas) sem
+    LEITURA_PROJETADA.
+
+    mapas_abas: {aba do modelo: mapeamento de colunas (None: colunas com o
+    mesmo nome)}.
+    """
+    if not LEITURA_PROJETADA:
+        return None
+    cabecalho = ler_cabecalho(origem)
+    planos = [
+        compilar_plano_copia(cabecalho, ler_cabecalho(modelo, aba), mapa_colunas)
+        for aba, mapa_colunas in mapas_abas.items()
+    ]
+    return sorted(colunas_do_plano(cabecalho, *planos) | set(COLUNAS_CONTROLE), key=str)
+
+
+def preparar_mapeamento(
+    origem: Tabela, ws_destino, mapa_colunas=None, colunas_extras: list[str] = None
+) -> PlanoCopia:
     """
+    Compila o plano de cópia entre a tabela de origem e a aba de destino (ver
+    compilar_plano_copia). Sem mapa_colunas, copia as colunas com o mesmo
+    nome na origem e no destino.
+    """
+    cabecalhos_destino = [cell.value for cell in ws_destino[1]]
 
-    if linha_final is None:
-        linha_final = ws.max_row
+    return compilar_plano_copia(
+        origem.cabecalho, cabecalhos_destino, mapa_colunas, colunas_extras
+    )
 
-    # Normalizar listas de comparação
-    incluir_norm = [s.strip().lower() for s in incluir] if incluir else None
-    excluir_norm = [s.strip().lower() for s in excluir] if excluir else None
 
-    linhas = []
-    for row in range(linha_inicial, linha_final + 1):
-        status = ws.cell(row=row, column=col_status).value
-        status_val = str(status).strip().lower() if status else ""
+def copiar_para_aba(
+    ws_destino,
+    linha_modelo,
+    linhas_origem,
+    linha_destino,
+    plano: PlanoCopia,
+    ajustar_formulas: bool = True,
+    streaming: bool = ESCRITA_STREAMING,
+):
+    """
+    Copia linhas da origem para a aba de destino mantendo formatação e fórmulas.
+    linhas_origem: iterável de tuplas de valores (ex.: uma Tabela), lido uma
+    única vez.
+    plano: PlanoCopia com os pares de colunas já resolvidos.
+    streaming: grava as linhas direto em XML (EscritorAba), sem células no
+    ws; elas entram no arquivo em gravador_xlsx.salvar_relatorio.
+    """
+    # Linha modelo e plano capturados uma única vez (estilos compartilhados)
+    modelo = ModeloLinha(
+        ws_destino, linha_modelo, plano.colunas, ajustar_formulas, plano.pares
+    )
+
+    if streaming:
+        # gravador_xlsx importa utils (log): importado aqui, não no topo
+        from gravador_xlsx import EscritorAba
 
-        if incluir_norm and status_val not in incluir_norm:
-            continue
-        if excluir_norm and status_val in excluir_norm:
-            continue
+        escritor = EscritorAba(modelo, linha_destino)
+        for linha_origem in linhas_origem:
+            escritor.escrever(linha_origem)
+        return escritor.proxima - 2
 
-        linhas.append(row)
+    for linha_origem in linhas_origem:
+        modelo.aplicar(linha_destino, linha_origem)
+        linha_destino += 1
 
-    log(f"[RELATÓRIO] Linhas filtradas para aba '{ws.title}': {len(linhas)}")
+    return linha_destino - 2
 
-    return linhas
 
+def gravar_aba(
+    ws_destino,
+    linha_modelo: int,
+    lote: Tabela,
+    plano: PlanoCopia,
+    incremental: bool = ATUALIZACAO_INCREMENTAL,
+    ajustar_formulas: bool = True,
+):
+    """
+    Grava o lote na aba de destino a partir da linha modelo: recriando a aba
+    (limpeza + cópia) ou, com incremental, atualizando só as linhas que
+    mudaram pela "Chave" (ver sincronizar_aba).
+    """
+    registrar_linhas(len(lote))
+    if incremental:
+        resumo = sincronizar_aba(
+            ws_destino,
+            linha_modelo,
+            lote,
+            plano,
+            lote.indice("Chave"),
+            ajustar_formulas,
+        )
+        log(
+            f"[RELATÓRIO] Aba {ws_destino.title} atualizada: {resumo['iguais']} iguais, "
+            f"{resumo['alteradas']} alteradas, {resumo['novas']} novas, "
+            f"{resumo['removidas']} removidas, {resumo['movidas']} movidas"
+        )
+        return
 
-def obter_ultima_linha_com_dados(ws, coluna_chave: int):
-    """Retorna a última linha da planilha que contém dados na coluna especificada."""
-    return max(
-        row
-        for row in range(2, ws.max_row + 1)
-        if ws.cell(row=row, column=coluna_chave).value is not None
+    # Limpar aba de destino
+    preparar_destino(ws_destino, linha_modelo=linha_modelo)
+
+    total_copiados = copiar_para_aba(
+        ws_destino,
+        linha_modelo=linha_modelo,
+        linhas_origem=lote,
+        linha_destino=linha_modelo,
+        plano=plano,
+        ajustar_formulas=ajustar_formulas,
+    )
+    log(
+        f"[RELATÓRIO] Total de registros copiados para aba {ws_destino.title}: {total_copiados}"
     )
 
 
+def particionar_incidentes(ws_origem, destinos: dict) -> dict:
+    """
+    Lê a extração de incidentes uma única vez, em colunas (ou usa a Tabela
+    já lida), e separa as linhas em uma tabela por aba de destino, conforme
+    o filtro de "Situação" de cada uma (ver Tabela.particionar).
+
+    Returns: dict: {nome da aba: Tabela}.
+    """
+    origem = como_tabela(ws_origem)
+    registrar_linhas(len(origem))
+    lotes = origem.particionar("Situação", destinos)
+    for nome, lote in lotes.items():
+        log(f"[RELATÓRIO] Linhas filtradas para aba '{nome}': {len(lote)}")
+    return lotes
+
+
 def deletar_linhas(sheet, linhas, log_prefix="[TRATAMENTO]"):
     """Deleta múltiplas linhas em blocos consecutivos, reduzindo chamadas COM."""
     if not linhas:
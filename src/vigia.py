@@ -0,0 +1,293 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+import relatorio_garantias
+import relatorio_project_room
+from gravador_xlsx import manter_residentes
+from processar_xls import converter_arquivos, escolher_backend
+from utils import log, preparar_pasta
+
+# Relatórios disparados pelo vigia; cada um depende das extrações de ORIGENS
+RELATORIOS = {
+    "Garantias": relatorio_garantias,
+    "Project Room": relatorio_project_room,
+}
+
+# Segundos sem mudança de tamanho/data para considerar o arquivo completo
+ESTABILIDADE = 3.0
+
+# Intervalo entre verificações (varredura sem inotify ou arquivos pendentes)
+INTERVALO = 1.0
+
+# Com inotify e nada pendente, varre a pasta mesmo assim a cada tanto (eventos
+# perdidos, pasta de rede)
+VARREDURA_SEGURANCA = 60.0
+
+# Eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+EVENTO = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Eventos de arquivos da pasta pelo inotify do Linux (via ctypes)."""
+
+    def __init__(self, pasta: Path):
+        nome = ctypes.util.find_library("c")
+        if sys.platform != "linux" or nome is None:
+            raise OSError("inotify indisponível")
+        libc = ctypes.CDLL(nome, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mascara = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        if libc.inotify_add_watch(self.fd, os.fsencode(pasta), mascara) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+
+    def esperar(self, tempo: float) -> set[str]:
+        """Nomes dos arquivos com eventos, esperando até tempo segundos."""
+        prontos, _, _ = select.select([self.fd], [], [], tempo)
+        if not prontos:
+            return set()
+        dados = os.read(self.fd, 64 * 1024)
+        nomes = set()
+        posicao = 0
+        while posicao < len(dados):
+            _, _, _, tamanho = EVENTO.unpack_from(dados, posicao)
+            posicao += EVENTO.size
+            nome = dados[posicao : posicao + tamanho].rstrip(b"\0")
+            posicao += tamanho
+            if nome:
+                nomes.add(os.fsdecode(nome))
+        return nomes
+
+    def fechar(self):
+        os.close(self.fd)
+
+
+class _Varredura:
+    """Sem inotify (ex.: Windows): só espera; a pasta é varrida a cada volta."""
+
+    def esperar(self, tempo: float) -> set[str] | None:
+        time.sleep(tempo)
+        return None
+
+    def fechar(self):
+        pass
+
+
+class Vigia:
+    """
+    Vigia a pasta data: cada exportação do Jira (.xls) que casa com os
+    ARQUIVOS_XLS dos relatórios é convertida assim que termina de ser
+    gravada, e o relatório roda assim que todas as extrações que ele lê
+    (ORIGENS do módulo) chegaram (foram convertidas depois da última
+    geração dele). As demais exportações só são convertidas.
+    """
+
+    def __init__(
+        self,
+        pasta: Path,
+        relatorios: dict = RELATORIOS,
+        estabilidade: float = ESTABILIDADE,
+        intervalo: float = INTERVALO,
+        backend: str | None = None,
+        usar_inotify: bool = True,
+    ):
+        self.pasta = pasta
+        self.relatorios = relatorios
+        self.estabilidade = estabilidade
+        self.intervalo = intervalo
+        self.backend = escolher_backend(backend)
+
+        # padrão compilado -> (nome do .xlsx, relatórios que dependem dele)
+        self.padroes = {}
+        for nome, modulo in relatorios.items():
+            for regex, novo_nome in modulo.ARQUIVOS_XLS:
+                _, dependentes = self.padroes.setdefault(
+                    re.compile(regex), (novo_nome, [])
+                )
+                if novo_nome in modulo.ORIGENS:
+                    dependentes.append(nome)
+
+        # Extrações que ainda faltam para cada relatório
+        self.faltando = {
+            nome: set(modulo.ORIGENS) for nome, modulo in relatorios.items()
+        }
+        # arquivo -> (assinatura, desde quando está igual)
+        self.candidatos = {}
+        # arquivos que falharam na conversão -> assinatura (só tenta de novo
+        # se o arquivo mudar)
+        self.falhas = {}
+
+        self.eventos = _Varredura()
+        if usar_inotify:
+            try:
+                self.eventos = _Inotify(pasta)
+            except OSError as e:
+                log(f"[VIGIA] inotify indisponível ({e}), usando varredura.")
+
+    def _padrao(self, nome: str):
+        for padrao, destino in self.padroes.items():
+            if nome.lower().endswith(".xls") and padrao.match(nome):
+                return destino
+        return None
+
+    def _assinatura(self, arquivo: Path):
+        try:
+            estado = arquivo.stat()
+        except OSError:
+            return None
+        return estado.st_size, estado.st_mtime_ns
+
+    def observar(self, nomes=None):
+        """Registra como candidatos os .xls esperados (todos, se nomes é None)."""
+        if nomes is None:
+            nomes = [arquivo.name for arquivo in self.pasta.glob("*.xls")]
+        for nome in nomes:
+            arquivo = self.pasta / nome
+            if self._padrao(nome) is None:
+                continue
+            assinatura = self._assinatura(arquivo)
+            if assinatura is None:
+                self.candidatos.pop(arquivo, None)
+                continue
+            if self.falhas.get(arquivo) == assinatura:
+                continue
+            anterior = self.candidatos.get(arquivo)
+            if anterior is None or anterior[0] != assinatura:
+                if anterior is None:
+                    log(f"[VIGIA] Chegando: {nome}")
+                self.candidatos[arquivo] = (assinatura, time.monotonic())
+
+    def _completo(self, arquivo: Path, assinatura, desde: float) -> bool:
+        """Tamanho e data sem mudar há estabilidade segundos e arquivo legível."""
+        if assinatura[0] == 0 or time.monotonic() - desde < self.estabilidade:
+            return False
+        try:
+            # No Windows, o arquivo ainda aberto pelo navegador não abre
+            with open(arquivo, "rb"):
+                return True
+        except OSError:
+            return False
+
+    def processar_prontos(self):
+        """Converte os candidatos completos e roda os relatórios liberados."""
+        for arquivo, (assinatura, desde) in list(self.candidatos.items()):
+            if self._assinatura(arquivo) != assinatura:
+                self.observar([arquivo.name])
+                continue
+            if not self._completo(arquivo, assinatura, desde):
+                continue
+
+            del self.candidatos[arquivo]
+            novo_nome, dependentes = self._padrao(arquivo.name)
+            destino = self.pasta / "uploads" / novo_nome
+            try:
+                resultado = converter_arquivos(
+                    self.pasta, [(arquivo, destino)], True, self.backend, paralelo=False
+                ).get(arquivo)
+            except OSError as e:
+                # Ex.: o arquivo foi removido ou renomeado durante a conversão
+                log(f"[VIGIA] Erro ao converter {arquivo.name}: {e}")
+                resultado = None
+            if not resultado:
+                log(
+                    f"[VIGIA] Falha ao converter {arquivo.name}; aguardando nova versão."
+                )
+                self.falhas[arquivo] = assinatura
+                continue
+            self.falhas.pop(arquivo, None)
+
+            if not dependentes:
+                log(f"[VIGIA] {novo_nome} convertido (nenhum relatório depende dele)")
+            for nome in dependentes:
+                self.faltando[nome].discard(novo_nome)
+                if self.faltando[nome]:
+                    log(
+                        f"[VIGIA] {nome}: aguardando {', '.join(sorted(self.faltando[nome]))}"
+                    )
+                else:
+                    self.gerar(nome)
+
+    def gerar(self, nome: str):
+        """Roda o relatório e volta a esperar todas as extrações que ele lê."""
+        modulo = self.relatorios[nome]
+        try:
+            modulo.main(converter=False)
+        except Exception as e:
+            log(f"[VIGIA] Falha ao gerar {nome}: {e}")
+        self.faltando[nome] = set(modulo.ORIGENS)
+
+    def executar(self, uma_vez: bool = False):
+        """
+        Laço do vigia. Com uma_vez, termina quando não há mais candidatos
+        (útil para processar o que já está na pasta).
+        """
+        log(f"[VIGIA] Vigiando {self.pasta} ({type(self.eventos).__name__.strip('_')})")
+        self.observar()
+        ultima_varredura = time.monotonic()
+        try:
+            while True:
+                self.processar_prontos()
+                if uma_vez and not self.candidatos:
+                    return
+
+                espera = self.intervalo if self.candidatos else VARREDURA_SEGURANCA
+                if isinstance(self.eventos, _Varredura):
+                    espera = self.intervalo
+                nomes = self.eventos.esperar(espera)
+                if nomes is None or time.monotonic() - ultima_varredura > espera:
+                    self.observar()
+                    ultima_varredura = time.monotonic()
+                elif nomes:
+                    self.observar(nomes)
+        finally:
+            self.eventos.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Converte as exportações do Jira assim que chegam em data e "
+        "gera cada relatório quando todas as extrações que ele lê chegaram."
+    )
+    parser.add_argument("--estabilidade", type=float, default=ESTABILIDADE)
+    parser.add_argument("--intervalo", type=float, default=INTERVALO)
+    parser.add_argument(
+        "--varredura", action="store_true", help="não usa inotify, só varredura"
+    )
+    parser.add_argument(
+        "--uma-vez",
+        action="store_true",
+        help="processa o que já está na pasta e termina",
+    )
+    args = parser.parse_args(argv)
+
+    # Processo de longa duração: os modelos ficam em memória entre execuções
+    manter_residentes(True)
+    vigia = Vigia(
+        preparar_pasta(),
+        estabilidade=args.estabilidade,
+        intervalo=args.intervalo,
+        usar_inotify=not args.varredura,
+    )
+    try:
+        vigia.executar(args.uma_vez)
+    except KeyboardInterrupt:
+        log("[VIGIA] Encerrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do projeto ficam em src/ e se importam pelo nome (ver main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
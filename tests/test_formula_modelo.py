@@ -0,0 +1,45 @@
+import pytest
+
+from utils import FormulaModelo, compilar_formula
+
+
+@pytest.mark.parametrize(
+    "formula, esperada",
+    [
+        ("=A2*2", "=A5*2"),
+        ("=$A$1+A1", "=$A$1+A4"),
+        ("=A$1*B2", "=A$1*B5"),
+        ("=$A2+$B$2", "=$A5+$B$2"),
+        ("=Sheet!B2", "=Sheet!B5"),
+        ("=Sheet!$B$2+Sheet!B$2", "=Sheet!$B$2+Sheet!B$2"),
+        ("='Minha aba'!C2&\"-\"", "='Minha aba'!C5&\"-\""),
+        ("=SUM(A2:B3)", "=SUM(A5:B6)"),
+        ("=SUM($A$2:B3)", "=SUM($A$2:B6)"),
+        ("=SUM(Sheet!A$1:A2)", "=SUM(Sheet!A$1:A5)"),
+        ("=SUM(2:3)", "=SUM(5:6)"),
+        ("=SUM($2:$3)", "=SUM($2:$3)"),
+        ("=COUNTA(A:A)", "=COUNTA(A:A)"),
+        ('=IF(A2="B2";"C2";D2)', '=IF(A5="B2";"C2";D5)'),
+        ("=Total*A2", "=Total*A5"),
+    ],
+)
+def test_formula_levada_para_outra_linha(formula, esperada):
+    assert FormulaModelo(formula, 2).para_linha(5) == esperada
+
+
+def test_linha_modelo_mantem_a_formula():
+    formula = "=IF($A$1>0;SUM(Sheet!B2:C2)/A$1;B2)"
+
+    assert FormulaModelo(formula, 2).para_linha(2) == formula
+
+
+def test_linha_acima_da_modelo():
+    assert FormulaModelo("=A10-A9", 10).para_linha(3) == "=A3-A2"
+
+
+def test_compilar_formula_reaproveita_o_modelo():
+    primeira = compilar_formula("=B2*2", 2)
+
+    assert compilar_formula("=B2*2", 2) is primeira
+    assert compilar_formula("=B2*2", 3) is not primeira
+    assert primeira.para_linha(7) == "=B7*2"
@@ -0,0 +1,140 @@
+import struct
+import zipfile
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from gravador_xlsx import EscritorAba, gravar_abas_alteradas, salvar_relatorio
+from utils import ModeloLinha, compilar_plano_copia
+
+
+def _criar_modelo(caminho):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Dados"
+    ws.append(["Chave", "Resumo", "Total"])
+    ws.append([None, None, "=C2*2"])
+    ws["B2"].font = Font(bold=True)
+
+    outra = wb.create_sheet("Outra")
+    for linha in range(1, 200):
+        outra.append([f"texto {linha}", linha, linha * 1.5])
+    wb.save(caminho)
+
+    # Recomprime com outro nível: um membro recomprimido na gravação (nível
+    # padrão) deixaria de ter os mesmos bytes
+    with zipfile.ZipFile(caminho) as zin:
+        membros = [(info, zin.read(info)) for info in zin.infolist()]
+    with zipfile.ZipFile(caminho, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zout:
+        for info, dados in membros:
+            zout.writestr(info.filename, dados)
+
+
+def _bytes_comprimidos(caminho, info: zipfile.ZipInfo) -> bytes:
+    """Os bytes do membro como estão no arquivo (sem descompactar)."""
+    with open(caminho, "rb") as arquivo:
+        arquivo.seek(info.header_offset)
+        cabecalho = arquivo.read(30)
+        tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho[26:30])
+        arquivo.seek(tamanho_nome + tamanho_extra, 1)
+        return arquivo.read(info.compress_size)
+
+
+def _escrever(ws, linhas):
+    cabecalho = ["Chave", "Resumo"]
+    plano = compilar_plano_copia(cabecalho, [c.value for c in ws[1]])
+    modelo = ModeloLinha(ws, 2, plano.colunas | {3}, True, plano.pares)
+    escritor = EscritorAba(modelo, 2)
+    for linha in linhas:
+        escritor.escrever(linha)
+    return escritor
+
+
+def test_membros_nao_alterados_sao_copiados_sem_recomprimir(tmp_path):
+    caminho = tmp_path / "relatorio.xlsx"
+    _criar_modelo(caminho)
+    with zipfile.ZipFile(caminho) as zin:
+        antes = {info.filename: info for info in zin.infolist()}
+    originais = {
+        nome: _bytes_comprimidos(caminho, info) for nome, info in antes.items()
+    }
+
+    wb = load_workbook(caminho)
+    ws = wb["Dados"]
+    _escrever(ws, [("INC-1", "primeiro"), ("INC-2", "segundo")])
+    gravar_abas_alteradas(wb, caminho, [ws])
+
+    with zipfile.ZipFile(caminho) as zin:
+        depois = {info.filename: info for info in zin.infolist()}
+    alterados = {
+        "xl/worksheets/sheet1.xml",
+        "xl/workbook.xml",
+        "xl/styles.xml",
+        "xl/_rels/workbook.xml.rels",
+        "[Content_Types].xml",
+    }
+    copiados = set(antes) - alterados
+    assert "xl/worksheets/sheet2.xml" in copiados
+    for nome in copiados:
+        assert depois[nome].CRC == antes[nome].CRC, nome
+        assert _bytes_comprimidos(caminho, depois[nome]) == originais[nome], nome
+
+    assert not caminho.with_suffix(".tmp").exists()
+
+
+def test_linhas_do_escritor_entram_na_aba_gravada(tmp_path):
+    caminho = tmp_path / "relatorio.xlsx"
+    _criar_modelo(caminho)
+
+    wb = load_workbook(caminho)
+    ws = wb["Dados"]
+    _escrever(ws, [("INC-1", "primeiro"), ("INC-2", datetime(2024, 5, 1, 8, 30))])
+    gravar_abas_alteradas(wb, caminho, [ws])
+
+    lido = load_workbook(caminho)["Dados"]
+    assert [c.value for c in lido[2]] == ["INC-1", "primeiro", "=C2*2"]
+    assert [c.value for c in lido[3]] == ["INC-2", datetime(2024, 5, 1, 8, 30), "=C3*2"]
+    assert lido["B2"].font.bold
+    assert lido.max_row == 3
+
+
+def test_materializar_salva_completo_com_as_mesmas_linhas(tmp_path):
+    caminho = tmp_path / "relatorio.xlsx"
+    _criar_modelo(caminho)
+
+    wb = load_workbook(caminho)
+    ws = wb["Dados"]
+    _escrever(ws, [("INC-1", "primeiro"), ("INC-2", 42)])
+    salvar_relatorio(wb, caminho, [ws], parcial=False)
+
+    lido = load_workbook(caminho)["Dados"]
+    assert [c.value for c in lido[2]] == ["INC-1", "primeiro", "=C2*2"]
+    assert [c.value for c in lido[3]] == ["INC-2", 42, "=C3*2"]
+    assert lido["B3"].font.bold
+    assert load_workbook(caminho)["Outra"]["A199"].value == "texto 199"
+
+
+def test_relatorio_bloqueado_nao_cai_no_salvamento_completo(tmp_path, monkeypatch):
+    caminho = tmp_path / "relatorio.xlsx"
+    _criar_modelo(caminho)
+    original = caminho.read_bytes()
+
+    wb = load_workbook(caminho)
+    ws = wb["Dados"]
+    _escrever(ws, [("INC-1", "primeiro")])
+
+    def bloqueado(*args):
+        raise PermissionError("relatório aberto em outro programa")
+
+    def save(*args):
+        raise AssertionError("wb.save() não deveria ser chamado")
+
+    monkeypatch.setattr("gravador_xlsx.os.replace", bloqueado)
+    monkeypatch.setattr(wb, "save", save)
+    with pytest.raises(PermissionError):
+        salvar_relatorio(wb, caminho, [ws], parcial=True)
+
+    assert caminho.read_bytes() == original
+    assert not caminho.with_suffix(".tmp").exists()
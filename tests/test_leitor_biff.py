@@ -0,0 +1,257 @@
+import struct
+from datetime import datetime
+
+import pytest
+
+from leitor_biff import (
+    ArquivoOle2,
+    LeitorBiff,
+    _TabelaStrings,
+    eh_arquivo_ole2,
+    ler_linhas_biff,
+)
+
+TAM_SETOR = 512
+TAM_MINI = 64
+LIVRE = 0xFFFFFFFF
+FIM = 0xFFFFFFFE
+SETOR_FAT = 0xFFFFFFFD
+SETOR_DIFAT = 0xFFFFFFFC
+
+TEXTO_LONGO = "A" * 10 + "ΩΩ中"
+
+
+def _registro(tipo: int, dados: bytes) -> bytes:
+    return struct.pack("<HH", tipo, len(dados)) + dados
+
+
+def _texto_curto(texto: str) -> bytes:
+    return struct.pack("<BB", len(texto), 0) + texto.encode("latin-1")
+
+
+def _texto(texto: str, flags: int = 0, runs: int = 0) -> bytes:
+    cabecalho = struct.pack("<HB", len(texto), flags)
+    if flags & 0x08:
+        cabecalho += struct.pack("<H", runs)
+    corpo = texto.encode("utf-16-le" if flags & 0x01 else "latin-1")
+    return cabecalho + corpo + b"\0" * (4 * runs)
+
+
+def _sst() -> tuple[bytes, bytes]:
+    """
+    Corpo do SST e do CONTINUE: TEXTO_LONGO começa no SST com caracteres
+    de 1 byte e termina no CONTINUE em UTF-16 (flags novas no início).
+    """
+    sst = struct.pack("<II", 5, 5)
+    sst += _texto("Chave") + _texto("Resumo")
+    sst += _texto("Ação rápida", flags=0x08, runs=1)
+    sst += struct.pack("<HB", len(TEXTO_LONGO), 0) + TEXTO_LONGO[:10].encode("latin-1")
+    continuacao = b"\x01" + TEXTO_LONGO[10:].encode("utf-16-le") + _texto("fim")
+    return sst, continuacao
+
+
+def _aba() -> bytes:
+    def rk_inteiro(valor):
+        return (valor << 2) | 0x02
+
+    return b"".join(
+        [
+            _registro(0x0809, struct.pack("<HH", 0x0600, 0x0010) + b"\0" * 12),
+            _registro(0x00FD, struct.pack("<HHHI", 0, 0, 0, 0)),
+            _registro(0x00FD, struct.pack("<HHHI", 0, 1, 0, 1)),
+            _registro(0x00FD, struct.pack("<HHHI", 0, 2, 0, 3)),
+            _registro(0x00FD, struct.pack("<HHHI", 1, 0, 0, 2)),
+            _registro(0x0203, struct.pack("<HHHd", 1, 1, 0, 1.5)),
+            _registro(0x027E, struct.pack("<HHHI", 1, 2, 0, rk_inteiro(7))),
+            _registro(
+                0x00BD,
+                struct.pack(
+                    "<HHHIHIH", 2, 0, 0, rk_inteiro(100), 0, (250 << 2) | 0x03, 1
+                ),
+            ),
+            _registro(0x0203, struct.pack("<HHHd", 2, 2, 1, 45000.0)),
+            # Linha 3 sem células
+            _registro(0x00FD, struct.pack("<HHHI", 4, 0, 0, 4)),
+            _registro(0x0205, struct.pack("<HHHBB", 4, 1, 0, 1, 0)),
+            _registro(
+                0x0006,
+                struct.pack("<HHH", 4, 2, 0)
+                + b"\x00\x00\x00\x00\x00\x00\xff\xff"
+                + struct.pack("<HIH", 0, 0, 0),
+            ),
+            _registro(0x0207, struct.pack("<HB", 4, 0) + b"calc"),
+            _registro(0x000A, b""),
+        ]
+    )
+
+
+def _workbook() -> bytes:
+    """Stream Workbook (BIFF8) com uma aba, grande o bastante para 2 setores de FAT."""
+    sst, continuacao = _sst()
+    # Registros ignorados pelo leitor, antes do SST: o stream passa de 64 KB
+    preenchimento = _registro(0x0099, b"\0" * 500) * 140
+
+    def globais(inicio_aba: int) -> bytes:
+        return b"".join(
+            [
+                _registro(0x0809, struct.pack("<HH", 0x0600, 0x0005) + b"\0" * 12),
+                _registro(0x0022, struct.pack("<H", 0)),
+                _registro(0x00E0, struct.pack("<HH", 0, 0) + b"\0" * 16),
+                _registro(0x00E0, struct.pack("<HH", 0, 14) + b"\0" * 16),
+                _registro(
+                    0x0085, struct.pack("<IBB", inicio_aba, 0, 0) + _texto_curto("Aba")
+                ),
+                preenchimento,
+                _registro(0x00FC, sst),
+                _registro(0x003C, continuacao),
+                _registro(0x000A, b""),
+            ]
+        )
+
+    inicio_aba = len(globais(0))
+    return globais(inicio_aba) + _aba()
+
+
+def _montar_ole2(workbook: bytes, pequeno: bytes) -> bytes:
+    """
+    Arquivo OLE2 com o stream Workbook em setores fora de ordem (blocos de
+    16 setores em ordem inversa), a FAT em 2 setores (o segundo listado só
+    na DIFAT) e o stream pequeno no mini stream, com a cadeia de mini
+    setores fora de ordem.
+    """
+    n_workbook = -(-len(workbook) // TAM_SETOR)
+    n_mini = -(-len(pequeno) // TAM_MINI)
+    assert n_mini <= TAM_SETOR // TAM_MINI
+
+    # Setores: 0 FAT, 1 DIFAT, 2 diretório, 3 MiniFAT, 4 mini stream,
+    # 5.. Workbook, último FAT
+    base = 5
+    total = base + n_workbook + 1
+    assert TAM_SETOR // 4 < total <= 2 * (TAM_SETOR // 4)
+    fat2 = total - 1
+
+    blocos = [list(range(i, min(i + 16, n_workbook))) for i in range(0, n_workbook, 16)]
+    # ordem[j]: setor físico do j-ésimo setor lógico do Workbook
+    ordem = [base + i for bloco in reversed(blocos) for i in bloco]
+
+    setores = [b""] * total
+    fat = [LIVRE] * (2 * TAM_SETOR // 4)
+    fat[0] = fat[fat2] = SETOR_FAT
+    fat[1] = SETOR_DIFAT
+    fat[2] = fat[3] = fat[4] = FIM
+    for j in range(n_workbook):
+        fat[ordem[j]] = ordem[j + 1] if j + 1 < n_workbook else FIM
+        setores[ordem[j]] = workbook[j * TAM_SETOR : (j + 1) * TAM_SETOR]
+
+    # Mini stream: o pedaço j do stream pequeno no mini setor mini_ordem[j]
+    mini_ordem = [(j * 3 + 2) % n_mini for j in range(n_mini)]
+    assert sorted(mini_ordem) == list(range(n_mini))
+    minifat = [LIVRE] * (TAM_SETOR // 4)
+    mini = bytearray(n_mini * TAM_MINI)
+    for j, setor in enumerate(mini_ordem):
+        minifat[setor] = mini_ordem[j + 1] if j + 1 < n_mini else FIM
+        pedaco = pequeno[j * TAM_MINI : (j + 1) * TAM_MINI]
+        mini[setor * TAM_MINI : setor * TAM_MINI + len(pedaco)] = pedaco
+    setores[3] = struct.pack(f"<{len(minifat)}I", *minifat)
+    setores[4] = bytes(mini)
+
+    def entrada(nome: str, tipo: int, inicio: int, tamanho: int) -> bytes:
+        bruto = (nome + "\0").encode("utf-16-le")
+        dados = bytearray(128)
+        dados[: len(bruto)] = bruto
+        struct.pack_into("<HB", dados, 0x40, len(bruto), tipo)
+        struct.pack_into("<II", dados, 0x74, inicio, tamanho)
+        return bytes(dados)
+
+    setores[2] = (
+        entrada("Root Entry", 5, 4, n_mini * TAM_MINI)
+        + entrada("Workbook", 2, ordem[0], len(workbook))
+        + entrada("Pequeno", 2, mini_ordem[0], len(pequeno))
+        + bytes(128)
+    )
+
+    difat = [LIVRE] * (TAM_SETOR // 4)
+    difat[0] = fat2
+    difat[-1] = FIM
+    setores[1] = struct.pack(f"<{len(difat)}I", *difat)
+
+    metade = TAM_SETOR // 4
+    setores[0] = struct.pack(f"<{metade}I", *fat[:metade])
+    setores[fat2] = struct.pack(f"<{metade}I", *fat[metade:])
+
+    cabecalho = bytearray(TAM_SETOR)
+    cabecalho[:8] = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+    struct.pack_into("<HHHHH", cabecalho, 0x18, 0x3E, 3, 0xFFFE, 9, 6)
+    struct.pack_into("<II", cabecalho, 0x2C, 2, 2)
+    struct.pack_into("<IIIII", cabecalho, 0x38, 4096, 3, 1, 1, 1)
+    entradas_difat = [LIVRE] * 109
+    entradas_difat[0] = 0
+    struct.pack_into("<109I", cabecalho, 0x4C, *entradas_difat)
+
+    return bytes(cabecalho) + b"".join(s.ljust(TAM_SETOR, b"\0") for s in setores)
+
+
+@pytest.fixture(scope="module")
+def workbook():
+    return _workbook()
+
+
+@pytest.fixture(scope="module")
+def pequeno():
+    # 5 mini setores, todos no único setor do mini stream
+    return bytes(range(256)) + b"fim do stream"
+
+
+@pytest.fixture(scope="module")
+def arquivo(workbook, pequeno):
+    return _montar_ole2(workbook, pequeno)
+
+
+def test_stream_em_setores_fora_de_ordem_com_fat_na_difat(arquivo, workbook):
+    fluxo = ArquivoOle2(arquivo).abrir_stream("Workbook")
+
+    assert fluxo.tamanho == len(workbook)
+    assert fluxo.ler(0, len(workbook)) == workbook
+    # Leitura que atravessa o fim de um bloco de setores contíguos
+    fim_bloco = 16 * TAM_SETOR
+    assert fluxo.ler(fim_bloco - 3, 10) == workbook[fim_bloco - 3 : fim_bloco + 7]
+
+
+def test_stream_no_mini_stream(arquivo, pequeno):
+    fluxo = ArquivoOle2(arquivo).abrir_stream("Pequeno")
+
+    assert fluxo.tamanho == len(pequeno)
+    assert fluxo.ler(0, len(pequeno)) == pequeno
+
+
+def test_stream_inexistente(arquivo):
+    with pytest.raises(KeyError):
+        ArquivoOle2(arquivo).abrir_stream("Book")
+
+
+def test_sst_com_texto_dividido_por_continue(arquivo):
+    sst = LeitorBiff(arquivo).sst
+
+    assert isinstance(sst, _TabelaStrings)
+    assert len(sst) == 5
+    assert [sst.obter(i) for i in range(5)] == [
+        "Chave",
+        "Resumo",
+        "Ação rápida",
+        TEXTO_LONGO,
+        "fim",
+    ]
+
+
+def test_ler_linhas_biff(tmp_path, arquivo):
+    caminho = tmp_path / "extracao.xls"
+    caminho.write_bytes(arquivo)
+
+    assert eh_arquivo_ole2(caminho)
+    assert list(ler_linhas_biff(caminho)) == [
+        ("Chave", "Resumo", TEXTO_LONGO),
+        ("Ação rápida", 1.5, 7),
+        (100, 2.5, datetime(2023, 3, 15)),
+        (),
+        ("fim", True, "calc"),
+    ]
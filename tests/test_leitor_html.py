@@ -0,0 +1,152 @@
+from datetime import datetime
+
+import pytest
+
+import leitor_html
+from leitor_html import _ParserTabelaHtml, converter_valor, ler_linhas_html
+from processar_xls import eh_rodape, limpar_linhas
+
+# Exportação do Jira reduzida: título e contagem nas linhas 1 a 3, o
+# cabeçalho, os incidentes (com a linha "SKYIT-182"), o rodapé "Gerado em"
+# e linhas vazias no fim
+EXPORTACAO = """<html>
+<head><meta http-equiv="Content-Type" content="text/html; charset=UTF-8"></head>
+<body>
+<table border="1">
+  <tr><td colspan="5"><b>Jira</b></td></tr>
+  <tr><td colspan="5">Exibindo 4 de 4 itens</td></tr>
+  <tr><td colspan="5"></td></tr>
+  <tr>
+    <th>Chave</th><th>Resumo</th><th>Criado</th><th>Pontos</th><th>Código</th>
+  </tr>
+  <tr>
+    <td>INC-1</td>
+    <td>Primeira linha<br/>segunda   linha</td>
+    <td>15/03/2023</td>
+    <td>3</td>
+    <td style='mso-number-format:"\\@"'>007</td>
+  </tr>
+  <tr>
+    <td>SKYIT-182</td><td>Removida</td><td>01/01/2023</td><td>1</td><td>x</td>
+  </tr>
+  <tr>
+    <td colspan="2">Mesclada</td>
+    <td>15/03/2023 10:30</td>
+    <td>-2.5</td>
+    <td style="mso-number-format: &quot;\\@&quot;">15/03/2023</td>
+  </tr>
+  <tr><td></td><td></td><td></td><td></td><td></td></tr>
+  <tr>
+    <td>INC-3</td>
+    <td><p>Parágrafo 1</p><p>Parágrafo 2</p></td>
+    <td></td>
+    <td>0</td>
+    <td>1.0.2</td>
+  </tr>
+</table>
+<table>
+  <tr><td colspan="5">Gerado em 15/03/2023 10:30 por Fulano</td></tr>
+</table>
+<table>
+  <tr><td></td></tr>
+  <tr><td></td><td></td></tr>
+</table>
+</body>
+</html>
+"""
+
+CABECALHO = ("Chave", "Resumo", "Criado", "Pontos", "Código")
+INC_1 = ("INC-1", "Primeira linha\nsegunda linha", datetime(2023, 3, 15), 3, "007")
+MESCLADA = ("Mesclada", None, datetime(2023, 3, 15, 10, 30), -2.5, "15/03/2023")
+INC_3 = ("INC-3", "Parágrafo 1\nParágrafo 2", None, 0, "1.0.2")
+
+
+def _linhas_html(texto: str) -> list:
+    parser = _ParserTabelaHtml()
+    parser.feed(texto)
+    parser.close()
+    return parser.linhas
+
+
+@pytest.mark.parametrize(
+    "texto, esperado",
+    [
+        ("", None),
+        ("42", 42),
+        ("-7", -7),
+        ("007", "007"),
+        ("3.25", 3.25),
+        ("-0.5", -0.5),
+        ("1.0.2", "1.0.2"),
+        ("15/03/2023", datetime(2023, 3, 15)),
+        ("15/03/2023 10:30", datetime(2023, 3, 15, 10, 30)),
+        ("15/03/23", datetime(2023, 3, 15)),
+        ("31/02/2023", "31/02/2023"),
+        ("INC-1", "INC-1"),
+    ],
+)
+def test_converter_valor(texto, esperado):
+    assert converter_valor(texto) == esperado
+
+
+def test_parser_monta_as_linhas_como_o_excel():
+    linhas = _linhas_html(EXPORTACAO)
+
+    assert linhas[0] == ("Jira", None, None, None, None)
+    assert linhas[2] == (None,) * 5
+    assert linhas[3] == CABECALHO
+    assert linhas[4] == INC_1
+    # colspan completa a linha com células vazias
+    assert linhas[6] == MESCLADA
+    assert linhas[8] == INC_3
+    assert linhas[9] == (
+        "Gerado em 15/03/2023 10:30 por Fulano",
+        None,
+        None,
+        None,
+        None,
+    )
+    assert linhas[10:] == [(None,), (None, None)]
+
+
+def test_celula_de_texto_nao_e_convertida():
+    (linha,) = _linhas_html(
+        "<table><tr>"
+        "<td style='mso-number-format:\"\\@\"'>42</td>"
+        "<td>42</td>"
+        "</tr></table>"
+    )
+
+    assert linha == ("42", 42)
+
+
+def test_rodape():
+    assert eh_rodape(("Gerado em 15/03/2023 10:30 por Fulano", None))
+    assert not eh_rodape(INC_1)
+    assert not eh_rodape((None, None))
+
+
+def test_limpar_linhas_da_exportacao():
+    assert list(limpar_linhas(_linhas_html(EXPORTACAO))) == [
+        CABECALHO,
+        INC_1,
+        MESCLADA,
+        # Linhas vazias entre os dados são mantidas
+        (None,) * 5,
+        INC_3,
+    ]
+
+
+def test_limpar_linhas_sem_rodape_mantem_a_ultima_linha():
+    linhas = [("t",), ("c",), (None,), CABECALHO, INC_1, (None,), (None,)]
+
+    assert list(limpar_linhas(linhas)) == [CABECALHO, INC_1]
+
+
+def test_ler_linhas_html_em_blocos(tmp_path, monkeypatch):
+    # Blocos pequenos cortam tags e células no meio
+    monkeypatch.setattr(leitor_html, "TAMANHO_BLOCO", 7)
+    caminho = tmp_path / "Filtro (Jira).xls"
+    caminho.write_text(EXPORTACAO, encoding="utf-8")
+
+    assert list(ler_linhas_html(caminho)) == _linhas_html(EXPORTACAO)
@@ -0,0 +1,131 @@
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from tabela import Tabela
+from utils import gravar_aba, preparar_mapeamento, sincronizar_aba
+
+CABECALHO_ORIGEM = ("Chave", "Resumo")
+
+
+def _lote(*linhas) -> Tabela:
+    return Tabela.de_linhas(CABECALHO_ORIGEM, linhas, "Extração")
+
+
+def _aba():
+    ws = Workbook().active
+    ws.title = "RI"
+    ws.append(["Chave", "Resumo", "Tamanho"])
+    ws.append([None, None, "=LEN(B2)"])
+    ws["A2"].font = Font(bold=True)
+    return ws
+
+
+def _linhas(ws):
+    return [
+        tuple(ws.cell(linha, col).value for col in range(1, 4))
+        for linha in range(2, ws.max_row + 1)
+    ]
+
+
+@pytest.fixture
+def aba_gravada():
+    """Aba recriada na primeira execução, como no modo não incremental."""
+    ws = _aba()
+    lote = _lote(
+        ("INC-1", "um"),
+        ("INC-2", "dois"),
+        ("INC-3", "três"),
+        ("INC-4", "quatro"),
+    )
+    # A coluna da fórmula recebe a linha modelo, como COLUNAS_RELATORIO
+    plano = preparar_mapeamento(lote, ws, colunas_extras=["C"])
+    gravar_aba(ws, 2, lote, plano, incremental=False)
+    return ws, plano
+
+
+def test_segunda_execucao_com_chaves_alteradas_novas_e_removidas(aba_gravada):
+    ws, plano = aba_gravada
+    lote = _lote(
+        ("INC-1", "um"),
+        ("INC-2", "dois (alterado)"),
+        ("INC-4", "quatro"),
+        ("INC-5", "cinco"),
+    )
+
+    resumo = sincronizar_aba(ws, 2, lote, plano, lote.indice("Chave"))
+
+    assert resumo == {
+        "iguais": 2,
+        "alteradas": 1,
+        "novas": 1,
+        "removidas": 1,
+        "movidas": 0,
+    }
+    # A chave nova entra no lugar da que saiu
+    assert _linhas(ws) == [
+        ("INC-1", "um", "=LEN(B2)"),
+        ("INC-2", "dois (alterado)", "=LEN(B3)"),
+        ("INC-5", "cinco", "=LEN(B4)"),
+        ("INC-4", "quatro", "=LEN(B5)"),
+    ]
+    assert ws["A4"].font.bold
+
+
+def test_linhas_do_fim_sobem_para_as_removidas(aba_gravada):
+    ws, plano = aba_gravada
+    lote = _lote(("INC-3", "três"), ("INC-4", "quatro (alterado)"))
+
+    resumo = sincronizar_aba(ws, 2, lote, plano, lote.indice("Chave"))
+
+    assert resumo == {
+        "iguais": 0,
+        "alteradas": 0,
+        "novas": 0,
+        "removidas": 2,
+        "movidas": 2,
+    }
+    assert _linhas(ws) == [
+        ("INC-3", "três", "=LEN(B2)"),
+        ("INC-4", "quatro (alterado)", "=LEN(B3)"),
+    ]
+    assert ws.max_row == 3
+
+
+def test_execucao_sem_mudancas_nao_toca_as_linhas(aba_gravada):
+    ws, plano = aba_gravada
+    celulas = dict(ws._cells)
+    lote = _lote(
+        ("INC-4", "quatro"),
+        ("INC-3", "três"),
+        ("INC-2", "dois"),
+        ("INC-1", "um"),
+    )
+
+    resumo = sincronizar_aba(ws, 2, lote, plano, lote.indice("Chave"))
+
+    assert resumo["iguais"] == 4
+    assert resumo["alteradas"] == resumo["novas"] == resumo["removidas"] == 0
+    assert all(ws._cells[chave] is celula for chave, celula in celulas.items())
+
+
+def test_gravar_aba_incremental_usa_a_chave(aba_gravada):
+    ws, plano = aba_gravada
+    lote = _lote(("INC-2", "dois"), ("INC-6", "seis"))
+
+    gravar_aba(ws, 2, lote, plano, incremental=True)
+
+    # INC-2 continua na linha 3; INC-6 ocupa a linha liberada por INC-1
+    assert _linhas(ws) == [
+        ("INC-6", "seis", "=LEN(B2)"),
+        ("INC-2", "dois", "=LEN(B3)"),
+    ]
+
+
+def test_chave_sem_coluna_no_destino():
+    ws = _aba()
+    lote = Tabela.de_linhas(("Código", "Resumo"), [("X", "y")])
+    plano = preparar_mapeamento(lote, ws)
+
+    with pytest.raises(ValueError, match="Coluna chave"):
+        sincronizar_aba(ws, 2, lote, plano, 0)
@@ -0,0 +1,29 @@
+import tabela
+from tabela import Tabela
+
+
+def test_de_linhas_completa_e_corta_as_linhas():
+    linhas = [("INC-1", "um", "extra"), ("INC-2",), ["INC-3", "três"]]
+
+    t = Tabela.de_linhas(("Chave", "Resumo"), iter(linhas), "RI")
+
+    assert list(t.linhas()) == [("INC-1", "um"), ("INC-2", None), ("INC-3", "três")]
+    assert t.titulo == "RI"
+
+
+def test_de_linhas_em_varios_blocos(monkeypatch):
+    monkeypatch.setattr(tabela, "LINHAS_POR_BLOCO", 3)
+    linhas = [(f"INC-{i}", i) if i % 2 else (f"INC-{i}",) for i in range(10)]
+
+    t = Tabela.de_linhas(("Chave", "Pontos"), (linha for linha in linhas))
+
+    assert len(t) == 10
+    assert list(t.linhas()) == [(f"INC-{i}", i if i % 2 else None) for i in range(10)]
+
+
+def test_de_linhas_sem_linhas():
+    t = Tabela.de_linhas(("Chave", "Resumo"), [])
+
+    assert len(t) == 0
+    assert list(t.linhas()) == []
+    assert t.indice("Resumo") == 1
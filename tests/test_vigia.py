@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import vigia
+
+
+def _relatorio(geracoes: list):
+    return SimpleNamespace(
+        ARQUIVOS_XLS=[
+            (r"Filtro \(Jira\).*\.xls", "Filtro (Jira).xlsx"),
+            (r"Projetos \(Jira\).*\.xls", "Projetos (Jira).xlsx"),
+            (r"Relatório RM \(Jira\).*\.xls", "Relatório RM (Jira).xlsx"),
+        ],
+        ORIGENS=("Filtro (Jira).xlsx", "Projetos (Jira).xlsx"),
+        main=lambda converter: geracoes.append(converter),
+    )
+
+
+def _vigia(tmp_path, monkeypatch, geracoes, convertidos):
+    def converter(pasta, tarefas, del_xls, backend, paralelo):
+        convertidos.extend(destino.name for _, destino in tarefas)
+        return {arquivo: destino for arquivo, destino in tarefas}
+
+    monkeypatch.setattr(vigia, "converter_arquivos", converter)
+    return vigia.Vigia(
+        tmp_path,
+        {"Garantias": _relatorio(geracoes)},
+        estabilidade=0,
+        intervalo=0,
+        backend="python",
+        usar_inotify=False,
+    )
+
+
+def test_relatorio_nao_espera_exportacao_que_nao_le(tmp_path, monkeypatch):
+    geracoes, convertidos = [], []
+    (tmp_path / "Filtro (Jira) 01.xls").write_bytes(b"x")
+    (tmp_path / "Projetos (Jira) 01.xls").write_bytes(b"x")
+
+    _vigia(tmp_path, monkeypatch, geracoes, convertidos).executar(uma_vez=True)
+
+    assert sorted(convertidos) == ["Filtro (Jira).xlsx", "Projetos (Jira).xlsx"]
+    assert geracoes == [False]
+
+
+def test_exportacao_fora_das_origens_so_e_convertida(tmp_path, monkeypatch):
+    geracoes, convertidos = [], []
+    (tmp_path / "Relatório RM (Jira) 01.xls").write_bytes(b"x")
+    (tmp_path / "Filtro (Jira) 01.xls").write_bytes(b"x")
+
+    observador = _vigia(tmp_path, monkeypatch, geracoes, convertidos)
+    observador.executar(uma_vez=True)
+
+    assert sorted(convertidos) == ["Filtro (Jira).xlsx", "Relatório RM (Jira).xlsx"]
+    assert geracoes == []
+    assert observador.faltando["Garantias"] == {"Projetos (Jira).xlsx"}